@@ -0,0 +1,65 @@
+"""Import time benchmark for the shifty command before it parses its arguments
+
+Runs `python -X importtime` in a fresh interpreter and reports the cumulative import time of the
+module and of the slowest modules it imports. Modules that build or solve models must not be
+imported before arguments are parsed, so --help, --version and invalid arguments stay fast. The
+benchmark exits with an error if any of them are.
+
+Run it on two revisions to compare before and after a change:
+
+    python -m benchmarks.import_time --module or_shifty.app
+"""
+import argparse
+import json
+import subprocess
+import sys
+from typing import Dict
+
+# Packages that take most of shifty's startup time and are only needed to build and solve models
+HEAVY_PACKAGES = ("ortools", "numpy", "pkg_resources")
+
+
+def import_times(module: str) -> Dict[str, int]:
+    """Cumulative import time in microseconds of every module imported by importing module"""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        check=True,
+        stderr=subprocess.PIPE,
+    ).stderr.decode()
+
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split(":", 1)[1].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="or_shifty.app")
+    parser.add_argument("--top", type=int, default=10)
+    parsed = parser.parse_args(args)
+
+    times = import_times(parsed.module)
+    heavy = sorted({name.split(".")[0] for name in times} & set(HEAVY_PACKAGES))
+    slowest = sorted(times.items(), key=lambda item: item[1], reverse=True)
+
+    print(
+        json.dumps(
+            {
+                "module": parsed.module,
+                "import_time_us": times[parsed.module],
+                "slowest_us": dict(slowest[: parsed.top]),
+                "heavy_modules": heavy,
+            },
+            indent=2,
+        )
+    )
+    if heavy:
+        sys.exit(f"{parsed.module} imports {', '.join(heavy)}")
+
+
+if __name__ == "__main__":
+    main()
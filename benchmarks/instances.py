@@ -0,0 +1,137 @@
+import random
+from datetime import date, timedelta
+from typing import Any, Dict, List, Sequence
+
+from or_shifty.history import History
+from or_shifty.person import Person
+from or_shifty.shift import AssignedShift, Shift, ShiftType
+
+
+def people(num_people: int) -> List[Person]:
+    return [Person(name=f"person_{index}") for index in range(num_people)]
+
+
+def shifts_by_day(
+    num_days: int, shifts_per_day: int, start: date = date(2020, 1, 6)
+) -> Dict[date, List[Shift]]:
+    shifts = {}
+    for day_offset in range(num_days):
+        day = start + timedelta(days=day_offset)
+        shift_type = {5: ShiftType.SPECIAL_A, 6: ShiftType.SPECIAL_B}.get(
+            day.weekday(), ShiftType.STANDARD
+        )
+        shifts[day] = [
+            Shift(name=f"shift_{shift_idx}", shift_type=shift_type, day=day)
+            for shift_idx in range(shifts_per_day)
+        ]
+    return shifts
+
+
+def history(
+    people_: List[Person], num_days: int, start: date = date(2020, 1, 6), seed: int = 0
+) -> History:
+    """One past shift per day before start, assigned to a random person"""
+    rng = random.Random(seed)
+    past_shifts = []
+    for day_offset in range(1, num_days + 1):
+        day = start - timedelta(days=day_offset)
+        shift_type = {5: ShiftType.SPECIAL_A, 6: ShiftType.SPECIAL_B}.get(
+            day.weekday(), ShiftType.STANDARD
+        )
+        past_shifts.append(
+            AssignedShift(
+                name="shift_0",
+                shift_type=shift_type,
+                day=day,
+                person=rng.choice(people_),
+            )
+        )
+    return History.build(past_shifts=past_shifts)
+
+
+# Every configurable constraint, in the order of their priorities
+CONSTRAINT_MIX = (
+    "EachPersonWorksAtMostXShiftsPerAssignmentPeriod",
+    "ThereShouldBeAtLeastXDaysBetweenOps",
+    "ThereShouldBeAtLeastXDaysBetweenOpsOfShiftTypes",
+    "RespectPersonRestrictionsPerShiftType",
+    "RespectPersonRestrictionsPerDay",
+)
+
+
+def constraints_json(
+    constraint_types: Sequence[str],
+    people_: List[Person],
+    shifts: Dict[date, List[Shift]],
+    max_shifts: int,
+    seed: int = 0,
+) -> List[Dict[str, Any]]:
+    """Constraints of the given types with priorities in the given order, none of them mandatory
+
+    Restrictions apply to a random tenth of people for weekend shifts and a random twentieth of days
+    for each person.
+    """
+    rng = random.Random(seed)
+    params = {
+        "EachPersonWorksAtMostXShiftsPerAssignmentPeriod": lambda: {
+            "x": max(1, max_shifts - 1)
+        },
+        "ThereShouldBeAtLeastXDaysBetweenOps": lambda: {"x": 2},
+        "ThereShouldBeAtLeastXDaysBetweenOpsOfShiftTypes": lambda: {
+            "x": 14,
+            "shift_types": ["special_a", "special_b"],
+        },
+        "RespectPersonRestrictionsPerShiftType": lambda: {
+            "forbidden_by_shift_type": {
+                shift_type: [
+                    person.name for person in rng.sample(people_, len(people_) // 10)
+                ]
+                for shift_type in ("special_a", "special_b")
+            }
+        },
+        "RespectPersonRestrictionsPerDay": lambda: {
+            "restrictions": {
+                person.name: [
+                    day.isoformat()
+                    for day in rng.sample(sorted(shifts.keys()), len(shifts) // 20)
+                ]
+                for person in people_
+            }
+        },
+    }
+    return [
+        {
+            "type": constraint_type,
+            "priority": priority,
+            "params": params[constraint_type](),
+        }
+        for priority, constraint_type in enumerate(constraint_types, start=1)
+    ]
+
+
+def config_json(
+    num_people: int,
+    num_days: int,
+    shifts_per_day: int,
+    max_shifts: int,
+    constraint_types: Sequence[str] = CONSTRAINT_MIX,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    people_ = people(num_people)
+    shifts = shifts_by_day(num_days, shifts_per_day)
+    return {
+        "shifts": [
+            shift.to_json() for day_shifts in shifts.values() for shift in day_shifts
+        ],
+        "people": [{"name": person.name} for person in people_],
+        "max_shifts_per_person": max_shifts,
+        "objective": "RankingWeight",
+        "constraints": constraints_json(
+            constraint_types, people_, shifts, max_shifts, seed
+        ),
+    }
+
+
+def history_json(num_people: int, num_days: int, seed: int = 0) -> Dict[str, Any]:
+    past_shifts = history(people(num_people), num_days, seed=seed).past_shifts
+    return {"offsets": [], "shifts": [shift.to_json() for shift in past_shifts]}
@@ -0,0 +1,102 @@
+"""Peak memory benchmark for building and running the model
+
+Each measurement runs in a fresh interpreter so peak RSS is not polluted by previous runs. The
+reported baseline is the peak RSS once all modules are imported and the inputs generated, so the
+difference to the final peak is what `Config.build` and `_run` cost.
+
+Run it on two revisions to compare before and after a change:
+
+    python -m benchmarks.memory --people 60 --days 90 --shifts-per-day 2 --max-shifts 4
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+
+
+def peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def measure(num_people, num_days, shifts_per_day, max_shifts, history_days, named):
+    import logging
+
+    from or_shifty.config import Config
+    from or_shifty.model import _constraints, _run
+    from or_shifty.objective import RankingWeight
+
+    from benchmarks import instances
+
+    people = instances.people(num_people)
+    shifts = instances.shifts_by_day(num_days, shifts_per_day)
+    history = instances.history(people, history_days)
+    if named:
+        # Variables are only named when debug logging is enabled
+        logging.getLogger("or_shifty.model").setLevel(logging.DEBUG)
+    baseline = peak_rss_bytes()
+
+    config = Config.build(
+        people=people,
+        max_shifts_per_person=max_shifts,
+        shifts_by_day=shifts,
+        history=history,
+    )
+    _run(config, RankingWeight(), _constraints([], config))
+
+    return {
+        "people": num_people,
+        "days": num_days,
+        "shifts_per_day": shifts_per_day,
+        "max_shifts_per_person": max_shifts,
+        "history_days": history_days,
+        "named_variables": named,
+        "variables": len(config.indexer),
+        "baseline_peak_rss_bytes": baseline,
+        "peak_rss_bytes": peak_rss_bytes(),
+    }
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--people", type=int, default=60)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--shifts-per-day", type=int, default=2)
+    parser.add_argument("--max-shifts", type=int, default=4)
+    parser.add_argument("--history-days", type=int, default=365)
+    parser.add_argument(
+        "--named",
+        action="store_true",
+        default=False,
+        help="Give every solver variable a descriptive name as in debug mode",
+    )
+    parser.add_argument(
+        "--in-process", action="store_true", default=False, help=argparse.SUPPRESS
+    )
+    parsed = parser.parse_args(args)
+
+    if parsed.in_process:
+        result = measure(
+            parsed.people,
+            parsed.days,
+            parsed.shifts_per_day,
+            parsed.max_shifts,
+            parsed.history_days,
+            parsed.named,
+        )
+        print(json.dumps(result))
+        return
+
+    argv = sys.argv[1:] if args is None else list(args)
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.memory", "--in-process"] + argv,
+        check=True,
+        stdout=subprocess.PIPE,
+    ).stdout
+    print(json.dumps(json.loads(output), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""Phase timing benchmark for parsing, building, solving and writing synthetic instances
+
+Generates a config and history of the given size and constraint mix, runs shifty on them the same way
+the command line does and records the time taken by each phase: parsing inputs, building the config
+and indexer, generating each constraint, building the objective, solving, validating the solution
+and writing the output. Phases are nested, e.g. building the indexer is part of building the config.
+
+Each run is written as json, so results can be compared across revisions:
+
+    python -m benchmarks.phases --people 60 --days 90 --results before.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks import instances
+
+
+def measure(
+    num_people,
+    num_days,
+    shifts_per_day,
+    max_shifts,
+    history_days,
+    constraint_types,
+    time_limit_seconds,
+    seed,
+):
+    from or_shifty.cli import _parse_inputs, _version, write_output
+    from or_shifty.config import Config
+    from or_shifty.instrumentation import StatsRecorder
+    from or_shifty.model import Infeasible, solve_with_violations
+
+    with tempfile.TemporaryDirectory() as directory:
+        config_path = os.path.join(directory, "config.json")
+        history_path = os.path.join(directory, "history.json")
+        output_path = os.path.join(directory, "output.json")
+        with open(config_path, "w") as f:
+            json.dump(
+                instances.config_json(
+                    num_people,
+                    num_days,
+                    shifts_per_day,
+                    max_shifts,
+                    constraint_types,
+                    seed,
+                ),
+                f,
+            )
+        with open(history_path, "w") as f:
+            json.dump(instances.history_json(num_people, history_days, seed), f)
+
+        start = time.perf_counter()
+        with StatsRecorder() as recorder:
+            inputs = _parse_inputs(
+                config_path=config_path,
+                history_path=history_path,
+                verbose=False,
+                output_path=output_path,
+                evaluate=False,
+                solver_overrides={"time_limit_seconds": time_limit_seconds},
+            )
+            config = Config.build(
+                people=inputs.people,
+                max_shifts_per_person=inputs.max_shifts_per_person,
+                shifts_by_day=inputs.shifts_by_day,
+                history=inputs.history,
+                formulation=inputs.formulation,
+            )
+            try:
+                solution, violations = solve_with_violations(
+                    config=config,
+                    objective=inputs.objective,
+                    constraints=inputs.constraints,
+                    parameters=inputs.solver_parameters,
+                )
+            except Infeasible:
+                solved, violations = False, []
+            else:
+                solved = True
+                write_output(output_path, solution)
+        seconds = time.perf_counter() - start
+
+    return {
+        "version": _version(),
+        "python": platform.python_version(),
+        "people": num_people,
+        "days": num_days,
+        "shifts_per_day": shifts_per_day,
+        "max_shifts_per_person": max_shifts,
+        "history_days": history_days,
+        "constraints": list(constraint_types),
+        "time_limit_seconds": time_limit_seconds,
+        "seed": seed,
+        "variables": len(config.indexer),
+        "solved": solved,
+        "violations": len(violations),
+        "seconds": seconds,
+        **recorder.to_json(),
+    }
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--people", type=int, default=60)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--shifts-per-day", type=int, default=2)
+    parser.add_argument("--max-shifts", type=int, default=4)
+    parser.add_argument("--history-days", type=int, default=365)
+    parser.add_argument(
+        "--constraints",
+        default=",".join(instances.CONSTRAINT_MIX),
+        help="Comma separated constraint types, in order of priority",
+    )
+    parser.add_argument(
+        "--time-limit",
+        type=float,
+        default=60.0,
+        help="Time limit of the solver in seconds",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--repeat", type=int, default=1, help="Number of times to run the benchmark"
+    )
+    parser.add_argument(
+        "--results",
+        default=None,
+        help="Path to json file in which to write the results instead of printing them",
+    )
+    parser.add_argument(
+        "--in-process", action="store_true", default=False, help=argparse.SUPPRESS
+    )
+    parsed = parser.parse_args(args)
+
+    if parsed.in_process:
+        result = measure(
+            parsed.people,
+            parsed.days,
+            parsed.shifts_per_day,
+            parsed.max_shifts,
+            parsed.history_days,
+            [c for c in parsed.constraints.split(",") if c],
+            parsed.time_limit,
+            parsed.seed,
+        )
+        print(json.dumps(result))
+        return
+
+    # Each run is in a fresh interpreter, so later runs do not benefit from warm caches
+    argv = sys.argv[1:] if args is None else list(args)
+    runs = []
+    for _ in range(parsed.repeat):
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.phases", "--in-process"] + argv,
+            check=True,
+            stdout=subprocess.PIPE,
+        ).stdout
+        runs.append(json.loads(output))
+
+    results = json.dumps({"runs": runs}, indent=2)
+    if parsed.results is None:
+        print(results)
+    else:
+        with open(parsed.results, "w") as f:
+            f.write(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,25 @@
 import logging
 import sys
+from contextlib import ExitStack
+from functools import partial
+from typing import TYPE_CHECKING, List, Tuple
 
-from or_shifty.cli import Inputs, InvalidInputs, parse_args, write_output
-from or_shifty.config import Config
-from or_shifty.model import Infeasible, evaluate, solve
+from or_shifty.cli import (
+    Inputs,
+    InvalidInputs,
+    parse_args,
+    parse_profile_path,
+    write_output,
+    write_stats,
+)
+from or_shifty.instrumentation import StatsRecorder
+from or_shifty.shift import AssignedShift
+
+# Each mode imports the modules that build and solve models itself, so they are only loaded once the
+# arguments have been parsed
+if TYPE_CHECKING:
+    from or_shifty.config import Config
+    from or_shifty.model import Violation
 
 logging.basicConfig(
     stream=sys.stderr, level=logging.INFO, format="%(levelname)-7s - %(message)s",
@@ -12,49 +28,259 @@ log = logging.getLogger(__name__)
 
 
 def main() -> None:
-    inputs = parse_args()
-    configure_logging(inputs.verbose)
-    config = Config.build(
+    if sys.argv[1:2] == ["batch"]:
+        batch_mode(sys.argv[2:])
+        return
+    if sys.argv[1:2] == ["serve"]:
+        serve_mode(sys.argv[2:])
+        return
+    if sys.argv[1:2] == ["replay"]:
+        replay_mode(sys.argv[2:])
+        return
+
+    with ExitStack() as stack:
+        # Profiling starts before the arguments are parsed so that parsing the inputs is profiled too.
+        # Profiles are written even if the run fails
+        profile_path = parse_profile_path()
+        if profile_path is not None:
+            from or_shifty.profiling import ProfileRecorder
+
+            profiler = ProfileRecorder()
+            stack.callback(profiler.write, profile_path)
+            stack.enter_context(profiler)
+
+        # Parsing is recorded before it is known whether stats are wanted, it is cheap enough to always be
+        recorder = StatsRecorder()
+        with recorder:
+            inputs = parse_args()
+        configure_logging(inputs.verbose)
+
+        if inputs.stats_path is None and inputs.export_model_path is None:
+            run(inputs)
+            return
+
+        recording_mode(inputs, recorder)
+
+
+def recording_mode(inputs: Inputs, recorder: StatsRecorder) -> None:
+    """Run while recording the stats and models asked for, which are written even if the run fails"""
+    with ExitStack() as stack:
+        if inputs.export_model_path is not None:
+            from or_shifty.replay import ModelExporter
+
+            exporter = ModelExporter()
+            stack.callback(exporter.write, inputs.export_model_path)
+            stack.enter_context(exporter)
+
+        if inputs.stats_path is not None:
+            stack.callback(write_stats, inputs.stats_path, recorder)
+            stack.enter_context(recorder)
+
+        run(inputs)
+
+
+def run(inputs: Inputs) -> None:
+    # A rolling horizon builds a config per window, rather than one for the whole period
+    if inputs.rolling_horizon_days is not None and not inputs.evaluate:
+        rolling_horizon_mode(inputs)
+        return
+
+    if inputs.evaluate:
+        evaluation_mode(inputs, build_config(inputs))
+    else:
+        solving_mode(inputs)
+
+
+def build_config(inputs: Inputs) -> "Config":
+    from or_shifty.config import Config
+
+    return Config.build(
         people=inputs.people,
         max_shifts_per_person=inputs.max_shifts_per_person,
         shifts_by_day=inputs.shifts_by_day,
         history=inputs.history,
+        formulation=inputs.formulation,
     )
 
-    if inputs.evaluate:
-        evaluation_mode(inputs, config)
-    else:
-        solving_mode(inputs, config)
 
+def evaluation_mode(inputs: Inputs, config: "Config") -> None:
+    from or_shifty.model import Infeasible, SolverError, evaluate
 
-def evaluation_mode(inputs: Inputs, config: Config) -> None:
     try:
         evaluate(
             config=config,
             objective=inputs.objective,
             constraints=inputs.constraints,
             solution=inputs.output,
+            parameters=inputs.solver_parameters,
         )
     except Infeasible:
         log.error("The provided output is infeasible for the solver")
         exit(1)
+    except SolverError as e:
+        log.error(str(e))
+        exit(1)
     except InvalidInputs as e:
         log.error(e.msg)
         exit(1)
 
 
-def solving_mode(inputs: Inputs, config: Config) -> None:
+def solving_mode(inputs: Inputs) -> None:
+    if inputs.cache_dir is None:
+        solution, _ = solve_inputs(inputs)
+    else:
+        solution = cached_solve_inputs(inputs)
+
+    if inputs.output_path is not None:
+        write_output(inputs.output_path, solution)
+
+
+def cached_solve_inputs(inputs: Inputs) -> List[AssignedShift]:
+    """Solve, unless the same inputs have been solved before, in which case the solution and the
+    constraints it violates are read from the cache without building a model
+    """
+    from or_shifty.cache import CachedResult, ResultCache, cache_key
+
+    cache = ResultCache(inputs.cache_dir)
+    key = cache_key(inputs)
+    cached = cache.get(key)
+    if cached is not None:
+        log.info("Using the solution cached for these inputs in %s", inputs.cache_dir)
+        cached.log_violations()
+        return cached.solution
+
+    solution, violations = solve_inputs(inputs)
+    cache.put(key, CachedResult.build(solution, violations))
+    return solution
+
+
+def solve_inputs(inputs: Inputs) -> Tuple[List[AssignedShift], List["Violation"]]:
+    from or_shifty.model import Infeasible, SolverError, solve_with_violations
+
+    config = build_config(inputs)
+    try:
+        if inputs.decompose:
+            from or_shifty.decomposition import solve_components
+
+            return solve_components(
+                config=config,
+                objective=inputs.objective,
+                constraints=inputs.constraints,
+                parameters=inputs.solver_parameters,
+                binary_search=inputs.binary_search,
+                soft=inputs.soft,
+                hint=inputs.hint,
+            )
+        return solve_with_violations(
+            config=config,
+            objective=inputs.objective,
+            constraints=inputs.constraints,
+            binary_search=inputs.binary_search,
+            soft=inputs.soft,
+            parallel=inputs.parallel,
+            on_solution=partial(write_output, inputs.output_path)
+            if inputs.anytime_output
+            else None,
+            parameters=inputs.solver_parameters,
+            hint=inputs.hint,
+        )
+    except Infeasible:
+        log.error("Unable to solve for the given constraints")
+        exit(1)
+    except SolverError as e:
+        log.error(str(e))
+        exit(1)
+
+
+def rolling_horizon_mode(inputs: Inputs) -> None:
+    from or_shifty.model import Infeasible, SolverError
+    from or_shifty.rolling_horizon import compare_with_monolithic
+
     try:
-        solution = solve(
-            config=config, objective=inputs.objective, constraints=inputs.constraints,
+        solution, _ = compare_with_monolithic(
+            people=inputs.people,
+            max_shifts_per_person=inputs.max_shifts_per_person,
+            shifts_by_day=inputs.shifts_by_day,
+            history=inputs.history,
+            window_days=inputs.rolling_horizon_days,
+            overlap_days=inputs.overlap_days,
+            objective=inputs.objective,
+            constraints=inputs.constraints,
+            formulation=inputs.formulation,
+            parameters=inputs.solver_parameters,
+            monolithic=inputs.compare_monolithic,
+            binary_search=inputs.binary_search,
+            soft=inputs.soft,
+            parallel=inputs.parallel,
+            hint=inputs.hint,
         )
     except Infeasible:
         log.error("Unable to solve for the given constraints")
         exit(1)
+    except SolverError as e:
+        log.error(str(e))
+        exit(1)
     else:
         if inputs.output_path is not None:
             write_output(inputs.output_path, solution)
 
 
+def batch_mode(args) -> None:
+    from or_shifty.batch import SOLVED, parse_batch_args, run_batch, write_summary
+
+    try:
+        inputs = parse_batch_args(args)
+    except InvalidInputs as e:
+        log.error(e.msg)
+        exit(1)
+    configure_logging(inputs.verbose)
+
+    results = run_batch(
+        inputs.jobs,
+        processes=inputs.processes,
+        solver_overrides=inputs.solver_overrides,
+    )
+    if inputs.summary_path is not None:
+        write_summary(inputs.summary_path, results)
+
+    failed = [result for result in results if result.status != SOLVED]
+    log.info("Solved %s of %s jobs", len(results) - len(failed), len(results))
+    if failed:
+        exit(1)
+
+
+def serve_mode(args) -> None:
+    from or_shifty.server import parse_serve_args, serve
+
+    parsed_args = parse_serve_args(args)
+    configure_logging(parsed_args.verbose)
+    serve(parsed_args)
+
+
+def replay_mode(args) -> None:
+    from or_shifty.replay import parse_replay_args, replay
+
+    try:
+        inputs = parse_replay_args(args)
+    except InvalidInputs as e:
+        log.error(e.msg)
+        exit(1)
+    configure_logging(inputs.verbose)
+
+    recorder = StatsRecorder()
+    try:
+        with recorder:
+            solution = replay(inputs.models, inputs.solver_overrides)
+    finally:
+        if inputs.stats_path is not None:
+            write_stats(inputs.stats_path, recorder)
+
+    if solution is None:
+        log.error("None of the models are feasible")
+        exit(1)
+    if inputs.output_path is not None:
+        write_output(inputs.output_path, solution)
+
+
 def configure_logging(verbose=False):
     logging.getLogger().setLevel(logging.DEBUG if verbose else logging.INFO)
@@ -0,0 +1,282 @@
+import argparse
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, Dict, List, Optional
+
+from or_shifty.cli import InvalidInputs, _parse_inputs, write_output
+from or_shifty.config import Config
+from or_shifty.instrumentation import Recorder, SolveStats
+from or_shifty.model import Infeasible, solve_with_violations
+
+log = logging.getLogger(__name__)
+
+SOLVED = "solved"
+INFEASIBLE = "infeasible"
+FAILED = "failed"
+
+
+@dataclass(frozen=True)
+class Job:
+    name: str
+    config_path: str
+    history_path: str
+    output_path: str
+
+    @classmethod
+    def from_json(cls, job: Dict[str, str], base_dir: str = "") -> "Job":
+        """Paths in the manifest are relative to the directory the manifest is in"""
+        return cls(
+            name=job.get("name", job["config"]),
+            config_path=os.path.join(base_dir, job["config"]),
+            history_path=os.path.join(base_dir, job["history"]),
+            output_path=os.path.join(base_dir, job["output"]),
+        )
+
+
+@dataclass(frozen=True)
+class JobResult:
+    job: Job
+    status: str
+    parse_seconds: float
+    solve_seconds: float
+    dropped_constraints: List[str]
+    error: Optional[str] = None
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "name": self.job.name,
+            "config": self.job.config_path,
+            "history": self.job.history_path,
+            "output": self.job.output_path,
+            "status": self.status,
+            "parse_seconds": self.parse_seconds,
+            "solve_seconds": self.solve_seconds,
+            "dropped_constraints": self.dropped_constraints,
+            "error": self.error,
+        }
+
+    def __str__(self):
+        result = (
+            f"{self.job.name}: {self.status} in {self.parse_seconds + self.solve_seconds:.2f} "
+            f"seconds"
+        )
+        if self.dropped_constraints:
+            result += f", dropped {', '.join(self.dropped_constraints)}"
+        if self.error is not None:
+            result += f", {self.error}"
+        return result
+
+
+class _SolvedTiersRecorder(Recorder):
+    """Keep the priority tiers of the last solve that found a solution"""
+
+    def __init__(self):
+        self.priorities: Optional[List[int]] = None
+
+    def record_solve(self, stats: SolveStats) -> None:
+        if stats.status in ("OPTIMAL", "FEASIBLE"):
+            self.priorities = stats.priorities
+
+
+@dataclass(frozen=True)
+class BatchInputs:
+    jobs: List[Job]
+    processes: Optional[int]
+    summary_path: Optional[str]
+    verbose: bool
+    solver_overrides: Dict[str, Any]
+
+
+def parse_batch_args(args=None) -> BatchInputs:
+    parser = argparse.ArgumentParser(
+        prog="shifty batch",
+        description="Solve many rotas, each with its own config, history and output, in one process pool",
+    )
+    parser.add_argument(
+        "--manifest",
+        dest="manifest",
+        action="store",
+        required=True,
+        help="Path to json file listing the config, history and output paths of each job",
+    )
+    parser.add_argument(
+        "--processes",
+        dest="processes",
+        type=int,
+        default=None,
+        help="Number of jobs to solve at once, defaults to the number of cores",
+    )
+    parser.add_argument(
+        "--summary",
+        dest="summary",
+        action="store",
+        default=None,
+        help="Path to file in which to write the status, timings and dropped constraints of each job",
+    )
+    parser.add_argument(
+        "--workers",
+        dest="workers",
+        type=int,
+        default=None,
+        help="Number of search workers for each job, overriding their configs. Keep this times "
+        "--processes at most the number of cores",
+    )
+    parser.add_argument(
+        "-v",
+        dest="verbose",
+        action="store_true",
+        default=False,
+        help="Change the log level to debug",
+    )
+
+    parsed_args = parser.parse_args(args)
+
+    if parsed_args.processes is not None and parsed_args.processes < 1:
+        raise InvalidInputs("Batch must run at least one process")
+
+    return BatchInputs(
+        jobs=read_manifest(parsed_args.manifest),
+        processes=parsed_args.processes,
+        summary_path=parsed_args.summary,
+        verbose=parsed_args.verbose,
+        solver_overrides={"workers": parsed_args.workers},
+    )
+
+
+def read_manifest(manifest_path: str) -> List[Job]:
+    with open(manifest_path, "r") as f:
+        manifest = json.load(f)
+    base_dir = os.path.dirname(manifest_path)
+    jobs = [Job.from_json(job, base_dir) for job in manifest["jobs"]]
+
+    outputs = [job.output_path for job in jobs]
+    if len(set(outputs)) != len(outputs):
+        raise InvalidInputs("Every job in a batch must have its own output path")
+    return jobs
+
+
+def write_summary(summary_path: str, results: List[JobResult]) -> None:
+    log.info("Writing batch summary to %s...", summary_path)
+    with open(summary_path, "w") as f:
+        json.dump({"jobs": [result.to_json() for result in results]}, f, indent=2)
+
+
+def run_batch(
+    jobs: List[Job],
+    processes: Optional[int] = None,
+    solver_overrides: Optional[Dict[str, Any]] = None,
+) -> List[JobResult]:
+    """Solve every job in a process pool and return their results in the same order
+
+    The pool pays for interpreter startup and importing the solver once per process rather than once
+    per job. A job that fails, or is infeasible, does not stop the others. Nor does a job that kills
+    the process solving it: that breaks the pool, so the jobs that had not finished are solved again
+    in a process each.
+    """
+    processes = min(len(jobs), processes or os.cpu_count() or 1)
+    log.info("Solving %s jobs in %s processes", len(jobs), processes)
+    if not jobs:
+        return []
+
+    results: Dict[int, JobResult] = {}
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = [executor.submit(_run_job, job, solver_overrides) for job in jobs]
+        for index, (job, future) in enumerate(zip(jobs, futures)):
+            try:
+                results[index] = future.result()
+            except BrokenProcessPool:
+                # Every unfinished job fails with the pool, so which one killed its process is unknown
+                continue
+            except Exception as e:
+                results[index] = JobResult(job, FAILED, 0.0, 0.0, [], error=repr(e))
+            log.info(str(results[index]))
+
+    unfinished = [index for index in range(len(jobs)) if index not in results]
+    if unfinished:
+        log.warning(
+            "A process solving jobs died, solving the %s unfinished jobs in a process each",
+            len(unfinished),
+        )
+        with ThreadPoolExecutor(max_workers=processes) as threads:
+            isolated = threads.map(
+                partial(_run_job_in_own_process, solver_overrides=solver_overrides),
+                [jobs[index] for index in unfinished],
+            )
+            for index, result in zip(unfinished, isolated):
+                log.info(str(result))
+                results[index] = result
+
+    return [results[index] for index in range(len(jobs))]
+
+
+def _run_job_in_own_process(
+    job: Job, solver_overrides: Optional[Dict[str, Any]]
+) -> JobResult:
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        try:
+            return executor.submit(_run_job, job, solver_overrides).result()
+        except Exception as e:  # e.g. the process running the job was killed
+            return JobResult(job, FAILED, 0.0, 0.0, [], error=repr(e))
+
+
+def _run_job(job: Job, solver_overrides: Optional[Dict[str, Any]]) -> JobResult:
+    start = time.perf_counter()
+    try:
+        inputs = _parse_inputs(
+            config_path=job.config_path,
+            history_path=job.history_path,
+            verbose=False,
+            output_path=job.output_path,
+            evaluate=False,
+            solver_overrides=solver_overrides,
+        )
+        config = Config.build(
+            people=inputs.people,
+            max_shifts_per_person=inputs.max_shifts_per_person,
+            shifts_by_day=inputs.shifts_by_day,
+            history=inputs.history,
+            formulation=inputs.formulation,
+        )
+    except Exception as e:
+        log.exception("Unable to parse the inputs of %s", job.name)
+        return JobResult(
+            job, FAILED, time.perf_counter() - start, 0.0, [], error=repr(e)
+        )
+    parsed = time.perf_counter()
+    parse_seconds = parsed - start
+
+    try:
+        with _SolvedTiersRecorder() as tiers:
+            solution, _ = solve_with_violations(
+                config=config,
+                objective=inputs.objective,
+                constraints=inputs.constraints,
+                parameters=inputs.solver_parameters,
+            )
+        write_output(job.output_path, solution)
+    except Infeasible:
+        log.error("Unable to solve %s for the given constraints", job.name)
+        return JobResult(
+            job, INFEASIBLE, parse_seconds, time.perf_counter() - parsed, []
+        )
+    except Exception as e:
+        log.exception("Unable to solve %s", job.name)
+        return JobResult(
+            job, FAILED, parse_seconds, time.perf_counter() - parsed, [], error=repr(e),
+        )
+
+    # Constraints of the tiers dropped to find the solution, whether or not the solution violates them
+    dropped = sorted(
+        {
+            str(constraint)
+            for constraint in inputs.constraints
+            if constraint.priority not in tiers.priorities
+        }
+    )
+    return JobResult(job, SOLVED, parse_seconds, time.perf_counter() - parsed, dropped)
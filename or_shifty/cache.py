@@ -0,0 +1,256 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import time
+from dataclasses import dataclass, fields, is_dataclass
+from datetime import date
+from enum import Enum
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from or_shifty.cli import _version
+from or_shifty.person import Person
+from or_shifty.shift import AssignedShift, Shift
+
+if TYPE_CHECKING:
+    from or_shifty.cli import Inputs
+    from or_shifty.model import Violation
+
+log = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 256 * 2 ** 20
+DEFAULT_MAX_AGE_SECONDS = 30 * 24 * 60 * 60
+# Only files named like the cache's own entries and temporary files are ever evicted, as the cache
+# directory may hold other files, e.g. with --cache-dir .
+ENTRY_NAME = re.compile(r"[0-9a-f]{64}\.json")
+TEMPORARY_NAME = re.compile(r"\.[0-9a-f]{64}\.[^.]+\.tmp")
+# Everything about the inputs that can change the solution
+KEYED_FIELDS = (
+    "people",
+    "max_shifts_per_person",
+    "formulation",
+    "shifts_by_day",
+    "objective",
+    "constraints",
+    "history",
+    "hint",
+    "solver_parameters",
+    "binary_search",
+    "soft",
+    "parallel",
+    "decompose",
+)
+
+
+def default_cache_dir() -> str:
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(base, "or-shifty")
+
+
+def cache_key(inputs: "Inputs") -> str:
+    """A hash of the parsed inputs, so the formatting and key order of config and history files do not
+    change it, and of the version of shifty that solves them
+    """
+    canonical = {name: _canonical(getattr(inputs, name)) for name in KEYED_FIELDS}
+    canonical["version"] = _version()
+    serialised = json.dumps(canonical, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(serialised.encode("utf-8")).hexdigest()
+
+
+def _canonical(value: Any) -> Any:
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, Enum):
+        return value.name
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Person):
+        return value.name
+    if isinstance(value, Shift):
+        return value.to_json()
+    if isinstance(value, dict):
+        return sorted(
+            ([_canonical(k), _canonical(v)] for k, v in value.items()), key=json.dumps
+        )
+    if isinstance(value, (set, frozenset)):
+        return sorted((_canonical(v) for v in value), key=json.dumps)
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if is_dataclass(value):
+        return {
+            "type": type(value).__name__,
+            **{f.name: _canonical(getattr(value, f.name)) for f in fields(value)},
+        }
+    # Constraints, objectives and formulations keep their parameters as attributes
+    if hasattr(value, "__dict__"):
+        return {"type": type(value).__name__, "attributes": _canonical(vars(value))}
+    raise TypeError(f"Cannot work out a cache key for {type(value).__name__}")
+
+
+@dataclass(frozen=True)
+class CachedResult:
+    solution: List[AssignedShift]
+    violations: List[Dict[str, Any]]
+
+    @classmethod
+    def build(
+        cls, solution: List[AssignedShift], violations: List["Violation"]
+    ) -> "CachedResult":
+        return cls(
+            solution=solution,
+            violations=[violation.to_json() for violation in violations],
+        )
+
+    @classmethod
+    def from_json(cls, serialised: Dict[str, Any]) -> "CachedResult":
+        return cls(
+            solution=[AssignedShift.from_json(shift) for shift in serialised["shifts"]],
+            violations=serialised["violations"],
+        )
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "shifts": [shift.to_json() for shift in self.solution],
+            "violations": self.violations,
+        }
+
+    def log_violations(self) -> None:
+        for violation in self.violations:
+            impact = []
+            if violation["person"] is not None:
+                impact.append(f"affecting {violation['person']}")
+            if violation["day"] is not None:
+                impact.append(f"on {violation['day']}")
+            log.warning(
+                "Solution violates constraint %s %s",
+                violation["constraint"],
+                " ".join(impact),
+            )
+
+
+class ResultCache:
+    """Solutions stored on disk in a file per cache key
+
+    Using an entry updates its modification time. Entries that have not been used for max_age_seconds
+    are evicted, then the least recently used ones until the rest take up at most max_bytes. A cache
+    directory that cannot be read or written is logged and otherwise treated as an empty cache.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        max_age_seconds: float = DEFAULT_MAX_AGE_SECONDS,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+
+    def get(self, key: str) -> Optional[CachedResult]:
+        path = self._path(key)
+        try:
+            age = time.time() - os.stat(path).st_mtime
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            log.warning("Not using the cache, cannot read %s: %s", path, e)
+            return None
+        if age > self.max_age_seconds:
+            _remove(path)
+            return None
+
+        try:
+            with open(path, "r") as f:
+                result = CachedResult.from_json(json.load(f))
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            log.warning("Not using the cache, cannot read %s: %s", path, e)
+            return None
+        except (ValueError, KeyError) as e:
+            log.warning("Removing unreadable cache entry %s: %r", path, e)
+            _remove(path)
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return result
+
+    def put(self, key: str, result: CachedResult) -> None:
+        try:
+            self._write(key, result)
+        except OSError as e:
+            log.warning(
+                "Not caching the solution, cannot write to %s: %s", self.directory, e
+            )
+            return
+        self.evict()
+
+    def _write(self, key: str, result: CachedResult) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        # Written to a temporary file first so concurrent runs never read a partly written entry
+        with tempfile.NamedTemporaryFile(
+            "w", dir=self.directory, prefix=f".{key}.", suffix=".tmp", delete=False
+        ) as f:
+            try:
+                json.dump(result.to_json(), f)
+            except OSError:
+                f.close()
+                _remove(f.name)
+                raise
+        try:
+            os.replace(f.name, self._path(key))
+        except OSError:
+            _remove(f.name)
+            raise
+
+    def evict(self) -> None:
+        now = time.time()
+        entries = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError as e:
+            log.warning(
+                "Not evicting cache entries, cannot list %s: %s", self.directory, e
+            )
+            return
+        for name in names:
+            is_entry = ENTRY_NAME.fullmatch(name) is not None
+            if not is_entry and TEMPORARY_NAME.fullmatch(name) is None:
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            # Temporary files are only evicted by age, in case they are still being written
+            if now - stat.st_mtime > self.max_age_seconds:
+                _remove(path)
+            elif is_entry:
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            log.debug("Evicting cache entry %s", path)
+            _remove(path)
+            total_bytes -= size
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        log.warning("Cannot remove cache entry %s: %s", path, e)
@@ -1,17 +1,23 @@
 import argparse
 import json
 import logging
+import os
 from dataclasses import dataclass
 from datetime import date, datetime
-from typing import Dict, List, Optional
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
 
-import pkg_resources
-
-from or_shifty.constraints import CONSTRAINTS, Constraint
 from or_shifty.history import History, PastShiftOffset
-from or_shifty.objective import OBJECTIVE_FUNCTIONS, Objective
+from or_shifty.instrumentation import StatsRecorder, phase
 from or_shifty.person import Person
 from or_shifty.shift import AssignedShift, Shift, ShiftType
+from or_shifty.solver_parameters import SolverParameters
+
+# Constraints, formulations and objectives import ortools and numpy, which take most of shifty's startup
+# time. They are only imported once config is parsed, so --help, --version and invalid arguments are fast
+if TYPE_CHECKING:
+    from or_shifty.constraints import Constraint
+    from or_shifty.formulation import Formulation
+    from or_shifty.objective import Objective
 
 log = logging.getLogger(__name__)
 
@@ -25,23 +31,38 @@ class InvalidInputs(Exception):
 class Inputs:
     people: List[Person]
     max_shifts_per_person: int
+    formulation: "Formulation"
     shifts_by_day: Dict[date, List[Shift]]
-    objective: Objective
-    constraints: List[Constraint]
+    objective: "Objective"
+    constraints: List["Constraint"]
     history: History
     verbose: bool
     output_path: Optional[str]
     evaluate: bool
     output: Optional[List[AssignedShift]]
+    binary_search: bool
+    soft: bool
+    parallel: bool
+    anytime_output: bool
+    decompose: bool
+    rolling_horizon_days: Optional[int]
+    overlap_days: int
+    compare_monolithic: bool
+    stats_path: Optional[str]
+    profile_path: Optional[str]
+    export_model_path: Optional[str]
+    # Directory of the result cache, None to always solve
+    cache_dir: Optional[str]
+    solver_parameters: SolverParameters
+    hint: Optional[List[AssignedShift]]
 
 
 def parse_args(args=None) -> Inputs:
     parser = argparse.ArgumentParser(
         description="Automatic ops shift allocator using constraint solver"
     )
-    version = pkg_resources.get_distribution("or-shifty").version
     parser.add_argument(
-        "--version", action="version", version=version,
+        "--version", action=_VersionAction,
     )
     parser.add_argument(
         "--config",
@@ -81,58 +102,419 @@ def parse_args(args=None) -> Inputs:
         "the score of the objective function and any violated constraints. When used "
         "--output must also be provided",
     )
+    parser.add_argument(
+        "--anytime-output",
+        dest="anytime_output",
+        action="store_true",
+        default=False,
+        help="Rewrite --output with every better solution found while solving, so the best solution so "
+        "far is kept if the run is stopped",
+    )
+    parser.add_argument(
+        "--hint",
+        dest="hint",
+        action="store",
+        default=None,
+        help="Path to the output of an earlier run to use as a starting point for the solver. The "
+        "shifts in it do not all need to match those in config",
+    )
+    parser.add_argument(
+        "--stats",
+        dest="stats",
+        action="store",
+        default=None,
+        help="Path to file in which to write the time, CPU time and peak memory of each phase, the size "
+        "of each constraint and the statistics of each solve. Work done in other processes, e.g. with "
+        "--parallel-tiers or --decompose, is not included",
+    )
+    parser.add_argument(
+        "--profile",
+        dest="profile",
+        action="store",
+        default=None,
+        help="Path to directory in which to write a cProfile dump for each of parsing inputs, building "
+        "the config, building the model, generating each constraint, solving and post processing, "
+        "and collapsed stacks of them all for flame graph tools",
+    )
+    parser.add_argument(
+        "--export-model",
+        dest="export_model",
+        action="store",
+        default=None,
+        help="Path to file in which to write the solver model of every set of priority tiers solved "
+        "for, and which variable is which shift, to solve again with shifty replay",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        dest="cache_dir",
+        action="store",
+        default=None,
+        help="Directory in which to cache solutions by their inputs, defaults to or-shifty in the user's "
+        "cache directory",
+    )
+    parser.add_argument(
+        "--no-cache",
+        dest="no_cache",
+        action="store_true",
+        default=False,
+        help="Always solve, rather than using the cached solution of the same inputs",
+    )
+    parser.add_argument(
+        "--decompose",
+        dest="decompose",
+        action="store_true",
+        default=False,
+        help="Split the rota into groups of people who can only be assigned to shifts nobody else can "
+        "be assigned to, and solve each group separately in parallel",
+    )
+
+    retries = parser.add_mutually_exclusive_group()
+    retries.add_argument(
+        "--binary-search",
+        dest="binary_search",
+        action="store_true",
+        default=False,
+        help="If the constraints cannot all be met, binary search for the constraint priorities to drop "
+        "instead of dropping one priority at a time. This needs fewer solver runs when there are many "
+        "distinct priorities and drops the same constraints",
+    )
+    retries.add_argument(
+        "--soft-constraints",
+        dest="soft",
+        action="store_true",
+        default=False,
+        help="Instead of dropping whole constraints when they cannot all be met, allow individual "
+        "instances of constraints with a priority other than 0 to be violated, preferring to violate "
+        "the least important ones, and solve only once",
+    )
+    retries.add_argument(
+        "--parallel-tiers",
+        dest="parallel",
+        action="store_true",
+        default=False,
+        help="Solve with every set of constraint priorities that could be dropped at once in separate "
+        "processes, instead of one after another. This drops the same constraints",
+    )
+
+    rolling_horizon = parser.add_argument_group(
+        "rolling horizon",
+        "Solve long periods in shorter overlapping windows, one after another",
+    )
+    rolling_horizon.add_argument(
+        "--rolling-horizon",
+        dest="rolling_horizon_days",
+        type=int,
+        default=None,
+        help="Solve windows of this many days in order. The shifts committed in each window are added "
+        "to history for the next, and max_shifts_per_person applies to each window",
+    )
+    rolling_horizon.add_argument(
+        "--overlap",
+        dest="overlap_days",
+        type=int,
+        default=0,
+        help="Number of days at the end of each window that are solved for again in the next one",
+    )
+    rolling_horizon.add_argument(
+        "--compare-monolithic",
+        dest="compare_monolithic",
+        action="store_true",
+        default=False,
+        help="Also solve the whole period at once and report the time taken and objective of both",
+    )
+
+    add_solver_arguments(parser)
 
     parsed_args = parser.parse_args(args)
 
+    if parsed_args.no_cache:
+        cache_dir = None
+    else:
+        from or_shifty.cache import default_cache_dir
+
+        cache_dir = parsed_args.cache_dir or default_cache_dir()
+
     return _parse_inputs(
         config_path=parsed_args.config,
         history_path=parsed_args.history,
         verbose=parsed_args.verbose,
         output_path=parsed_args.output,
         evaluate=parsed_args.evaluate,
+        binary_search=parsed_args.binary_search,
+        soft=parsed_args.soft,
+        parallel=parsed_args.parallel,
+        anytime_output=parsed_args.anytime_output,
+        decompose=parsed_args.decompose,
+        rolling_horizon_days=parsed_args.rolling_horizon_days,
+        overlap_days=parsed_args.overlap_days,
+        compare_monolithic=parsed_args.compare_monolithic,
+        stats_path=parsed_args.stats,
+        profile_path=parsed_args.profile,
+        export_model_path=parsed_args.export_model,
+        cache_dir=cache_dir,
+        hint_path=parsed_args.hint,
+        solver_overrides=parse_solver_overrides(parsed_args),
     )
 
 
+def parse_profile_path(args=None) -> Optional[str]:
+    """The --profile directory, read on its own so that profiling can start before parse_args"""
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--profile", dest="profile", action="store", default=None)
+    parsed_args, _ = parser.parse_known_args(args)
+    return parsed_args.profile
+
+
+def add_solver_arguments(
+    parser: argparse.ArgumentParser,
+    description: str = "Override the solver parameters given in config",
+) -> None:
+    solver = parser.add_argument_group("solver parameters", description)
+    solver.add_argument(
+        "--workers",
+        dest="workers",
+        type=int,
+        default=None,
+        help="Number of parallel search workers, 0 to use every available core",
+    )
+    solver.add_argument(
+        "--time-limit",
+        dest="time_limit_seconds",
+        type=float,
+        default=None,
+        help="Stop searching after this many seconds and use the best solution found so far",
+    )
+    solver.add_argument(
+        "--relative-gap",
+        dest="relative_gap",
+        type=float,
+        default=None,
+        help="Stop searching once the best solution is within this fraction of the optimum",
+    )
+    solver.add_argument(
+        "--absolute-gap",
+        dest="absolute_gap",
+        type=float,
+        default=None,
+        help="Stop searching once the best solution's score is within this of the optimum",
+    )
+    solver.add_argument(
+        "--random-seed",
+        dest="random_seed",
+        type=int,
+        default=None,
+        help="Random seed for the solver's search",
+    )
+    solver.add_argument(
+        "--log-search-progress",
+        dest="log_search_progress",
+        action="store_true",
+        default=None,
+        help="Print the solver's search log",
+    )
+    solver.add_argument(
+        "--stall-time",
+        dest="stall_seconds",
+        type=float,
+        default=None,
+        help="Stop searching once no better solution has been found for this many seconds",
+    )
+
+
+def parse_solver_overrides(parsed_args: argparse.Namespace) -> Dict[str, Any]:
+    return {
+        "workers": parsed_args.workers,
+        "time_limit_seconds": parsed_args.time_limit_seconds,
+        "relative_gap": parsed_args.relative_gap,
+        "absolute_gap": parsed_args.absolute_gap,
+        "random_seed": parsed_args.random_seed,
+        "log_search_progress": parsed_args.log_search_progress,
+        "stall_seconds": parsed_args.stall_seconds,
+    }
+
+
+class _VersionAction(argparse.Action):
+    """Like argparse's version action, but only looks the version up when --version is given"""
+
+    def __init__(self, option_strings, dest=argparse.SUPPRESS, **kwargs):
+        super().__init__(
+            option_strings,
+            dest=dest,
+            default=argparse.SUPPRESS,
+            nargs=0,
+            help="show program's version number and exit",
+            **kwargs,
+        )
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        print(_version())
+        parser.exit()
+
+
+def _version() -> str:
+    try:
+        from importlib.metadata import version
+    except ImportError:  # Python 3.7
+        from pkg_resources import get_distribution
+
+        return get_distribution("or-shifty").version
+    return version("or-shifty")
+
+
 def _parse_inputs(
     config_path: str,
     history_path: str,
     verbose: bool,
     output_path: Optional[str],
     evaluate: bool,
+    binary_search: bool = False,
+    soft: bool = False,
+    parallel: bool = False,
+    anytime_output: bool = False,
+    decompose: bool = False,
+    rolling_horizon_days: Optional[int] = None,
+    overlap_days: int = 0,
+    compare_monolithic: bool = False,
+    stats_path: Optional[str] = None,
+    profile_path: Optional[str] = None,
+    export_model_path: Optional[str] = None,
+    cache_dir: Optional[str] = None,
+    hint_path: Optional[str] = None,
+    solver_overrides: Optional[Dict[str, Any]] = None,
 ) -> Inputs:
-    _validate_args(output_path, evaluate)
-
-    with open(config_path, "r") as f:
-        config = json.load(f)
+    _validate_args(
+        output_path,
+        evaluate,
+        anytime_output=anytime_output,
+        decompose=decompose,
+        parallel=parallel,
+        rolling_horizon=rolling_horizon_days is not None,
+    )
+    # Runs that are measured or compared always solve. Rolling horizons are not cached as they do not
+    # report the constraints their solution violates
+    if (
+        evaluate
+        or compare_monolithic
+        or rolling_horizon_days is not None
+        or stats_path is not None
+        or profile_path is not None
+        or export_model_path is not None
+    ):
+        cache_dir = None
+
+    with phase("parse_inputs"):
+        with open(config_path, "r") as f:
+            config = json.load(f)
+
+        with open(history_path, "r") as f:
+            history = json.load(f)
+
+        return parse_json_inputs(
+            config,
+            history,
+            output=read_output(output_path) if evaluate else None,
+            hint=read_output(hint_path) if hint_path is not None else None,
+            solver_overrides=solver_overrides,
+            verbose=verbose,
+            output_path=output_path,
+            evaluate=evaluate,
+            binary_search=binary_search,
+            soft=soft,
+            parallel=parallel,
+            anytime_output=anytime_output,
+            decompose=decompose,
+            rolling_horizon_days=rolling_horizon_days,
+            overlap_days=overlap_days,
+            compare_monolithic=compare_monolithic,
+            stats_path=stats_path,
+            profile_path=profile_path,
+            export_model_path=export_model_path,
+            cache_dir=cache_dir,
+        )
 
-    with open(history_path, "r") as f:
-        history = json.load(f)
 
+def parse_json_inputs(
+    config: Dict[str, Any],
+    history: Dict[str, Any],
+    output: Optional[List[AssignedShift]] = None,
+    hint: Optional[List[AssignedShift]] = None,
+    solver_overrides: Optional[Dict[str, Any]] = None,
+    verbose: bool = False,
+    output_path: Optional[str] = None,
+    evaluate: bool = False,
+    binary_search: bool = False,
+    soft: bool = False,
+    parallel: bool = False,
+    anytime_output: bool = False,
+    decompose: bool = False,
+    rolling_horizon_days: Optional[int] = None,
+    overlap_days: int = 0,
+    compare_monolithic: bool = False,
+    stats_path: Optional[str] = None,
+    profile_path: Optional[str] = None,
+    export_model_path: Optional[str] = None,
+    cache_dir: Optional[str] = None,
+) -> Inputs:
+    """Parse config and history that have already been loaded from json"""
     shifts_by_day = _parse_shifts_by_day(config)
 
-    if evaluate:
-        output = read_output(output_path)
+    if output is not None:
         _validate_evaluation_output(shifts_by_day, output)
-    else:
-        output = None
 
     return Inputs(
         people=_parse_people(config),
         max_shifts_per_person=_parse_max_shifts_per_person(config),
+        formulation=_parse_formulation(config),
         shifts_by_day=shifts_by_day,
         objective=_parse_objective(config),
         constraints=_parse_constraints(config),
         history=_parse_history(history),
+        output=output,
+        solver_parameters=_parse_solver_parameters(config).override(
+            **(solver_overrides or {})
+        ),
         verbose=verbose,
         output_path=output_path,
         evaluate=evaluate,
-        output=output,
+        binary_search=binary_search,
+        soft=soft,
+        parallel=parallel,
+        anytime_output=anytime_output,
+        decompose=decompose,
+        rolling_horizon_days=rolling_horizon_days,
+        overlap_days=overlap_days,
+        compare_monolithic=compare_monolithic,
+        stats_path=stats_path,
+        profile_path=profile_path,
+        export_model_path=export_model_path,
+        cache_dir=cache_dir,
+        hint=hint,
     )
 
 
-def _validate_args(output: Optional[str], evaluate: bool,) -> None:
+def _validate_args(
+    output: Optional[str],
+    evaluate: bool,
+    anytime_output: bool = False,
+    decompose: bool = False,
+    parallel: bool = False,
+    rolling_horizon: bool = False,
+) -> None:
     if evaluate and output is None:
         raise InvalidInputs("When in evaluate mode output path must be provided")
+    if anytime_output and output is None:
+        raise InvalidInputs(
+            "When writing anytime output an output path must be provided"
+        )
+    if decompose and (parallel or rolling_horizon):
+        raise InvalidInputs(
+            "Decomposing cannot be combined with parallel tiers or a rolling horizon"
+        )
+    # Solutions found in other processes or for a single window are not the solution being written
+    if anytime_output and (decompose or parallel or rolling_horizon):
+        raise InvalidInputs(
+            "Anytime output cannot be combined with decomposing, parallel tiers or a rolling horizon"
+        )
 
 
 def _validate_evaluation_output(
@@ -157,6 +539,18 @@ def _parse_max_shifts_per_person(config) -> int:
     return int(config["max_shifts_per_person"])
 
 
+def _parse_formulation(config) -> "Formulation":
+    from or_shifty.formulation import FORMULATIONS, SlotFormulation
+
+    if "formulation" not in config:
+        return SlotFormulation()
+    return FORMULATIONS[config["formulation"]]()
+
+
+def _parse_solver_parameters(config) -> SolverParameters:
+    return SolverParameters.from_json(config.get("solver", {}))
+
+
 def _parse_shifts_by_day(config) -> Dict[date, List[Shift]]:
     shifts = {}
 
@@ -172,11 +566,15 @@ def _parse_shifts_by_day(config) -> Dict[date, List[Shift]]:
     return shifts
 
 
-def _parse_objective(config) -> Objective:
+def _parse_objective(config) -> "Objective":
+    from or_shifty.objective import OBJECTIVE_FUNCTIONS
+
     return OBJECTIVE_FUNCTIONS[config["objective"]]()
 
 
-def _parse_constraints(config) -> List[Constraint]:
+def _parse_constraints(config) -> List["Constraint"]:
+    from or_shifty.constraints import CONSTRAINTS
+
     return [
         CONSTRAINTS[constraint["type"]](
             priority=constraint["priority"],
@@ -203,15 +601,31 @@ def _parse_history(history) -> History:
 def read_output(output_path: str) -> List[AssignedShift]:
     with open(output_path, "r") as f:
         output = json.load(f)
-    shifts = [AssignedShift.from_json(shift) for shift in output["shifts"]]
-    return shifts
+    return parse_output(output)
+
+
+def parse_output(output) -> List[AssignedShift]:
+    return [AssignedShift.from_json(shift) for shift in output["shifts"]]
+
+
+def output_json(solution: List[AssignedShift]) -> Dict[str, Any]:
+    return {"shifts": [assigned_shift.to_json() for assigned_shift in solution]}
 
 
 def write_output(output_path: str, solution: List[AssignedShift]):
     log.info("Writing solution to %s...", output_path)
-    solution_json = {
-        "shifts": [assigned_shift.to_json() for assigned_shift in solution]
-    }
-    with open(output_path, "w") as f:
-        json.dump(solution_json, f, indent=2)
+    with phase("write_output"):
+        solution_json = output_json(solution)
+        # Written to a temporary file first so a complete solution is always left at output_path, even
+        # if the run is stopped while writing
+        temporary_path = f"{output_path}.tmp"
+        with open(temporary_path, "w") as f:
+            json.dump(solution_json, f, indent=2)
+        os.replace(temporary_path, output_path)
     log.info("Solution written successfully")
+
+
+def write_stats(stats_path: str, recorder: StatsRecorder):
+    log.info("Writing stats to %s...", stats_path)
+    with open(stats_path, "w") as f:
+        json.dump(recorder.to_json(), f, indent=2)
@@ -2,9 +2,11 @@ from dataclasses import dataclass
 from datetime import date
 from typing import Dict, List
 
+from or_shifty.formulation import Formulation, SlotFormulation
 from or_shifty.history import History
 from or_shifty.history_metrics import HistoryMetrics
 from or_shifty.indexer import Indexer, PersonShift
+from or_shifty.instrumentation import phase
 from or_shifty.person import Person
 from or_shifty.shift import Shift
 
@@ -18,6 +20,7 @@ class Config:
     history: History
     history_metrics: HistoryMetrics
     now: date
+    formulation: Formulation
 
     @classmethod
     def build(
@@ -26,17 +29,23 @@ class Config:
         max_shifts_per_person: int,
         shifts_by_day: Dict[date, List[Shift]],
         history: History,
+        formulation: Formulation = SlotFormulation(),
     ):
-        now = min(shifts_by_day.keys())
-        return cls(
-            indexer=Indexer.build(people, max_shifts_per_person, shifts_by_day),
-            shifts_by_person={
-                person: [shift_idx for shift_idx in range(max_shifts_per_person)]
-                for person in people
-            },
-            shifts_by_day=dict(shifts_by_day),
-            max_shifts_per_person=max_shifts_per_person,
-            history=history,
-            history_metrics=HistoryMetrics.build(history, people, now),
-            now=now,
-        )
+        with phase("build_config"):
+            now = min(shifts_by_day.keys())
+            person_shifts = formulation.person_shifts(max_shifts_per_person)
+            with phase("build_indexer"):
+                indexer = Indexer.build(people, person_shifts, shifts_by_day)
+            return cls(
+                indexer=indexer,
+                shifts_by_person={
+                    person: [shift_idx for shift_idx in range(person_shifts)]
+                    for person in people
+                },
+                shifts_by_day=dict(shifts_by_day),
+                max_shifts_per_person=max_shifts_per_person,
+                history=history,
+                history_metrics=HistoryMetrics.build(history, people, now),
+                now=now,
+                formulation=formulation,
+            )
@@ -3,13 +3,29 @@ from collections import defaultdict
 from dataclasses import dataclass
 from datetime import date, datetime
 from itertools import product
-from typing import Dict, Generator, List, Optional, Set, Tuple
-
-from ortools.sat.python.cp_model import IntVar, LinearExpr
+from typing import (
+    Dict,
+    Generator,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
+
+from ortools.sat.python import cp_model
+from ortools.sat.python.cp_model import (
+    INT_MAX,
+    BoundedLinearExpression,
+    IntVar,
+)
 
 from or_shifty.config import Config
+from or_shifty.formulation import CompactFormulation, SlotFormulation
 from or_shifty.history_metrics import NEVER
-from or_shifty.indexer import Idx
+from or_shifty.indexer import Assignments, Cell
 from or_shifty.person import Person
 from or_shifty.shift import AssignedShift, Shift, ShiftType
 
@@ -29,6 +45,102 @@ class ConstraintImpact:
         return None
 
 
+@dataclass(frozen=True)
+class ExactlyOne:
+    literals: Sequence[IntVar]
+
+    def add(self, model: cp_model.CpModel) -> cp_model.Constraint:
+        if hasattr(model, "AddExactlyOne"):
+            return model.AddExactlyOne(list(self.literals))
+        # Older OR-Tools can solve exactly one constraints but has no method to add them
+        added = cp_model.Constraint(model.Proto().constraints)
+        model.Proto().constraints[added.Index()].exactly_one.literals.extend(
+            literal.Index() for literal in self.literals
+        )
+        return added
+
+    def linear(self) -> "Linear":
+        return Linear(self.literals, [1] * len(self.literals), 1, 1)
+
+
+@dataclass(frozen=True)
+class AtMostOne:
+    literals: Sequence[IntVar]
+
+    def add(self, model: cp_model.CpModel) -> cp_model.Constraint:
+        if hasattr(model, "AddAtMostOne"):
+            return model.AddAtMostOne(list(self.literals))
+        added = cp_model.Constraint(model.Proto().constraints)
+        model.Proto().constraints[added.Index()].at_most_one.literals.extend(
+            literal.Index() for literal in self.literals
+        )
+        return added
+
+    def linear(self) -> "Linear":
+        return Linear(self.literals, [1] * len(self.literals), 0, 1)
+
+
+@dataclass(frozen=True)
+class Implication:
+    antecedent: IntVar
+    consequent: IntVar
+
+    def add(self, model: cp_model.CpModel) -> cp_model.Constraint:
+        return model.AddImplication(self.antecedent, self.consequent)
+
+
+@dataclass(frozen=True)
+class Fixed:
+    variable: IntVar
+    value: int
+
+    def add(self, model: cp_model.CpModel) -> cp_model.Constraint:
+        return Linear([self.variable], [1], self.value, self.value).add(model)
+
+
+@dataclass(frozen=True)
+class Linear:
+    """lower <= sum(coefficient * variable) <= upper"""
+
+    variables: Sequence[IntVar]
+    coefficients: Sequence[int]
+    lower: int
+    upper: int = INT_MAX
+
+    def add(self, model: cp_model.CpModel) -> cp_model.Constraint:
+        added = cp_model.Constraint(model.Proto().constraints)
+        linear = model.Proto().constraints[added.Index()].linear
+        linear.vars.extend(variable.Index() for variable in self.variables)
+        linear.coeffs.extend(self.coefficients)
+        linear.domain.extend([self.lower, self.upper])
+        return added
+
+
+# What constraints generate. Typed primitives are added to the model directly, keeping their structure
+# for the solver, while any other bounded linear expression is added as a generic linear constraint
+Primitive = Union[
+    ExactlyOne, AtMostOne, Implication, Fixed, Linear, BoundedLinearExpression
+]
+PRIMITIVES = (ExactlyOne, AtMostOne, Implication, Fixed, Linear)
+
+
+def enforceable(primitive: Primitive) -> Primitive:
+    """The primitive in a form that can be enforced by literal
+
+    CP-SAT does not accept enforcement literals on exactly one and at most one constraints, so they
+    are turned into the equivalent linear constraints.
+    """
+    if isinstance(primitive, (ExactlyOne, AtMostOne)):
+        return primitive.linear()
+    return primitive
+
+
+def add_primitive(model: cp_model.CpModel, primitive: Primitive) -> cp_model.Constraint:
+    if isinstance(primitive, PRIMITIVES):
+        return primitive.add(model)
+    return model.Add(primitive)
+
+
 class Constraint(metaclass=ABCMeta):
     def __init__(self, priority: int, name: Optional[str] = None):
         assert priority >= 0
@@ -44,8 +156,8 @@ class Constraint(metaclass=ABCMeta):
 
     @abstractmethod
     def generate(
-        self, assignments: Dict[Idx, IntVar], data: Config
-    ) -> Generator[Tuple[LinearExpr, ConstraintImpact], None, None]:
+        self, assignments: Assignments, data: Config
+    ) -> Generator[Tuple[Primitive, ConstraintImpact], None, None]:
         yield from ()
 
     def __eq__(self, other):
@@ -60,19 +172,13 @@ class Constraint(metaclass=ABCMeta):
 
 class EachDayShiftIsAssignedToExactlyOnePersonShift(Constraint):
     def generate(
-        self, assignments: Dict[Idx, IntVar], data: Config
-    ) -> Generator[Tuple[LinearExpr, ConstraintImpact], None, None]:
+        self, assignments: Assignments, data: Config
+    ) -> Generator[Tuple[Primitive, ConstraintImpact], None, None]:
         for day, day_shifts in data.shifts_by_day.items():
             for day_shift in day_shifts:
                 yield (
-                    (
-                        sum(
-                            assignments[index.idx]
-                            for index in data.indexer.iter(
-                                day_filter=day, day_shift_filter=day_shift
-                            )
-                        )
-                        == 1
+                    ExactlyOne(
+                        assignments[data.indexer.select(day=day, day_shift=day_shift)]
                     ),
                     ConstraintImpact(None, day),
                 )
@@ -80,19 +186,17 @@ class EachDayShiftIsAssignedToExactlyOnePersonShift(Constraint):
 
 class EachPersonShiftIsAssignedToAtMostOneDayShift(Constraint):
     def generate(
-        self, assignments: Dict[Idx, IntVar], data: Config
-    ) -> Generator[Tuple[LinearExpr, Person], None, None]:
+        self, assignments: Assignments, data: Config
+    ) -> Generator[Tuple[Primitive, ConstraintImpact], None, None]:
         for person, person_shifts in data.shifts_by_person.items():
             for person_shift in person_shifts:
                 yield (
-                    (
-                        sum(
-                            assignments[index.idx]
-                            for index in data.indexer.iter(
-                                person_filter=person, person_shift_filter=person_shift
+                    AtMostOne(
+                        assignments[
+                            data.indexer.select(
+                                person=person, person_shift=person_shift
                             )
-                        )
-                        <= 1
+                        ]
                     ),
                     ConstraintImpact(person, None),
                 )
@@ -100,27 +204,28 @@ class EachPersonShiftIsAssignedToAtMostOneDayShift(Constraint):
 
 class EachPersonsShiftsAreFilledInOrder(Constraint):
     def generate(
-        self, assignments: Dict[Idx, IntVar], data: Config
-    ) -> Generator[Tuple[LinearExpr, ConstraintImpact], None, None]:
+        self, assignments: Assignments, data: Config
+    ) -> Generator[Tuple[Primitive, ConstraintImpact], None, None]:
         for person, person_shifts in data.shifts_by_person.items():
-            for person_shift_idx, person_shift in enumerate(person_shifts):
-                shift_assigned = sum(
-                    assignments[index.idx]
-                    for index in data.indexer.iter(
-                        person_filter=person, person_shift_filter=person_shift
-                    )
+            shifts_assigned = [
+                list(
+                    assignments[
+                        data.indexer.select(person=person, person_shift=person_shift)
+                    ]
                 )
+                for person_shift in person_shifts
+            ]
+            for person_shift_idx, shift_assigned in enumerate(shifts_assigned):
                 next_idx = person_shift_idx + 1
-                for subsequent_person_shift in person_shifts[next_idx:]:
-                    subsequent_shift_assigned = sum(
-                        assignments[index.idx]
-                        for index in data.indexer.iter(
-                            person_filter=person,
-                            person_shift_filter=subsequent_person_shift,
-                        )
-                    )
+                for subsequent_shift_assigned in shifts_assigned[next_idx:]:
+                    # shift_assigned >= subsequent_shift_assigned
                     yield (
-                        shift_assigned >= subsequent_shift_assigned,
+                        Linear(
+                            shift_assigned + subsequent_shift_assigned,
+                            [1] * len(shift_assigned)
+                            + [-1] * len(subsequent_shift_assigned),
+                            0,
+                        ),
                         ConstraintImpact(person, None),
                     )
 
@@ -132,20 +237,14 @@ class EachPersonWorksAtMostXShiftsPerAssignmentPeriod(Constraint):
         self._x = x
 
     def generate(
-        self, assignments: Dict[Idx, IntVar], data: Config
-    ) -> Generator[Tuple[LinearExpr, ConstraintImpact], None, None]:
+        self, assignments: Assignments, data: Config
+    ) -> Generator[Tuple[Primitive, ConstraintImpact], None, None]:
         assert (
             self._x <= data.max_shifts_per_person
         ), f"X in {self.__class__.__name__} must be <= than max_shifts_per_person"
         for person in data.shifts_by_person.keys():
             yield (
-                (
-                    sum(
-                        assignments[index.idx]
-                        for index in data.indexer.iter(person_filter=person)
-                    )
-                    <= 1
-                ),
+                AtMostOne(assignments[data.indexer.select(person=person)]),
                 ConstraintImpact(person, None),
             )
 
@@ -155,17 +254,39 @@ class EachPersonWorksAtMostXShiftsPerAssignmentPeriod(Constraint):
         return self._x == other._x
 
 
-class ThereShouldBeAtLeastXDaysBetweenOps(Constraint):
+class StaticExclusionConstraint(Constraint, metaclass=ABCMeta):
+    """A constraint that only forbids individual cells, regardless of any other assignment
+
+    The forbidden (person, day, day_shift) cells can be worked out from config alone, which lets the
+    model presolve them away instead of creating variables just to force them to 0.
+    """
+
+    @abstractmethod
+    def forbidden_cells(self, data: Config) -> Iterable[Cell]:
+        pass
+
+    def generate(
+        self, assignments: Assignments, data: Config
+    ) -> Generator[Tuple[Primitive, ConstraintImpact], None, None]:
+        for person, day, day_shift in self.forbidden_cells(data):
+            for assignment in assignments[
+                data.indexer.select(person=person, day=day, day_shift=day_shift)
+            ]:
+                yield (
+                    Fixed(assignment, 0),
+                    ConstraintImpact(person, day),
+                )
+
+
+class ThereShouldBeAtLeastXDaysBetweenOps(StaticExclusionConstraint):
     def __init__(self, x=None, **kwargs):
         super().__init__(**kwargs)
         assert x is not None
         self._x = x
 
-    def generate(
-        self, assignments: Dict[Idx, IntVar], data: Config
-    ) -> Generator[Tuple[LinearExpr, ConstraintImpact], None, None]:
-        for person, day in product(
-            data.shifts_by_person.keys(), data.shifts_by_day.keys()
+    def forbidden_cells(self, data: Config) -> Iterable[Cell]:
+        for person, (day, day_shifts) in product(
+            data.shifts_by_person.keys(), data.shifts_by_day.items()
         ):
             date_last_on_shift = data.history_metrics.date_last_on_shift.get(person)
 
@@ -175,11 +296,8 @@ class ThereShouldBeAtLeastXDaysBetweenOps(Constraint):
             if (day - date_last_on_shift).days > self._x:
                 continue
 
-            for index in data.indexer.iter(person_filter=person, day_filter=day):
-                yield (
-                    assignments[index.idx] == 0,
-                    ConstraintImpact(person, day),
-                )
+            for day_shift in day_shifts:
+                yield person, day, day_shift
 
     def __eq__(self, other):
         if not super().__eq__(other):
@@ -187,7 +305,7 @@ class ThereShouldBeAtLeastXDaysBetweenOps(Constraint):
         return self._x == other._x
 
 
-class ThereShouldBeAtLeastXDaysBetweenOpsOfShiftTypes(Constraint):
+class ThereShouldBeAtLeastXDaysBetweenOpsOfShiftTypes(StaticExclusionConstraint):
     def __init__(self, x=None, shift_types=None, **kwargs):
         super().__init__(**kwargs)
         assert x is not None
@@ -197,9 +315,7 @@ class ThereShouldBeAtLeastXDaysBetweenOpsOfShiftTypes(Constraint):
             ShiftType.from_json(shift_type) for shift_type in shift_types
         }
 
-    def generate(
-        self, assignments: Dict[Idx, IntVar], data: Config
-    ) -> Generator[Tuple[LinearExpr, ConstraintImpact], None, None]:
+    def forbidden_cells(self, data: Config) -> Iterable[Cell]:
         for person, (day, day_shifts) in product(
             data.shifts_by_person.keys(), data.shifts_by_day.items()
         ):
@@ -220,13 +336,7 @@ class ThereShouldBeAtLeastXDaysBetweenOpsOfShiftTypes(Constraint):
                 if day_shift.shift_type not in self._shift_types:
                     continue
 
-                for index in data.indexer.iter(
-                    person_filter=person, day_filter=day, day_shift_filter=day_shift
-                ):
-                    yield (
-                        assignments[index.idx] == 0,
-                        ConstraintImpact(person, day),
-                    )
+                yield person, day, day_shift
 
     def __eq__(self, other):
         if not super().__eq__(other):
@@ -234,7 +344,7 @@ class ThereShouldBeAtLeastXDaysBetweenOpsOfShiftTypes(Constraint):
         return self._x == other._x
 
 
-class RespectPersonRestrictionsPerShiftType(Constraint):
+class RespectPersonRestrictionsPerShiftType(StaticExclusionConstraint):
     def __init__(self, forbidden_by_shift_type: Dict[str, List[str]] = None, **kwargs):
         super().__init__(**kwargs)
         assert forbidden_by_shift_type is not None
@@ -243,23 +353,17 @@ class RespectPersonRestrictionsPerShiftType(Constraint):
             for shift_type, names in forbidden_by_shift_type.items()
         }
 
-    def generate(
-        self, assignments: Dict[Idx, IntVar], data: Config
-    ) -> Generator[Tuple[LinearExpr, ConstraintImpact], None, None]:
+    def forbidden_cells(self, data: Config) -> Iterable[Cell]:
+        # A person cannot work any shift on a day with a shift of a type they are restricted from
         for person in data.shifts_by_person.keys():
             for day, day_shifts in data.shifts_by_day.items():
-                for day_shift in day_shifts:
-                    yield from self._generate_for_person_day_shift(
-                        assignments, data, person, day, day_shift
-                    )
-
-    def _generate_for_person_day_shift(self, assignments, data, person, day, day_shift):
-        if person.name not in self._forbidden_by_shift_type.get(
-            day_shift.shift_type, set()
-        ):
-            return
-        for index in data.indexer.iter(person_filter=person, day_filter=day):
-            yield (assignments[index.idx] == 0, ConstraintImpact(person, day))
+                if any(
+                    person.name
+                    in self._forbidden_by_shift_type.get(day_shift.shift_type, set())
+                    for day_shift in day_shifts
+                ):
+                    for day_shift in day_shifts:
+                        yield person, day, day_shift
 
     def __eq__(self, other):
         if not super().__eq__(other):
@@ -267,7 +371,7 @@ class RespectPersonRestrictionsPerShiftType(Constraint):
         return self._forbidden_by_shift_type == other._forbidden_by_shift_type
 
 
-class RespectPersonRestrictionsPerDay(Constraint):
+class RespectPersonRestrictionsPerDay(StaticExclusionConstraint):
     def __init__(self, restrictions: Dict[str, List[str]] = None, **kwargs):
         super().__init__(**kwargs)
         assert restrictions is not None
@@ -278,18 +382,13 @@ class RespectPersonRestrictionsPerDay(Constraint):
             for person_name, weekdays in restrictions.items()
         }
 
-    def generate(
-        self, assignments: Dict[Idx, IntVar], data: Config
-    ) -> Generator[Tuple[LinearExpr, ConstraintImpact], None, None]:
-        for person, day in product(
-            data.shifts_by_person.keys(), data.shifts_by_day.keys()
+    def forbidden_cells(self, data: Config) -> Iterable[Cell]:
+        for person, (day, day_shifts) in product(
+            data.shifts_by_person.keys(), data.shifts_by_day.items()
         ):
             if day in self._restrictions.get(person.name, set()):
-                for index in data.indexer.iter(person_filter=person, day_filter=day):
-                    yield (
-                        assignments[index.idx] == 0,
-                        ConstraintImpact(person, day),
-                    )
+                for day_shift in day_shifts:
+                    yield person, day, day_shift
 
     def __eq__(self, other):
         if not super().__eq__(other):
@@ -309,26 +408,27 @@ class PredeterminedAssignmentsConstraint(Constraint):
         self._assigned_shifts = assigned_shifts
 
     def generate(
-        self, assignments: Dict[Idx, IntVar], data: Config
-    ) -> Generator[Tuple[LinearExpr, ConstraintImpact], None, None]:
-        selected_shifts = self._selected_shifts()
+        self, assignments: Assignments, data: Config
+    ) -> Generator[Tuple[Primitive, ConstraintImpact], None, None]:
+        selected_shifts = self._selected_shifts(data)
 
         for index in data.indexer.iter():
             key = (index.person, index.person_shift, index.day_shift)
             assignment = 1 if (key in selected_shifts) else 0
             yield (
-                assignments[index.idx] == assignment,
+                Fixed(assignments[index.idx], assignment),
                 ConstraintImpact(None, None),
             )
 
-    def _selected_shifts(self) -> Set[Tuple[Person, int, Shift]]:
+    def _selected_shifts(self, data: Config) -> Set[Tuple[Person, int, Shift]]:
         selected_shifts = set()
         next_person_shift = defaultdict(lambda: 0)
 
         for shift in self._assigned_shifts:
-            selected_shifts.add(
-                (shift.person, next_person_shift[shift.person], shift.unassigned())
+            person_shift = data.formulation.person_shift(
+                next_person_shift[shift.person]
             )
+            selected_shifts.add((shift.person, person_shift, shift.unassigned()))
             next_person_shift[shift.person] += 1
 
         return selected_shifts
@@ -339,11 +439,15 @@ class PredeterminedAssignmentsConstraint(Constraint):
         return self._assigned_shifts == other._assigned_shifts
 
 
-FIXED_CONSTRAINTS = [
-    EachDayShiftIsAssignedToExactlyOnePersonShift(priority=0),
-    EachPersonShiftIsAssignedToAtMostOneDayShift(priority=0),
-    EachPersonsShiftsAreFilledInOrder(priority=0),
-]
+FIXED_CONSTRAINTS = {
+    SlotFormulation: [
+        EachDayShiftIsAssignedToExactlyOnePersonShift(priority=0),
+        EachPersonShiftIsAssignedToAtMostOneDayShift(priority=0),
+        EachPersonsShiftsAreFilledInOrder(priority=0),
+    ],
+    # The compact formulation limits and orders each person's shifts through its shift counts instead
+    CompactFormulation: [EachDayShiftIsAssignedToExactlyOnePersonShift(priority=0)],
+}
 
 
 CONSTRAINTS = {
@@ -0,0 +1,140 @@
+import logging
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import date
+from itertools import repeat
+from typing import Dict, List, Tuple
+
+from or_shifty.config import Config
+from or_shifty.constraints import Constraint
+from or_shifty.model import Violation, presolve, solve_with_violations
+from or_shifty.objective import Objective, RankingWeight
+from or_shifty.person import Person
+from or_shifty.shift import AssignedShift, Shift
+from or_shifty.solver_parameters import SolverParameters
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Component:
+    """People who can only be assigned to these shifts, which only these people can be assigned to"""
+
+    people: List[Person]
+    shifts_by_day: Dict[date, List[Shift]]
+
+    @property
+    def num_shifts(self) -> int:
+        return sum(len(day_shifts) for day_shifts in self.shifts_by_day.values())
+
+
+def components(config: Config, constraints: List[Constraint]) -> List[Component]:
+    """Find the connected components of the graph of which people can be assigned to which shifts
+
+    Only the mandatory constraints that forbid assignments regardless of any others are taken into
+    account, so no solution can assign a person to a shift outside their component. People who cannot
+    be assigned to any shift are left out, and shifts nobody can be assigned to are components of
+    their own. Components are ordered by their first shift.
+    """
+    data = presolve(config, [c for c in constraints if c.priority == 0])
+
+    parents = {}
+
+    def find(node):
+        parents.setdefault(node, node)
+        while parents[node] != node:
+            parents[node] = parents[parents[node]]
+            node = parents[node]
+        return node
+
+    # Every person shift slot of a person can be assigned to the same shifts, so one is enough
+    for index in data.indexer.iter(
+        person_shift_filter=data.formulation.person_shift(0)
+    ):
+        parents[find(index.person)] = find((index.day, index.day_shift))
+
+    shifts_by_root = defaultdict(dict)
+    for day, day_shifts in sorted(data.shifts_by_day.items()):
+        for day_shift in day_shifts:
+            shifts_by_root[find((day, day_shift))].setdefault(day, []).append(day_shift)
+    people_by_root = defaultdict(list)
+    for person in data.shifts_by_person.keys():
+        if person in parents:
+            people_by_root[find(person)].append(person)
+
+    return [
+        Component(people=people_by_root[root], shifts_by_day=shifts_by_day)
+        for root, shifts_by_day in shifts_by_root.items()
+    ]
+
+
+def solve_components(
+    config: Config,
+    objective: Objective = RankingWeight(),
+    constraints: List[Constraint] = tuple(),
+    parameters: SolverParameters = SolverParameters(),
+    **solve_kwargs,
+) -> Tuple[List[AssignedShift], List[Violation]]:
+    """Solve each independent component as its own model in a process pool and merge the solutions
+
+    Every constraint and the objective only relate assignments of the same person or the same shift,
+    so the components can be solved separately. Each component is solved with every person, so people
+    are ranked the same as when solving everything at once, but presolve leaves out the variables of
+    people from other components. If constraints have to be dropped, they are only dropped for the
+    components that cannot otherwise be solved.
+    """
+    found = components(config, constraints)
+    log.info("Found %s independent components", len(found))
+    for number, component in enumerate(found, start=1):
+        log.info(
+            "Component %s has %s people and %s shifts",
+            number,
+            len(component.people),
+            component.num_shifts,
+        )
+
+    # Workers rebuild the config of their component from its inputs
+    inputs = [
+        dict(
+            people=list(config.shifts_by_person.keys()),
+            max_shifts_per_person=config.max_shifts_per_person,
+            shifts_by_day=component.shifts_by_day,
+            history=config.history,
+            formulation=config.formulation,
+        )
+        for component in found
+    ]
+    arguments = [objective, constraints, parameters, solve_kwargs]
+
+    if len(found) == 1:
+        results = [_solve_component(inputs[0], *arguments)]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=min(len(found), os.cpu_count() or 1)
+        ) as executor:
+            results = list(
+                executor.map(
+                    _solve_component,
+                    inputs,
+                    *(repeat(argument) for argument in arguments),
+                )
+            )
+
+    solution = []
+    violations = []
+    for component_solution, component_violations in results:
+        solution.extend(component_solution)
+        violations.extend(component_violations)
+    return sorted(solution, key=lambda s: (s.day, s.name)), violations
+
+
+def _solve_component(inputs, objective, constraints, parameters, solve_kwargs):
+    return solve_with_violations(
+        Config.build(**inputs),
+        objective,
+        constraints,
+        parameters=parameters,
+        **solve_kwargs,
+    )
@@ -0,0 +1,115 @@
+from abc import ABCMeta, abstractmethod
+from typing import TYPE_CHECKING, Optional
+
+import numpy as np
+from ortools.sat.python.cp_model import CpModel, LinearExpr
+
+from or_shifty.indexer import Assignments, PersonShift
+
+if TYPE_CHECKING:
+    from or_shifty.config import Config  # noqa: F401
+
+# Object array of boolean solver variables of shape (people, max shifts per person). Cell [p, k] is
+# true iff person p is assigned more than k shifts
+ShiftCounts = np.ndarray
+
+
+class Formulation(metaclass=ABCMeta):
+    """How assignments of people to day shifts are represented in the model"""
+
+    @abstractmethod
+    def person_shifts(self, max_shifts_per_person: int) -> int:
+        """Number of person shift slots in the indexer"""
+        pass
+
+    @abstractmethod
+    def person_shift(self, nth_shift: int) -> PersonShift:
+        """The person shift slot that a person's nth shift is assigned to"""
+        pass
+
+    def init_shift_counts(
+        self,
+        model: CpModel,
+        assignments: Assignments,
+        data: "Config",
+        named: bool = False,
+    ) -> Optional[ShiftCounts]:
+        """Create any variables tracking how many shifts each person is assigned
+
+        As with the assignment variables, they are only given descriptive names when named is set.
+        """
+        return None
+
+    def __eq__(self, other):
+        return type(self) == type(other)
+
+    def __hash__(self):
+        return hash(type(self))
+
+    def __str__(self):
+        return self.__class__.__name__
+
+
+class SlotFormulation(Formulation):
+    """One variable per (person, person shift, day, day shift)
+
+    Each person has max_shifts_per_person person shift slots that are filled in order, so a person's
+    second shift is the one assigned to their second slot.
+    """
+
+    def person_shifts(self, max_shifts_per_person: int) -> int:
+        return max_shifts_per_person
+
+    def person_shift(self, nth_shift: int) -> PersonShift:
+        return nth_shift
+
+
+class CompactFormulation(Formulation):
+    """One variable per (person, day, day shift)
+
+    The indexer has a single person shift slot. How many shifts each person is assigned is instead
+    tracked by ShiftCounts indicators, which are constrained to be filled in order and to add up to
+    the person's number of assigned shifts.
+    """
+
+    def person_shifts(self, max_shifts_per_person: int) -> int:
+        return 1
+
+    def person_shift(self, nth_shift: int) -> PersonShift:
+        return 0
+
+    def init_shift_counts(
+        self,
+        model: CpModel,
+        assignments: Assignments,
+        data: "Config",
+        named: bool = False,
+    ) -> Optional[ShiftCounts]:
+        people = list(data.shifts_by_person.keys())
+        shift_counts = np.full(
+            (len(people), data.max_shifts_per_person), None, dtype=object
+        )
+
+        for person_idx, person in enumerate(people):
+            for person_shift in range(data.max_shifts_per_person):
+                shift_counts[person_idx, person_shift] = model.NewBoolVar(
+                    f"shift_count_{person.name}_{person_shift}" if named else ""
+                )
+
+            model.Add(
+                LinearExpr.Sum(list(assignments[data.indexer.select(person=person)]))
+                == LinearExpr.Sum(list(shift_counts[person_idx]))
+            )
+            for person_shift in range(data.max_shifts_per_person - 1):
+                model.AddImplication(
+                    shift_counts[person_idx, person_shift + 1],
+                    shift_counts[person_idx, person_shift],
+                )
+
+        return shift_counts
+
+
+FORMULATIONS = {
+    formulation.__name__: formulation
+    for formulation in (SlotFormulation, CompactFormulation)
+}
@@ -31,3 +31,10 @@ class History:
     ):
         past_shifts = sorted(past_shifts, key=lambda ps: ps.day, reverse=True)
         return cls(past_shifts=tuple(past_shifts), offsets=tuple(offsets))
+
+    def including(self, assigned_shifts: List[AssignedShift]) -> "History":
+        """Return a history that also contains the given shifts, e.g. ones that have just been solved for"""
+        return self.build(
+            past_shifts=list(self.past_shifts) + list(assigned_shifts),
+            offsets=list(self.offsets),
+        )
@@ -1,16 +1,27 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from datetime import date
-from typing import Dict, Generator, List, Tuple
+from typing import Dict, Generator, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
 
 from or_shifty.person import Person
-from or_shifty.shift import Shift
+from or_shifty.shift import Shift, ShiftType
 
 Idx = Tuple[int, int, int, int]
 PersonShift = int
+Cell = Tuple[Person, date, Shift]
 
+# Object array of solver variables with the same shape as the indexer's id tensor. Cells that do not
+# correspond to a real (day, day_shift) pair hold None
+Assignments = np.ndarray
 
-@dataclass(frozen=True)
-class IndexEntry:
+# Tuple of coordinate arrays, one per dimension, suitable for indexing an Assignments array
+Selection = Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+
+_MISSING = -1
+
+
+class IndexEntry(NamedTuple):
     idx: Idx
     person: Person
     person_shift: PersonShift
@@ -20,11 +31,25 @@ class IndexEntry:
 
 @dataclass(frozen=True)
 class Indexer:
+    """Dense index over the (person, person_shift, day, day_shift) variable grid
+
+    Every existing cell of the grid is given a variable id, in idx order, stored in a dense tensor of
+    shape (people, person shifts, days, max shifts per day). Days with fewer shifts than the busiest
+    day leave the trailing cells of the last dimension marked as missing, as do cells removed by
+    presolve.
+    """
+
+    _people: Tuple[Person, ...]
+    _days: Tuple[date, ...]
+    _day_shifts: Tuple[Tuple[Shift, ...], ...]
+
     _person_indices: Dict[Person, int]
     _day_indices: Dict[date, int]
     _day_shift_indices: Dict[Tuple[date, Shift], int]
 
-    _index_entries: Dict[Idx, IndexEntry]
+    _ids: np.ndarray
+    _coordinates: np.ndarray
+    _shift_types: np.ndarray
 
     @classmethod
     def build(
@@ -33,42 +58,114 @@ class Indexer:
         max_shifts_per_person: int,
         shifts_per_day: Dict[date, List[Shift]],
     ):
-        _person_indices = {}
-        _day_indices = {}
-        _day_shift_indices = {}
-        _index_entries = {}
-
-        for person_idx, person in enumerate(people):
-            _person_indices[person] = person_idx
-
-            for person_shift_idx in range(max_shifts_per_person):
-                for day_idx, day in enumerate(sorted(shifts_per_day.keys())):
-                    _day_indices[day] = day_idx
-
-                    for shift_idx, shift in enumerate(
-                        sorted(shifts_per_day[day], key=lambda s: s.name)
-                    ):
-                        _day_shift_indices[(day, shift)] = shift_idx
-
-                        idx = (
-                            person_idx,
-                            person_shift_idx,
-                            day_idx,
-                            shift_idx,
-                        )
-                        _index_entries[idx] = IndexEntry(
-                            idx, person, person_shift_idx, day, shift,
-                        )
+        days = tuple(sorted(shifts_per_day.keys()))
+        day_shifts = tuple(
+            tuple(sorted(shifts_per_day[day], key=lambda s: s.name)) for day in days
+        )
+        max_shifts_per_day = max((len(shifts) for shifts in day_shifts), default=0)
+
+        shift_types = np.full((len(days), max_shifts_per_day), _MISSING, dtype=np.int64)
+        for day_idx, shifts in enumerate(day_shifts):
+            shift_types[day_idx, : len(shifts)] = [
+                shift.shift_type.value for shift in shifts
+            ]
+
+        shape = (len(people), max_shifts_per_person, len(days), max_shifts_per_day)
+        exists = np.broadcast_to(shift_types != _MISSING, shape)
+        ids = np.full(shape, _MISSING, dtype=np.int64)
+        ids[exists] = np.arange(np.count_nonzero(exists))
 
         return cls(
-            _person_indices=_person_indices,
-            _day_indices=_day_indices,
-            _day_shift_indices=_day_shift_indices,
-            _index_entries=_index_entries,
+            _people=tuple(people),
+            _days=days,
+            _day_shifts=day_shifts,
+            _person_indices={person: idx for idx, person in enumerate(people)},
+            _day_indices={day: idx for idx, day in enumerate(days)},
+            _day_shift_indices={
+                (day, shift): shift_idx
+                for day, shifts in zip(days, day_shifts)
+                for shift_idx, shift in enumerate(shifts)
+            },
+            _ids=ids,
+            _coordinates=np.argwhere(exists),
+            _shift_types=shift_types,
         )
 
+    def without(self, cells: Iterable[Cell]) -> "Indexer":
+        """Return a sparse indexer with the given cells removed for every person shift
+
+        Surviving cells keep their coordinates, but are given new contiguous ids in idx order.
+        """
+        exists = self._ids != _MISSING
+        for person, day, day_shift in cells:
+            exists[
+                self._person_indices[person],
+                :,
+                self._day_indices[day],
+                self._day_shift_indices[(day, day_shift)],
+            ] = False
+
+        ids = np.full(self._ids.shape, _MISSING, dtype=np.int64)
+        ids[exists] = np.arange(np.count_nonzero(exists))
+
+        return replace(self, _ids=ids, _coordinates=np.argwhere(exists))
+
+    @property
+    def shape(self) -> Tuple[int, int, int, int]:
+        return self._ids.shape
+
+    @property
+    def ids(self) -> np.ndarray:
+        """The dense variable id tensor, e.g. `indexer.ids[:, :, day_idx, :]`
+
+        Missing cells hold a negative id.
+        """
+        return self._ids
+
+    def __len__(self):
+        return len(self._coordinates)
+
     def get(self, index: Idx) -> IndexEntry:
-        return self._index_entries[index]
+        if self._ids[index] == _MISSING:
+            raise KeyError(index)
+        return self._entry(index)
+
+    def select(
+        self,
+        person: Person = None,
+        person_shift: PersonShift = None,
+        day: date = None,
+        day_shift: Shift = None,
+        shift_type: Optional[ShiftType] = None,
+    ) -> Selection:
+        """Return the coordinates of all existing cells matching the given filters, in idx order
+
+        The result can be used to index an Assignments array directly, e.g.
+        `assignments[indexer.select(day=day, day_shift=day_shift)]`.
+        """
+
+        if day_shift is not None:
+            assert day is not None, "day_shift can only be used together with day"
+
+        day_idx = self._day_indices[day] if day is not None else None
+        view = self._ids[
+            self._person_indices[person] if person is not None else slice(None),
+            person_shift if person_shift is not None else slice(None),
+            day_idx if day_idx is not None else slice(None),
+            self._day_shift_indices[(day, day_shift)]
+            if day_shift is not None
+            else slice(None),
+        ]
+        if shift_type is not None:
+            types = self._shift_types
+            if day_idx is not None:
+                types = types[day_idx]
+                if day_shift is not None:
+                    types = types[self._day_shift_indices[(day, day_shift)]]
+            view = np.where(types == shift_type.value, view, _MISSING)
+
+        ids = np.ravel(view)
+        return tuple(self._coordinates[ids[ids != _MISSING]].T)
 
     def iter(
         self,
@@ -77,45 +174,28 @@ class Indexer:
         day_filter: date = None,
         day_shift_filter: Shift = None,
     ) -> Generator[IndexEntry, None, None]:
-        """Return all indices that match the given filters
-
-        This implementation is not efficient as it sorts and traverses all the indices every
-        time. This should be fine for normal use as the cost of solving for the rota should be
-        the bottleneck as the indices grow, not this.
-        """
+        """Return all indices that match the given filters, in idx order"""
 
         if day_shift_filter is not None:
             assert (
                 day_filter is not None
             ), "day_shift_filter can only be used together with day_filter"
 
-        def _filter(idx_):
-            (person_idx, person_shift_idx, day_idx, day_shift_idx) = idx_
-
-            if (
-                person_filter is not None
-                and self._person_indices[person_filter] != person_idx
-            ):
-                return False
-
-            if (
-                person_shift_filter is not None
-                and person_shift_filter != person_shift_idx
-            ):
-                return False
-
-            if day_filter is not None:
-                if self._day_indices[day_filter] != day_idx:
-                    return False
-                if (
-                    day_shift_filter is not None
-                    and self._day_shift_indices[(day_filter, day_shift_filter)]
-                    != day_shift_idx
-                ):
-                    return False
-
-            return True
-
-        for idx in sorted(self._index_entries.keys()):
-            if _filter(idx):
-                yield self._index_entries[idx]
+        selection = self.select(
+            person=person_filter,
+            person_shift=person_shift_filter,
+            day=day_filter,
+            day_shift=day_shift_filter,
+        )
+        for coordinates in zip(*selection):
+            yield self._entry(tuple(int(coordinate) for coordinate in coordinates))
+
+    def _entry(self, idx: Idx) -> IndexEntry:
+        person_idx, person_shift_idx, day_idx, shift_idx = idx
+        return IndexEntry(
+            idx,
+            self._people[person_idx],
+            person_shift_idx,
+            self._days[day_idx],
+            self._day_shifts[day_idx][shift_idx],
+        )
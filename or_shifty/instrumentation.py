@@ -0,0 +1,212 @@
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Set
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+if TYPE_CHECKING:
+    from or_shifty.model import Model
+    from or_shifty.solver_parameters import SolverParameters
+
+# Recorders that are currently recording, innermost last
+_recorders: List["Recorder"] = []
+
+
+class Recorder:
+    """Something that records what happens while it is in use as a context manager"""
+
+    def __enter__(self):
+        _recorders.append(self)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        _recorders.remove(self)
+
+    def start_phase(self, name: str) -> None:
+        pass
+
+    def end_phase(
+        self,
+        name: str,
+        wall_seconds: float,
+        cpu_seconds: float,
+        peak_rss_growth_bytes: Optional[int],
+    ) -> None:
+        pass
+
+    def record_constraint(self, stats: "ConstraintStats") -> None:
+        pass
+
+    def record_solve(self, stats: "SolveStats") -> None:
+        pass
+
+    def record_model(
+        self, model: "Model", priorities: Set[int], parameters: "SolverParameters"
+    ) -> None:
+        """Called with each model just before it is solved, enforcing the given priority tiers"""
+        pass
+
+
+@dataclass
+class PhaseStats:
+    calls: int = 0
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    # How much the peak resident memory of the process grew during the phase, which is 0 for a phase
+    # that stayed below a peak reached before it
+    peak_rss_growth_bytes: Optional[int] = None
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "wall_seconds": self.wall_seconds,
+            "cpu_seconds": self.cpu_seconds,
+            "peak_rss_growth_bytes": self.peak_rss_growth_bytes,
+        }
+
+
+@dataclass(frozen=True)
+class ConstraintStats:
+    """The size of what a constraint added to the model"""
+
+    name: str
+    priority: int
+    expressions: int
+    variables: int
+    terms: int
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "priority": self.priority,
+            "expressions": self.expressions,
+            "variables": self.variables,
+            "terms": self.terms,
+        }
+
+
+@dataclass(frozen=True)
+class SolveStats:
+    """The outcome of solving with the constraints of the given priority tiers"""
+
+    priorities: List[int]
+    status: str
+    conflicts: int
+    branches: int
+    wall_seconds: float
+    best_bound: float
+    objective: float
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "priorities": self.priorities,
+            "status": self.status,
+            "conflicts": self.conflicts,
+            "branches": self.branches,
+            "wall_seconds": self.wall_seconds,
+            "best_bound": self.best_bound,
+            "objective": self.objective,
+        }
+
+
+@dataclass(eq=False)
+class StatsRecorder(Recorder):
+    """Record phase timings, model size and solver statistics while in use as a context manager
+
+    Phases can be nested, e.g. building the indexer is part of building the config, so their times
+    do not add up to the total. A phase that runs more than once, e.g. solving when constraints are
+    dropped, is recorded as the total time of all its calls. Nothing done in other processes is
+    recorded.
+    """
+
+    phases: Dict[str, PhaseStats] = field(default_factory=dict)
+    constraints: List[ConstraintStats] = field(default_factory=list)
+    solves: List[SolveStats] = field(default_factory=list)
+
+    def end_phase(
+        self,
+        name: str,
+        wall_seconds: float,
+        cpu_seconds: float,
+        peak_rss_growth_bytes: Optional[int],
+    ) -> None:
+        stats = self.phases.setdefault(name, PhaseStats())
+        stats.calls += 1
+        stats.wall_seconds += wall_seconds
+        stats.cpu_seconds += cpu_seconds
+        if peak_rss_growth_bytes is not None:
+            stats.peak_rss_growth_bytes = (
+                stats.peak_rss_growth_bytes or 0
+            ) + peak_rss_growth_bytes
+
+    def record_constraint(self, stats: ConstraintStats) -> None:
+        self.constraints.append(stats)
+
+    def record_solve(self, stats: SolveStats) -> None:
+        self.solves.append(stats)
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "phases": {name: stats.to_json() for name, stats in self.phases.items()},
+            "constraints": [stats.to_json() for stats in self.constraints],
+            "solves": [stats.to_json() for stats in self.solves],
+        }
+
+
+def recording() -> bool:
+    """Whether anything is recording, to skip working out stats nobody will see"""
+    return bool(_recorders)
+
+
+@contextmanager
+def phase(name: str):
+    """Time the body as the named phase for every recorder in use, which costs nothing if there are none"""
+    if not _recorders:
+        yield
+        return
+
+    # Recorders are copied as the body may start or stop using some
+    recorders = list(_recorders)
+    for recorder in recorders:
+        recorder.start_phase(name)
+    peak_start = peak_rss_bytes()
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        yield
+    finally:
+        wall_seconds = time.perf_counter() - wall_start
+        cpu_seconds = time.process_time() - cpu_start
+        peak_growth = None if peak_start is None else peak_rss_bytes() - peak_start
+        for recorder in reversed(recorders):
+            recorder.end_phase(name, wall_seconds, cpu_seconds, peak_growth)
+
+
+def record_constraint(stats: ConstraintStats) -> None:
+    for recorder in _recorders:
+        recorder.record_constraint(stats)
+
+
+def record_solve(stats: SolveStats) -> None:
+    for recorder in _recorders:
+        recorder.record_solve(stats)
+
+
+def record_model(
+    model: "Model", priorities: Set[int], parameters: "SolverParameters"
+) -> None:
+    for recorder in _recorders:
+        recorder.record_model(model, priorities, parameters)
+
+
+def peak_rss_bytes() -> Optional[int]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
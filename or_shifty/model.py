@@ -1,45 +1,176 @@
 import logging
-from typing import List
-
+import multiprocessing
+import os
+from collections import defaultdict
+from dataclasses import dataclass, field, replace
+from itertools import chain
+from multiprocessing.connection import Connection, wait
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from ortools.sat.cp_model_pb2 import (
+    CpModelProto,
+    CpSolverResponse,
+    CpSolverStatus,
+)
 from ortools.sat.python import cp_model
-from ortools.sat.python.cp_model import INFEASIBLE
+from ortools.sat.python.cp_model import (
+    FEASIBLE,
+    INFEASIBLE,
+    OPTIMAL,
+    UNKNOWN,
+    IntVar,
+    LinearExpr,
+)
 
 from or_shifty.config import Config
 from or_shifty.constraints import (
     EVALUATION_CONSTRAINT,
     FIXED_CONSTRAINTS,
     Constraint,
+    ConstraintImpact,
+    StaticExclusionConstraint,
+    add_primitive,
+    enforceable,
+)
+from or_shifty.indexer import Assignments
+from or_shifty.instrumentation import (
+    ConstraintStats,
+    SolveStats,
+    phase,
+    record_constraint,
+    record_model,
+    record_solve,
+    recording,
 )
 from or_shifty.objective import Objective, RankingWeight
 from or_shifty.shift import AssignedShift
+from or_shifty.solver_parameters import SolverParameters
 
 log = logging.getLogger(__name__)
 
+# CP-SAT objectives must stay within int64 with room to spare for the solver's own arithmetic
+MAX_OBJECTIVE_COEFFICIENT = 2 ** 53
+
 
 class Infeasible(Exception):
     pass
 
 
+class SolverError(Exception):
+    """The solver stopped without a solution for a reason other than the constraints being infeasible"""
+
+    pass
+
+
+class SolverTimeout(SolverError):
+    """The solver ran out of time before finding any solution
+
+    This says nothing about whether the constraints are feasible, so no tiers are dropped because of it.
+    """
+
+    pass
+
+
+@dataclass(frozen=True)
+class Violation:
+    constraint: Constraint
+    impact: ConstraintImpact
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "constraint": str(self.constraint),
+            "priority": self.constraint.priority,
+            "person": None
+            if self.impact.affected_person is None
+            else self.impact.affected_person.name,
+            "day": None
+            if self.impact.affected_day is None
+            else self.impact.affected_day.isoformat(),
+        }
+
+
 def solve(
     config: Config,
     objective: Objective = RankingWeight(),
     constraints: List[Constraint] = tuple(),
+    binary_search: bool = False,
+    soft: bool = False,
+    parameters: SolverParameters = SolverParameters(),
+    hint: Optional[List[AssignedShift]] = None,
+    parallel: bool = False,
+    on_solution: Optional[Callable[[List[AssignedShift]], None]] = None,
 ) -> List[AssignedShift]:
-    constraints = _constraints(constraints)
+    solution, _ = solve_with_violations(
+        config,
+        objective,
+        constraints,
+        binary_search=binary_search,
+        soft=soft,
+        parallel=parallel,
+        on_solution=on_solution,
+        parameters=parameters,
+        hint=hint,
+    )
+    return solution
+
+
+def solve_with_violations(
+    config: Config,
+    objective: Objective = RankingWeight(),
+    constraints: List[Constraint] = tuple(),
+    binary_search: bool = False,
+    soft: bool = False,
+    parameters: SolverParameters = SolverParameters(),
+    hint: Optional[List[AssignedShift]] = None,
+    parallel: bool = False,
+    on_solution: Optional[Callable[[List[AssignedShift]], None]] = None,
+) -> Tuple[List[AssignedShift], List[Violation]]:
+    """Solve and also return every constraint instance the solution violates
+
+    With soft set, constraints with a priority other than 0 are never dropped as a whole. Instead each
+    of their instances may be violated at a cost in the objective, and the model is solved only once.
+
+    With parallel set, every set of priority tiers that _run_with_retries could end up with is solved
+    at once in a process pool, so an over-constrained config takes about as long as a single solve.
+
+    A hint, e.g. the solution of an earlier run, is given to the solver as a starting point. It may
+    cover only some of the shifts being solved for.
+
+    on_solution is called with every improving solution found while solving, except in parallel where
+    solutions are found in other processes.
+    """
+    constraints = _constraints(constraints, config)
 
     log.info(str(config.history_metrics))
+    parameters.log_effective()
 
-    solver, assignments = _run_with_retries(config, objective, list(constraints))
+    if soft:
+        response, model = _run_soft(
+            config, objective, list(constraints), parameters, hint, on_solution
+        )
+    elif binary_search:
+        response, model = _run_with_binary_search(
+            config, objective, list(constraints), parameters, hint, on_solution
+        )
+    elif parallel:
+        response, model = _run_in_parallel(
+            config, objective, list(constraints), parameters, hint
+        )
+    else:
+        response, model = _run_with_retries(
+            config, objective, list(constraints), parameters, hint, on_solution
+        )
 
-    _validate_constraints_against_solution(solver, constraints, config, assignments)
-    _display_objective_function_score(solver)
+    with phase("post_process"):
+        values = _values(response)
+        violations = _validate_constraints_against_solution(values, model.generated)
+        _display_objective_function_score(response)
 
-    solution = sorted(
-        list(_solution(solver, config, assignments)), key=lambda s: (s.day, s.name)
-    )
-    log.info("Solution\n%s", "\n".join(f">>>> {shift}" for shift in solution))
+        solution = _solution(values, model.data, model.assignments)
+        log.info("Solution\n%s", "\n".join(f">>>> {shift}" for shift in solution))
 
-    return solution
+    return solution, violations
 
 
 def evaluate(
@@ -47,35 +178,75 @@ def evaluate(
     objective: Objective,
     constraints: List[Constraint],
     solution: List[AssignedShift],
-) -> None:
-    constraints = _constraints(constraints)
+    parameters: SolverParameters = SolverParameters(),
+) -> float:
+    """Log the constraints the given solution violates and return its objective function score"""
+    score, _ = evaluate_with_violations(
+        config, objective, constraints, solution, parameters
+    )
+    return score
+
+
+def evaluate_with_violations(
+    config: Config,
+    objective: Objective,
+    constraints: List[Constraint],
+    solution: List[AssignedShift],
+    parameters: SolverParameters = SolverParameters(),
+) -> Tuple[float, List[Violation]]:
+    """Evaluate and also return every constraint instance the given solution violates"""
+    constraints = _constraints(constraints, config)
     evaluation_constraint = EVALUATION_CONSTRAINT(priority=0, assigned_shifts=solution)
 
     log.info(str(config.history_metrics))
+    parameters.log_effective()
 
-    solver, assignments = _run(config, objective, [evaluation_constraint])
+    response, model = _run(config, objective, [evaluation_constraint], parameters)
 
-    _validate_constraints_against_solution(solver, constraints, config, assignments)
-    _display_objective_function_score(solver)
+    # The constraints being evaluated are not part of the model, so they are generated into a scratch
+    # model that is never solved, only to record them as rows to check
+    scratch = cp_model.CpModel()
+    generated = GeneratedConstraints(scratch.Proto())
+    for constraint in constraints:
+        for primitive, impact in constraint.generate(model.assignments, model.data):
+            generated.add(add_primitive(scratch, primitive), constraint, impact)
 
-    solution = sorted(
-        list(_solution(solver, config, assignments)), key=lambda s: (s.day, s.name)
-    )
-    log.info("Solution\n%s", "\n".join(f">>>> {shift}" for shift in solution))
+    with phase("post_process"):
+        values = _values(response)
+        violations = _validate_constraints_against_solution(values, generated)
+        _display_objective_function_score(response)
+
+        solution = _solution(values, model.data, model.assignments)
+        log.info("Solution\n%s", "\n".join(f">>>> {shift}" for shift in solution))
+
+    return response.objective_value, violations
 
 
-def _constraints(constraints: List[Constraint]) -> List[Constraint]:
-    constraints = list(constraints) + FIXED_CONSTRAINTS
+def _constraints(constraints: List[Constraint], config: Config) -> List[Constraint]:
+    constraints = list(constraints) + FIXED_CONSTRAINTS[type(config.formulation)]
     return sorted(constraints, key=lambda c: c.priority)
 
 
-def _run_with_retries(config, objective, constraints):
+def _run_with_retries(
+    config,
+    objective,
+    constraints,
+    parameters=SolverParameters(),
+    hint=None,
+    on_solution=None,
+):
     log.info("Running model...")
+    model = build(config, objective, constraints, hint=hint)
     while True:
         try:
-            result = _run(config, objective, constraints)
+            response = _solve(
+                model,
+                {constraint.priority for constraint in constraints},
+                parameters,
+                on_solution,
+            )
             log.info("Solution found")
-            return result
+            return response, model
         except Infeasible:
             log.warning("Failed to find solution with current constraints")
             constraints = _drop_least_important_constraints(constraints)
@@ -84,6 +255,204 @@ def _run_with_retries(config, objective, constraints):
             log.info("Retrying model...")
 
 
+def _run_soft(
+    config,
+    objective,
+    constraints,
+    parameters=SolverParameters(),
+    hint=None,
+    on_solution=None,
+):
+    log.info("Running model with soft constraints...")
+    model = build(config, objective, constraints, soft=True, hint=hint)
+    response = _solve(model, set(), parameters, on_solution)
+    log.info("Solution found")
+    return response, model
+
+
+def _run_with_binary_search(
+    config,
+    objective,
+    constraints,
+    parameters=SolverParameters(),
+    hint=None,
+    on_solution=None,
+):
+    """Find the largest feasible prefix of priority tiers in about log2(tiers) solves
+
+    Feasibility is monotone in the tiers kept, so this ends up dropping exactly the same constraints
+    as _run_with_retries. The prefix with every tier is tried first since it is usually feasible.
+    """
+    log.info("Running model...")
+    model = build(config, objective, constraints, hint=hint)
+    priorities = sorted({constraint.priority for constraint in constraints})
+
+    def probe(prefix):
+        kept = set(priorities[: prefix + 1])
+        log.info(
+            "Probing with priority tiers %s", ", ".join(str(p) for p in sorted(kept))
+        )
+        try:
+            response = _solve(model, kept, parameters, on_solution)
+        except Infeasible:
+            log.info("Priority tiers infeasible")
+            return None
+        log.info("Priority tiers feasible")
+        return response
+
+    # Invariant: the prefix ending at lo is feasible (or lo is -1) and the one ending at hi is not
+    lo, hi = len(priorities) - 1, len(priorities)
+    response = probe(lo)
+    if response is None:
+        log.warning("Failed to find solution with current constraints")
+        lo, hi = -1, lo
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            mid_response = probe(mid)
+            if mid_response is None:
+                hi = mid
+            else:
+                lo, response = mid, mid_response
+
+    # Even the most important tier on its own is infeasible. It is never dropped as it holds the
+    # mandatory constraints
+    if response is None:
+        raise Infeasible()
+
+    dropped = [
+        constraint for constraint in constraints if constraint.priority > priorities[lo]
+    ]
+    if dropped:
+        log.info("Dropping constraints %s", ", ".join(str(c) for c in dropped))
+    log.info("Solution found")
+    return response, model
+
+
+def _run_in_parallel(
+    config, objective, constraints, parameters=SolverParameters(), hint=None
+):
+    """Solve every prefix of priority tiers at once in a process pool
+
+    The result with the most tiers that is feasible is returned as soon as every prefix with more
+    tiers has been proven infeasible, so this drops exactly the same constraints as _run_with_retries.
+    """
+    priorities = sorted({constraint.priority for constraint in constraints})
+    # Workers rebuild the config from its inputs rather than being sent its indexer
+    inputs = dict(
+        people=list(config.shifts_by_person.keys()),
+        max_shifts_per_person=config.max_shifts_per_person,
+        shifts_by_day=config.shifts_by_day,
+        history=config.history,
+        formulation=config.formulation,
+    )
+
+    log.info(
+        "Running model with %s sets of priority tiers in parallel...", len(priorities)
+    )
+    # A process per set of tiers rather than a pool, so that workers still solving for tiers that are
+    # no longer needed can be terminated, and a worker that dies is noticed rather than waited for
+    max_workers = min(len(priorities), os.cpu_count() or 1)
+    waiting = list(reversed(range(len(priorities))))
+    running: Dict[int, Tuple[multiprocessing.Process, Connection]] = {}
+    model = None
+    try:
+        responses = {}
+        best = len(priorities) - 1
+        while True:
+            while waiting and len(running) < max_workers:
+                prefix = waiting.pop(0)
+                receiver, sender = multiprocessing.Pipe(duplex=False)
+                process = multiprocessing.Process(
+                    target=_solve_tiers_in_process,
+                    args=(
+                        sender,
+                        inputs,
+                        objective,
+                        constraints,
+                        set(priorities[: prefix + 1]),
+                        parameters,
+                        hint,
+                    ),
+                    daemon=True,
+                )
+                process.start()
+                sender.close()
+                running[prefix] = (process, receiver)
+            if model is None:
+                # The main process needs the model too, to read the solution. Building it is
+                # deterministic so its variables match the workers'
+                model = build(config, objective, constraints, hint=hint)
+
+            ready = wait([receiver for _, receiver in running.values()])
+            for prefix, (process, receiver) in list(running.items()):
+                if receiver not in ready:
+                    continue
+                del running[prefix]
+                try:
+                    response, error = receiver.recv()
+                except EOFError:
+                    process.join()
+                    raise SolverError(
+                        f"The process solving with priority tiers "
+                        f"{', '.join(str(p) for p in priorities[: prefix + 1])} died with exit code "
+                        f"{process.exitcode}"
+                    )
+                finally:
+                    receiver.close()
+                process.join()
+                if error is not None:
+                    raise error
+                responses[prefix] = response
+                # Only the responses of feasible tiers make it back from the workers
+                if recording() and response is not None:
+                    record_solve(_solve_stats(set(priorities[: prefix + 1]), response))
+            while responses.get(best, False) is None:
+                best -= 1
+            if best < 0 or best in responses:
+                break
+    finally:
+        for process, receiver in running.values():
+            process.terminate()
+            process.join()
+            receiver.close()
+
+    # Even the most important tier on its own is infeasible. It is never dropped as it holds the
+    # mandatory constraints
+    if best < 0:
+        raise Infeasible()
+
+    dropped = [
+        constraint
+        for constraint in constraints
+        if constraint.priority > priorities[best]
+    ]
+    if dropped:
+        log.info("Dropping constraints %s", ", ".join(str(c) for c in dropped))
+    log.info("Solution found")
+    return responses[best], model
+
+
+def _solve_tiers(inputs, objective, constraints, priorities, parameters, hint):
+    model = build(Config.build(**inputs), objective, constraints, hint=hint)
+    try:
+        return _solve(model, priorities, parameters)
+    except Infeasible:
+        log.info(
+            "Priority tiers %s infeasible",
+            ", ".join(str(p) for p in sorted(priorities)),
+        )
+        return None
+
+
+def _solve_tiers_in_process(connection: Connection, *args) -> None:
+    try:
+        result = (_solve_tiers(*args), None)
+    except Exception as e:
+        result = (None, e)
+    connection.send(result)
+    connection.close()
+
+
 def _drop_least_important_constraints(constraints):
     priority_to_drop = max(constraint.priority for constraint in constraints)
     if priority_to_drop == 0:
@@ -103,62 +472,442 @@ def _drop_least_important_constraints(constraints):
     ]
 
 
-def _run(data, objective, constraints):
+@dataclass(frozen=True)
+class Model:
+    """A model built once for every priority tier of its constraints
+
+    Constraints with a priority other than 0 are only enforced if the enforcement literal of their
+    tier is true, so tiers can be dropped between solves without rebuilding the model.
+    """
+
+    model: cp_model.CpModel
+    data: Config
+    assignments: Assignments
+    tier_literals: Dict[int, IntVar]
+    generated: "GeneratedConstraints"
+
+
+@dataclass(frozen=True)
+class GeneratedConstraints:
+    """The primitives generated by constraints, kept as the constraint rows of a model proto
+
+    Keeping them means they can be checked against a solution without generating them again.
+    """
+
+    proto: CpModelProto
+    rows: List[int] = field(default_factory=list)
+    sources: List[Tuple[Constraint, ConstraintImpact]] = field(default_factory=list)
+    # Enforcement literals that are part of the primitive itself, e.g. the antecedent of an implication,
+    # as opposed to those added later to enforce its priority tier
+    own_enforcement: List[int] = field(default_factory=list)
+
+    def add(
+        self,
+        added: cp_model.Constraint,
+        constraint: Constraint,
+        impact: ConstraintImpact,
+    ) -> None:
+        self.rows.append(added.Index())
+        self.sources.append((constraint, impact))
+        self.own_enforcement.append(
+            len(self.proto.constraints[added.Index()].enforcement_literal)
+        )
+
+    def constraint_stats(self, constraint: Constraint, start: int) -> ConstraintStats:
+        """The size of the rows from start on, which must all have been generated by constraint"""
+        forms = [_linear_form(self.proto.constraints[row]) for row in self.rows[start:]]
+        variables = {
+            ref if ref >= 0 else -ref - 1 for refs, _, _ in forms for ref in refs
+        }
+        return ConstraintStats(
+            name=str(constraint),
+            priority=constraint.priority,
+            expressions=len(forms),
+            variables=len(variables),
+            terms=sum(len(refs) for refs, _, _ in forms),
+        )
+
+    def domain(self, row: int) -> List[int]:
+        _, _, domain = _linear_form(self.proto.constraints[self.rows[row]])
+        return list(domain)
+
+    def evaluate(self, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the value of every row's linear form for the given variable values, and whether the
+        row is satisfied
+        """
+        forms = [_linear_form(self.proto.constraints[row]) for row in self.rows]
+        lengths = np.fromiter(
+            (len(refs) for refs, _, _ in forms), dtype=np.int64, count=len(forms)
+        )
+        refs = np.fromiter(
+            chain.from_iterable(refs for refs, _, _ in forms),
+            dtype=np.int64,
+            count=lengths.sum(),
+        )
+        coeffs = np.fromiter(
+            chain.from_iterable(coeffs for _, coeffs, _ in forms),
+            dtype=np.int64,
+            count=lengths.sum(),
+        )
+
+        sums = np.zeros(len(forms), dtype=np.int64)
+        np.add.at(
+            sums,
+            np.repeat(np.arange(len(forms)), lengths),
+            _literal_values(values, refs) * coeffs,
+        )
+
+        lower = np.fromiter(
+            (domain[0] for _, _, domain in forms), dtype=np.int64, count=len(forms)
+        )
+        upper = np.fromiter(
+            (domain[-1] for _, _, domain in forms), dtype=np.int64, count=len(forms)
+        )
+        valid = (lower <= sums) & (sums <= upper)
+
+        # Domains with holes and primitives with their own enforcement literals are rare, so only those
+        # are checked row by row
+        for i, (_, _, domain) in enumerate(forms):
+            if len(domain) > 2 and valid[i]:
+                intervals = zip(domain[::2], domain[1::2])
+                valid[i] = any(lo <= sums[i] <= hi for lo, hi in intervals)
+            if self.own_enforcement[i] and not valid[i]:
+                enforcement = self.proto.constraints[self.rows[i]].enforcement_literal
+                own = np.array(enforcement[: self.own_enforcement[i]], dtype=np.int64)
+                valid[i] = not _literal_values(values, own).all()
+
+        return sums, valid
+
+
+def _linear_form(constraint) -> Tuple[Sequence[int], Sequence[int], Sequence[int]]:
+    """The references, coefficients and domain of the linear constraint equivalent to a row"""
+    kind = constraint.WhichOneof("constraint")
+    if kind == "linear":
+        linear = constraint.linear
+        return linear.vars, linear.coeffs, linear.domain
+    if kind == "exactly_one":
+        literals = constraint.exactly_one.literals
+        return literals, [1] * len(literals), [1, 1]
+    if kind == "at_most_one":
+        literals = constraint.at_most_one.literals
+        return literals, [1] * len(literals), [0, 1]
+    if kind == "bool_or":
+        literals = constraint.bool_or.literals
+        return literals, [1] * len(literals), [1, len(literals)]
+    if kind == "bool_and":
+        literals = constraint.bool_and.literals
+        return literals, [1] * len(literals), [len(literals), len(literals)]
+    raise ValueError(f"Unable to evaluate {kind} constraints")
+
+
+def _literal_values(values: np.ndarray, refs: np.ndarray) -> np.ndarray:
+    # Negative references are the negation of a boolean variable
+    return np.where(
+        refs >= 0, values[np.maximum(refs, 0)], 1 - values[np.maximum(-refs - 1, 0)]
+    )
+
+
+def build(data, objective, constraints, soft=False, hint=None) -> Model:
+    """Build the model for the given constraints
+
+    When soft is set, rather than being grouped in tiers, every expression of a constraint with a
+    priority other than 0 is given its own violation literal. Violations are penalised in the objective
+    lexicographically by priority, before the objective function itself.
+
+    Any hinted assigned shifts are added to the model as solution hints.
+    """
     model = cp_model.CpModel()
 
-    assignments = init_assignments(model, data)
+    # Constraints of other tiers may be dropped later so only mandatory ones can be presolved
+    with phase("presolve"):
+        data = presolve(data, [c for c in constraints if c.priority == 0])
+    with phase("init_assignments"):
+        named = log.isEnabledFor(logging.DEBUG)
+        assignments = init_assignments(model, data, named=named)
+        shift_counts = data.formulation.init_shift_counts(
+            model, assignments, data, named=named
+        )
+
+    tier_literals = {
+        priority: model.NewBoolVar(f"tier_{priority}")
+        for priority in sorted({constraint.priority for constraint in constraints})
+        if priority != 0 and not soft
+    }
+    violation_literals = defaultdict(list)
+    generated = GeneratedConstraints(model.Proto())
 
     for constraint in constraints:
         log.debug("Adding constraint %s", constraint)
-        for expression, _ in constraint.generate(assignments, data):
-            model.Add(expression)
+        first_row = len(generated.rows)
+        with phase(f"generate {type(constraint).__name__}"):
+            for primitive, impact in constraint.generate(assignments, data):
+                if constraint.priority == 0:
+                    generated.add(add_primitive(model, primitive), constraint, impact)
+                    continue
+                added = add_primitive(model, enforceable(primitive))
+                generated.add(added, constraint, impact)
+                if soft:
+                    violated = model.NewBoolVar("")
+                    added.OnlyEnforceIf(violated.Not())
+                    violation_literals[constraint.priority].append(violated)
+                else:
+                    added.OnlyEnforceIf(tier_literals[constraint.priority])
+        if recording():
+            record_constraint(generated.constraint_stats(constraint, first_row))
+
+    with phase("build_objective"):
+        objective_expression = objective.objective(assignments, data, shift_counts)
+        if violation_literals:
+            objective_expression = _penalise_violations(
+                objective_expression, violation_literals
+            )
+        model.Maximize(objective_expression)
+
+    if hint:
+        _add_hint(model, data, assignments, hint)
+
+    return Model(
+        model=model,
+        data=data,
+        assignments=assignments,
+        tier_literals=tier_literals,
+        generated=generated,
+    )
 
-    model.Maximize(objective.objective(assignments, data))
 
-    solver = cp_model.CpSolver()
-    status = solver.Solve(model)
-    if status is INFEASIBLE:
+def _add_hint(model, data, assignments, hint: List[AssignedShift]) -> None:
+    """Hint the assignment of every hinted shift that is also being solved for
+
+    Each person's hinted shifts take up their person shifts in order, as in evaluation mode. Hinted
+    shifts that are not in config, were assigned to someone not in config, or whose assignment has
+    been presolved away are skipped.
+    """
+    values = {}
+    next_person_shift = defaultdict(lambda: 0)
+    hinted = 0
+
+    for shift in sorted(hint, key=lambda s: (s.day, s.name)):
+        day_shift = shift.unassigned()
+        if day_shift not in data.shifts_by_day.get(shift.day, []):
+            continue
+
+        for variable in assignments[
+            data.indexer.select(day=shift.day, day_shift=day_shift)
+        ]:
+            values.setdefault(variable.Index(), (variable, 0))
+
+        if shift.person not in data.shifts_by_person:
+            continue
+        person_shift = data.formulation.person_shift(next_person_shift[shift.person])
+        if person_shift not in data.shifts_by_person[shift.person]:
+            continue
+        selected = assignments[
+            data.indexer.select(
+                person=shift.person,
+                person_shift=person_shift,
+                day=shift.day,
+                day_shift=day_shift,
+            )
+        ]
+        if len(selected) == 0:
+            continue
+
+        next_person_shift[shift.person] += 1
+        values[selected[0].Index()] = (selected[0], 1)
+        hinted += 1
+
+    log.info("Hinting %s of %s shifts", hinted, len(hint))
+    for variable, value in values.values():
+        model.AddHint(variable, value)
+
+
+def _penalise_violations(objective_expression, violation_literals):
+    # Each violation of a priority is penalised by more than the objective function and all violations
+    # of less important priorities can add up to, so violations are minimised lexicographically
+    coefficients, _ = objective_expression.GetVarValueMap()
+    # The objective is made up of boolean variables only
+    range_below = sum(abs(coefficient) for coefficient in coefficients.values())
+
+    expressions = [objective_expression]
+    weights = [1]
+    for priority in sorted(violation_literals.keys(), reverse=True):
+        weight = range_below + 1
+        literals = violation_literals[priority]
+        range_below += weight * len(literals)
+        assert (
+            range_below < MAX_OBJECTIVE_COEFFICIENT
+        ), "Too many constraint priorities to solve with soft constraints"
+        log.debug(
+            "Penalising %s soft constraints of priority %s by %s",
+            len(literals),
+            priority,
+            weight,
+        )
+        expressions.append(LinearExpr.Sum(literals))
+        weights.append(-weight)
+
+    return LinearExpr.ScalProd(expressions, weights)
+
+
+def _solve(
+    model: Model,
+    priorities: Set[int],
+    parameters: SolverParameters,
+    on_solution: Optional[Callable[[List[AssignedShift]], None]] = None,
+) -> CpSolverResponse:
+    """Solve enforcing only the constraints of the given priority tiers"""
+    for priority, literal in model.tier_literals.items():
+        _fix(model.model, literal, 1 if priority in priorities else 0)
+    if recording():
+        record_model(model, priorities, parameters)
+
+    solver = parameters.solver()
+    progress = parameters.progress(
+        on_solution=None
+        if on_solution is None
+        else lambda response: on_solution(
+            _solution(_values(response), model.data, model.assignments)
+        )
+    )
+    try:
+        with phase("solve"):
+            status = solver.SolveWithSolutionCallback(model.model, progress)
+    finally:
+        progress.stop()
+    if recording():
+        record_solve(_solve_stats(priorities, solver.ResponseProto()))
+    if status == INFEASIBLE:
         raise Infeasible()
+    if status == UNKNOWN:
+        raise SolverTimeout(
+            "Solver stopped before finding any solution, try a longer time limit"
+        )
+    if status not in (OPTIMAL, FEASIBLE):
+        raise SolverError(
+            f"Solver stopped without a solution, with status {solver.StatusName(status)}"
+        )
+    if status == FEASIBLE:
+        log.warning(
+            "Solver stopped before proving optimality, best bound was %s",
+            solver.BestObjectiveBound(),
+        )
 
-    return solver, assignments
+    return solver.ResponseProto()
 
 
-def init_assignments(model, data):
-    assignments = {}
-    for index in data.indexer.iter():
-        assignments[index.idx] = model.NewBoolVar(
-            f"shift_{index.person.name}_{index.person_shift}_{index.day}_{index.day_shift.name}"
-        )
-    return assignments
+def _solve_stats(priorities: Set[int], response: CpSolverResponse) -> SolveStats:
+    return SolveStats(
+        priorities=sorted(priorities),
+        status=CpSolverStatus.Name(response.status),
+        conflicts=response.num_conflicts,
+        branches=response.num_branches,
+        wall_seconds=response.wall_time,
+        best_bound=response.best_objective_bound,
+        objective=response.objective_value,
+    )
+
 
+def _fix(model: cp_model.CpModel, variable: IntVar, value: int) -> None:
+    domain = model.Proto().variables[variable.Index()].domain
+    del domain[:]
+    domain.extend([value, value])
 
-def _solution(solver, data, assignments):
-    for day, day_shifts in data.shifts_by_day.items():
-        for day_shift in day_shifts:
-            for index in data.indexer.iter(day_filter=day, day_shift_filter=day_shift):
-                if solver.Value(assignments[index.idx]) == 1:
-                    yield index.day_shift.assign(index.person)
+
+def _run(data, objective, constraints, parameters=SolverParameters()):
+    model = build(data, objective, constraints)
+    response = _solve(
+        model, {constraint.priority for constraint in constraints}, parameters
+    )
+    return response, model
 
 
-def _validate_constraints_against_solution(solver, constraints, data, assignments):
+def presolve(data: Config, constraints: List[Constraint]) -> Config:
+    """Remove the cells that the given constraints statically forbid from the indexer
+
+    Only the constraints passed in are used, so they should be ones that are always enforced. The
+    returned config's indexer never creates variables for the removed cells.
+    """
+    forbidden = set()
     for constraint in constraints:
-        log.debug("Evaluating constraint %s against solution", constraint)
-        for expression, impact in constraint.generate(assignments, data):
-            expr = expression.Expression()
-            bounds = expression.Bounds()
-            value = solver.Value(expr)
-            expr_valid = bounds[0] <= value <= bounds[1]
-            if not expr_valid:
-                log.debug(
-                    "Solution violates constraint %s, expr %s, value %s, bounds %s, impact %s",
-                    constraint,
-                    expr,
-                    value,
-                    bounds,
-                    impact,
-                )
-                log.warning("Solution violates constraint %s %s", constraint, impact)
+        if isinstance(constraint, StaticExclusionConstraint):
+            forbidden.update(constraint.forbidden_cells(data))
+
+    if not forbidden:
+        return data
+
+    indexer = data.indexer.without(forbidden)
+    log.debug(
+        "Presolve removed %s of %s assignment variables",
+        len(data.indexer) - len(indexer),
+        len(data.indexer),
+    )
+    return replace(data, indexer=indexer)
+
+
+def init_assignments(model, data, named=None):
+    """Create one boolean variable per index
+
+    Variables are only given descriptive names when named is set, or by default when debug logging is
+    enabled, as formatting a name for every variable is costly on large instances.
+    """
+    if named is None:
+        named = log.isEnabledFor(logging.DEBUG)
+
+    assignments = np.full(data.indexer.shape, None, dtype=object)
+    if named:
+        for index in data.indexer.iter():
+            assignments[index.idx] = model.NewBoolVar(
+                f"shift_{index.person.name}_{index.person_shift}_{index.day}_{index.day_shift.name}"
+            )
+    else:
+        for idx in zip(*data.indexer.select()):
+            assignments[idx] = model.NewBoolVar("")
+    return assignments
+
+
+def _values(response: CpSolverResponse) -> np.ndarray:
+    """Read the value of every variable in the model at once, indexed by variable index"""
+    return np.array(response.solution, dtype=np.int64)
+
+
+def _solution(values, data, assignments) -> List[AssignedShift]:
+    coordinates = data.indexer.select()
+    variables = np.fromiter(
+        (variable.Index() for variable in assignments[coordinates]),
+        dtype=np.int64,
+        count=len(data.indexer),
+    )
+    assigned = np.flatnonzero(values[variables] == 1)
+
+    entries = (
+        data.indexer.get(tuple(axis[idx] for axis in coordinates)) for idx in assigned
+    )
+    return sorted(
+        (entry.day_shift.assign(entry.person) for entry in entries),
+        key=lambda s: (s.day, s.name),
+    )
+
+
+def _validate_constraints_against_solution(
+    values: np.ndarray, generated: GeneratedConstraints
+) -> List[Violation]:
+    with phase("validate"):
+        sums, valid = generated.evaluate(values)
+
+    violations = []
+    for row in np.flatnonzero(~valid):
+        constraint, impact = generated.sources[row]
+        log.debug(
+            "Solution violates constraint %s, value %s, domain %s, impact %s",
+            constraint,
+            sums[row],
+            generated.domain(row),
+            impact,
+        )
+        log.warning("Solution violates constraint %s %s", constraint, impact)
+        violations.append(Violation(constraint, impact))
+    return violations
 
 
-def _display_objective_function_score(solver):
-    log.info("Objective function score was %s", solver.ObjectiveValue())
+def _display_objective_function_score(response):
+    log.info("Objective function score was %s", response.objective_value)
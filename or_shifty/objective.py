@@ -1,16 +1,21 @@
 from abc import ABCMeta
-from typing import Dict
+from typing import Optional
 
-from ortools.constraint_solver.pywrapcp import IntVar
 from ortools.sat.python.cp_model import LinearExpr
 
 from or_shifty.config import Config
-from or_shifty.indexer import Idx
+from or_shifty.formulation import ShiftCounts
+from or_shifty.indexer import Assignments
 from or_shifty.shift import ShiftType
 
 
 class Objective(metaclass=ABCMeta):
-    def objective(self, assignments: Dict[Idx, IntVar], data: Config) -> LinearExpr:
+    def objective(
+        self,
+        assignments: Assignments,
+        data: Config,
+        shift_counts: Optional[ShiftCounts] = None,
+    ) -> LinearExpr:
         pass
 
 
@@ -18,7 +23,15 @@ class RankingWeight(Objective):
     ADDITIONAL_SHIFTS_WEIGHT = 100
     RANKING_WEIGHT = 1
 
-    def objective(self, assignments: Dict[Idx, IntVar], data: Config) -> LinearExpr:
+    def objective(
+        self,
+        assignments: Assignments,
+        data: Config,
+        shift_counts: Optional[ShiftCounts] = None,
+    ) -> LinearExpr:
+        if shift_counts is not None:
+            return self._compact_objective(assignments, data, shift_counts)
+
         # Compute the ranking weight for each shift_type. The coefficient is to discourage optimising one
         # shift type at the expense of another
         return LinearExpr.Sum(
@@ -26,8 +39,50 @@ class RankingWeight(Objective):
             for shift_type in ShiftType
         )
 
+    def _compact_objective(
+        self, assignments: Assignments, data: Config, shift_counts: ShiftCounts
+    ) -> LinearExpr:
+        # The weight of a person's kth shift of a given shift type is made up of the weight of their
+        # last shift of that type, plus a bonus that only depends on k. The first part is charged on
+        # every assignment of the person to a day shift of that type, and the bonus is charged on the
+        # person's shift count indicators, which adds up to the same objective as the slot formulation
+        last_person_shift = data.max_shifts_per_person - 1
+        weights_by_shift_type = {
+            shift_type: self._assign_weights(data, self._rank_people(data, shift_type))
+            for shift_type in ShiftType
+        }
+
+        expressions = []
+        coefficients = []
+        for shift_type, weights in weights_by_shift_type.items():
+            for person in data.shifts_by_person.keys():
+                expressions.append(
+                    LinearExpr.Sum(
+                        list(
+                            assignments[
+                                data.indexer.select(
+                                    person=person, shift_type=shift_type
+                                )
+                            ]
+                        )
+                    )
+                )
+                coefficients.append(weights[(person, last_person_shift)])
+
+        # The bonus is the same for every person and shift type
+        weights = weights_by_shift_type[ShiftType.STANDARD]
+        for person_idx, person in enumerate(data.shifts_by_person.keys()):
+            for person_shift in range(data.max_shifts_per_person):
+                expressions.append(shift_counts[person_idx, person_shift])
+                coefficients.append(
+                    weights[(person, person_shift)]
+                    - weights[(person, last_person_shift)]
+                )
+
+        return LinearExpr.ScalProd(expressions, coefficients)
+
     def _ranking_weight_for_shift_type(
-        self, assignments: Dict[Idx, IntVar], data: Config, shift_type: ShiftType
+        self, assignments: Assignments, data: Config, shift_type: ShiftType
     ) -> LinearExpr:
         people_ranking = self._rank_people(data, shift_type)
 
@@ -38,15 +93,18 @@ class RankingWeight(Objective):
         expressions = []
         coefficients = []
         for (person, person_shift), weight in weights.items():
-            indices_to_include = [
-                index
-                for index in data.indexer.iter(
-                    person_filter=person, person_shift_filter=person_shift
-                )
-                if index.day_shift.shift_type is shift_type
-            ]
             expressions.append(
-                sum(assignments[index.idx] for index in indices_to_include)
+                LinearExpr.Sum(
+                    list(
+                        assignments[
+                            data.indexer.select(
+                                person=person,
+                                person_shift=person_shift,
+                                shift_type=shift_type,
+                            )
+                        ]
+                    )
+                )
             )
             coefficients.append(weight)
 
@@ -81,9 +139,7 @@ class RankingWeight(Objective):
         people_shifts_ranking = []
         for person_shift_idx in reversed(range(data.max_shifts_per_person)):
             for person in people_ranking:
-                people_shifts_ranking.append(
-                    (person, data.shifts_by_person[person][person_shift_idx])
-                )
+                people_shifts_ranking.append((person, person_shift_idx))
             people_shifts_ranking.append(shift_change_marker)
 
         # Assign a weight to every person/shift to encourage assigning to pairs higher up in the ranking
@@ -1,6 +1,25 @@
 from dataclasses import dataclass
+from weakref import WeakValueDictionary
 
 
 @dataclass(frozen=True)
 class Person:
+    """A person that can be assigned shifts
+
+    Instances are interned so that every Person with the same name is the same object.
+    """
+
+    __slots__ = ("name", "__weakref__")
+    _interned = WeakValueDictionary()
+
     name: str
+
+    def __new__(cls, name: str):
+        person = cls._interned.get(name)
+        if person is None:
+            person = super().__new__(cls)
+            cls._interned[name] = person
+        return person
+
+    def __reduce__(self):
+        return Person, (self.name,)
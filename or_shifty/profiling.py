@@ -0,0 +1,139 @@
+import cProfile
+import logging
+import os
+import pstats
+import re
+from typing import Dict, List, Optional, Tuple
+
+from or_shifty.instrumentation import Recorder
+
+log = logging.getLogger(__name__)
+
+# The profile each phase is part of. Constraints get a profile each, and anything outside of these
+# phases is part of the "other" profile
+PROFILES = {
+    "parse_inputs": "parse_inputs",
+    "build_config": "build_config",
+    "build_indexer": "build_config",
+    "presolve": "build_model",
+    "init_assignments": "build_model",
+    "build_objective": "build_model",
+    "solve": "solve",
+    "post_process": "post_process",
+    "validate": "post_process",
+    "write_output": "post_process",
+}
+OTHER = "other"
+# Calls along a path that took less than this are left out of the collapsed stacks
+MIN_STACK_MICROSECONDS = 1
+
+
+def profile_name(phase_name: str) -> str:
+    if phase_name.startswith("generate "):
+        return f"build_model.{phase_name[len('generate '):]}"
+    return PROFILES.get(phase_name, OTHER)
+
+
+class ProfileRecorder(Recorder):
+    """Profile each phase separately while in use as a context manager
+
+    Only one profiler can run at a time, so entering a phase of another profile pauses the current
+    one until the phase ends. Each profile only has the time spent in its own phases, e.g. building
+    the model does not include generating each constraint.
+    """
+
+    def __init__(self):
+        self.profiles: Dict[str, cProfile.Profile] = {}
+        self._running: List[str] = []
+
+    def __enter__(self) -> "ProfileRecorder":
+        super().__enter__()
+        self._switch_to(OTHER)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._switch_from(OTHER)
+        super().__exit__(*exc_info)
+
+    def start_phase(self, name: str) -> None:
+        self._switch_to(profile_name(name))
+
+    def end_phase(self, name: str, *_) -> None:
+        self._switch_from(profile_name(name))
+
+    def _switch_to(self, name: str) -> None:
+        if self._running and self._running[-1] != name:
+            self.profiles[self._running[-1]].disable()
+        if not self._running or self._running[-1] != name:
+            self.profiles.setdefault(name, cProfile.Profile()).enable()
+        self._running.append(name)
+
+    def _switch_from(self, name: str) -> None:
+        assert self._running.pop() == name
+        if self._running and self._running[-1] == name:
+            return
+        self.profiles[name].disable()
+        if self._running:
+            self.profiles[self._running[-1]].enable()
+
+    def write(self, directory: str) -> None:
+        """Write a pstats dump per profile and collapsed stacks of them all, as read by flame graph tools"""
+        log.info("Writing profiles to %s...", directory)
+        os.makedirs(directory, exist_ok=True)
+        stacks = []
+        for name, profile in sorted(self.profiles.items()):
+            name = _file_name(name)
+            profile.dump_stats(os.path.join(directory, f"{name}.prof"))
+            stacks.extend(collapsed_stacks(pstats.Stats(profile), root=name))
+        with open(os.path.join(directory, "stacks.txt"), "w") as f:
+            f.writelines(f"{';'.join(stack)} {weight}\n" for stack, weight in stacks)
+
+
+def _file_name(name: str) -> str:
+    """Profile names come from phase names, which should not be able to write outside the directory"""
+    return re.sub(r"[^\w.-]", "_", name)
+
+
+def collapsed_stacks(
+    stats: pstats.Stats, root: Optional[str] = None
+) -> List[Tuple[List[str], int]]:
+    """The stacks of a profile with the microseconds spent in the innermost call of each
+
+    cProfile only records which function called which, not whole stacks, so the time of a function is
+    split between the stacks it is called from in proportion to the time of each of its callers'
+    calls to it. Recursion is cut short at the first repeated function.
+    """
+    callees = {function: [] for function in stats.stats}
+    for function, (_, _, _, _, callers) in stats.stats.items():
+        for caller, (_, _, _, caller_time) in callers.items():
+            if caller in callees:
+                callees[caller].append((function, caller_time))
+
+    result = []
+
+    def walk(function, path, seconds):
+        _, _, own_time, total_time, _ = stats.stats[function]
+        scale = seconds / total_time if total_time else 0.0
+        path = path + [function]
+        microseconds = int(own_time * scale * 1e6)
+        if microseconds >= MIN_STACK_MICROSECONDS:
+            stack = ([root] if root else []) + [_label(f) for f in path]
+            result.append((stack, microseconds))
+        for callee, call_time in callees[function]:
+            if callee not in path and call_time * scale * 1e6 >= MIN_STACK_MICROSECONDS:
+                walk(callee, path, call_time * scale)
+
+    for function, (_, _, _, total_time, callers) in stats.stats.items():
+        if not callers:
+            walk(function, [], total_time)
+    return result
+
+
+def _label(function: Tuple[str, int, str]) -> str:
+    filename, line, name = function
+    if filename == "~":  # built in
+        label = name
+    else:
+        label = f"{os.path.basename(filename)}:{line}({name})"
+    # Semicolons separate frames and the weight follows the last space
+    return label.replace(";", ":").replace(" ", "_")
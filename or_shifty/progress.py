@@ -0,0 +1,90 @@
+import logging
+import threading
+from typing import Callable, Optional
+
+from ortools.sat.python.cp_model import CpSolverSolutionCallback
+
+log = logging.getLogger(__name__)
+
+
+class SolutionProgress(CpSolverSolutionCallback):
+    """Log every improving solution the solver finds while it is still searching
+
+    The search is stopped early once no better solution has been found for stall_seconds after the
+    first one, or once the best solution is within relative_gap of the objective bound. on_solution is
+    passed the response of each improving solution, e.g. to write it out in case the run is killed
+    before it ends.
+    """
+
+    def __init__(
+        self,
+        on_solution: Optional[Callable] = None,
+        stall_seconds: Optional[float] = None,
+        relative_gap: Optional[float] = None,
+    ):
+        super().__init__()
+        self._on_solution = on_solution
+        self._stall_seconds = stall_seconds
+        self._relative_gap = relative_gap
+        self._solutions = 0
+        self._stall_timer = None
+        self._lock = threading.Lock()
+
+    def stop(self) -> None:
+        with self._lock:
+            if self._stall_timer is not None:
+                self._stall_timer.cancel()
+                self._stall_timer = None
+
+    @property
+    def solutions(self) -> int:
+        return self._solutions
+
+    def on_solution_callback(self) -> None:
+        self._solutions += 1
+        objective = self.ObjectiveValue()
+        bound = self.BestObjectiveBound()
+        log.info(
+            "Solution %s found after %.2f seconds, objective %s, bound %s",
+            self._solutions,
+            self.WallTime(),
+            objective,
+            bound,
+        )
+
+        if self._on_solution is not None:
+            self._on_solution(self.Response())
+
+        if (
+            self._relative_gap is not None
+            and _gap(objective, bound) <= self._relative_gap
+        ):
+            log.info(
+                "Stopping search as solution is within gap %s of bound",
+                self._relative_gap,
+            )
+            self.StopSearch()
+            return
+
+        self._restart_stall_timer()
+
+    def _restart_stall_timer(self) -> None:
+        if self._stall_seconds is None:
+            return
+        with self._lock:
+            if self._stall_timer is not None:
+                self._stall_timer.cancel()
+            self._stall_timer = threading.Timer(self._stall_seconds, self._stall)
+            self._stall_timer.daemon = True
+            self._stall_timer.start()
+
+    def _stall(self) -> None:
+        log.info(
+            "Stopping search as no better solution was found in %s seconds",
+            self._stall_seconds,
+        )
+        self.StopSearch()
+
+
+def _gap(objective: float, bound: float) -> float:
+    return abs(bound - objective) / max(1.0, abs(objective))
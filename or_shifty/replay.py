@@ -0,0 +1,277 @@
+import argparse
+import base64
+import json
+import logging
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Set
+
+from google.protobuf.message import DecodeError
+from ortools.sat.cp_model_pb2 import CpModelProto, CpSolverResponse
+from ortools.sat.python import cp_model
+from ortools.sat.python.cp_model import FEASIBLE, OPTIMAL
+
+from or_shifty.cli import (
+    InvalidInputs,
+    _version,
+    add_solver_arguments,
+    parse_solver_overrides,
+)
+from or_shifty.instrumentation import Recorder, phase, record_solve, recording
+from or_shifty.model import _solve_stats
+from or_shifty.person import Person
+from or_shifty.shift import AssignedShift, ShiftType
+from or_shifty.solver_parameters import SolverParameters
+
+if TYPE_CHECKING:
+    from or_shifty.model import Model
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ExportedVariable:
+    """The shift an assignment variable of an exported model stands for"""
+
+    index: int
+    person: str
+    person_shift: int
+    day: date
+    shift: str
+    shift_type: ShiftType
+
+    @classmethod
+    def from_json(cls, serialised: Dict[str, Any]) -> "ExportedVariable":
+        return cls(
+            index=serialised["index"],
+            person=serialised["person"],
+            person_shift=serialised["person_shift"],
+            day=datetime.fromisoformat(serialised["day"]).date(),
+            shift=serialised["shift"],
+            shift_type=ShiftType.from_json(serialised["type"]),
+        )
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "index": self.index,
+            "person": self.person,
+            "person_shift": self.person_shift,
+            "day": self.day.isoformat(),
+            "shift": self.shift,
+            "type": self.shift_type.to_json(),
+        }
+
+    def assign(self) -> AssignedShift:
+        return AssignedShift(
+            name=self.shift,
+            shift_type=self.shift_type,
+            day=self.day,
+            person=Person(name=self.person),
+        )
+
+
+@dataclass(frozen=True)
+class ExportedModel:
+    """A model as it was solved for the given priority tiers, with the parameters it was solved with"""
+
+    priorities: List[int]
+    parameters: SolverParameters
+    variables: List[ExportedVariable]
+    proto: CpModelProto
+
+    def solution(self, response: CpSolverResponse) -> List[AssignedShift]:
+        return sorted(
+            (
+                variable.assign()
+                for variable in self.variables
+                if response.solution[variable.index] == 1
+            ),
+            key=lambda s: (s.day, s.name),
+        )
+
+
+class ModelExporter(Recorder):
+    """Keep a copy of every model solved while in use as a context manager
+
+    Each model is copied as it was when solved, with the tier literals of the priorities it was solved
+    for fixed. Models solved in other processes, e.g. with --parallel-tiers, are not copied.
+    """
+
+    def __init__(self):
+        self.variables: List[List[Dict[str, Any]]] = []
+        self.models: List[Dict[str, Any]] = []
+        self._last_model: Optional["Model"] = None
+
+    def record_model(
+        self, model: "Model", priorities: Set[int], parameters: SolverParameters
+    ) -> None:
+        # Retries solve the same model again with fewer tiers, so share its variables
+        if model is not self._last_model:
+            self.variables.append(
+                [variable.to_json() for variable in exported_variables(model)]
+            )
+            self._last_model = model
+        self.models.append(
+            {
+                "priorities": sorted(priorities),
+                "parameters": parameters.to_json(),
+                "variables": len(self.variables) - 1,
+                "proto": base64.b64encode(
+                    model.model.Proto().SerializeToString()
+                ).decode("ascii"),
+            }
+        )
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "version": _version(),
+            "variables": self.variables,
+            "models": self.models,
+        }
+
+    def write(self, export_path: str) -> None:
+        log.info("Writing %s models to %s...", len(self.models), export_path)
+        with open(export_path, "w") as f:
+            json.dump(self.to_json(), f)
+
+
+def exported_variables(model: "Model") -> List[ExportedVariable]:
+    return [
+        ExportedVariable(
+            index=model.assignments[entry.idx].Index(),
+            person=entry.person.name,
+            person_shift=entry.person_shift,
+            day=entry.day,
+            shift=entry.day_shift.name,
+            shift_type=entry.day_shift.shift_type,
+        )
+        for entry in model.data.indexer.iter()
+    ]
+
+
+def read_export(export_path: str) -> List[ExportedModel]:
+    with open(export_path, "r") as f:
+        export = json.load(f)
+
+    try:
+        variables = [
+            [ExportedVariable.from_json(variable) for variable in model_variables]
+            for model_variables in export["variables"]
+        ]
+        return [
+            ExportedModel(
+                priorities=model["priorities"],
+                parameters=SolverParameters.from_json(model["parameters"]),
+                variables=variables[model["variables"]],
+                proto=CpModelProto.FromString(base64.b64decode(model["proto"])),
+            )
+            for model in export["models"]
+        ]
+    except (KeyError, IndexError, ValueError, DecodeError) as e:
+        raise InvalidInputs(
+            f"{export_path} is not a model exported with --export-model: {e!r}"
+        )
+
+
+@dataclass(frozen=True)
+class ReplayInputs:
+    models: List[ExportedModel]
+    output_path: Optional[str]
+    stats_path: Optional[str]
+    verbose: bool
+    solver_overrides: Dict[str, Any]
+
+
+def parse_replay_args(args=None) -> ReplayInputs:
+    parser = argparse.ArgumentParser(
+        prog="shifty replay",
+        description="Solve the models written by --export-model again, without parsing or building them",
+    )
+    parser.add_argument(
+        "--model",
+        dest="model",
+        action="store",
+        required=True,
+        help="Path to file written by --export-model",
+    )
+    parser.add_argument(
+        "--output",
+        dest="output",
+        action="store",
+        default=None,
+        help="Path to file in which to write the solution of the last feasible model",
+    )
+    parser.add_argument(
+        "--stats",
+        dest="stats",
+        action="store",
+        default=None,
+        help="Path to file in which to write the time taken and the statistics of each solve",
+    )
+    parser.add_argument(
+        "-v",
+        dest="verbose",
+        action="store_true",
+        default=False,
+        help="Change the log level to debug",
+    )
+    add_solver_arguments(
+        parser, "Override the solver parameters each model was exported with"
+    )
+
+    parsed_args = parser.parse_args(args)
+
+    return ReplayInputs(
+        models=read_export(parsed_args.model),
+        output_path=parsed_args.output,
+        stats_path=parsed_args.stats,
+        verbose=parsed_args.verbose,
+        solver_overrides=parse_solver_overrides(parsed_args),
+    )
+
+
+def replay(
+    models: List[ExportedModel], solver_overrides: Optional[Dict[str, Any]] = None
+) -> Optional[List[AssignedShift]]:
+    """Solve each model in turn and return the solution of the last feasible one, if any is"""
+    solution = None
+    for number, exported in enumerate(models, start=1):
+        parameters = exported.parameters.override(**(solver_overrides or {}))
+        log.info(
+            "Replaying model %s of %s with priority tiers %s",
+            number,
+            len(models),
+            ", ".join(str(p) for p in exported.priorities),
+        )
+        parameters.log_effective()
+
+        response = _solve(exported, parameters)
+        stats = _solve_stats(set(exported.priorities), response)
+        if recording():
+            record_solve(stats)
+        log.info(
+            "Status %s, objective %s, best bound %s, %s conflicts and %s branches in %.3f seconds",
+            stats.status,
+            stats.objective,
+            stats.best_bound,
+            stats.conflicts,
+            stats.branches,
+            stats.wall_seconds,
+        )
+        if response.status in (OPTIMAL, FEASIBLE):
+            solution = exported.solution(response)
+    return solution
+
+
+def _solve(exported: ExportedModel, parameters: SolverParameters) -> CpSolverResponse:
+    model = cp_model.CpModel()
+    model.Proto().CopyFrom(exported.proto)
+
+    solver = parameters.solver()
+    progress = parameters.progress()
+    try:
+        with phase("solve"):
+            solver.SolveWithSolutionCallback(model, progress)
+    finally:
+        progress.stop()
+    return solver.ResponseProto()
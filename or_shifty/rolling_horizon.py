@@ -0,0 +1,206 @@
+import logging
+import time
+from collections import Counter
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from or_shifty.config import Config
+from or_shifty.constraints import Constraint
+from or_shifty.formulation import Formulation, SlotFormulation
+from or_shifty.history import History
+from or_shifty.model import evaluate, solve
+from or_shifty.objective import Objective, RankingWeight
+from or_shifty.person import Person
+from or_shifty.shift import AssignedShift, Shift
+from or_shifty.solver_parameters import SolverParameters
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Window:
+    """The days solved for together, of which only those up to committed_until are kept"""
+
+    start: date
+    end: date  # exclusive
+    committed_until: date  # exclusive
+
+
+@dataclass(frozen=True)
+class RollingHorizonReport:
+    windows: int
+    seconds: float
+    objective: float
+    monolithic_seconds: Optional[float] = None
+    monolithic_objective: Optional[float] = None
+
+    def __str__(self):
+        report = (
+            f"Rolling horizon solved {self.windows} windows in {self.seconds:.2f} seconds, "
+            f"objective {self.objective}"
+        )
+        if self.monolithic_seconds is not None:
+            report += (
+                f"; a single solve took {self.monolithic_seconds:.2f} seconds, "
+                f"objective {self.monolithic_objective}"
+            )
+        return report
+
+
+def windows(days: Iterable[date], window_days: int, overlap_days: int) -> List[Window]:
+    """Split the range of the given days into windows of window_days that overlap by overlap_days
+
+    Each window commits the days up to where the next one starts, and the last commits all its days.
+    Windows without any of the given days are skipped.
+    """
+    assert window_days > 0, "Rolling horizon windows must be at least a day long"
+    assert (
+        0 <= overlap_days < window_days
+    ), "Rolling horizon overlap must be shorter than the windows"
+
+    days = sorted(set(days))
+    if not days:
+        return []
+    last = days[-1]
+    step = timedelta(days=window_days - overlap_days)
+    length = timedelta(days=window_days)
+
+    result = []
+    start = days[0]
+    while True:
+        end = start + length
+        if end > last:
+            result.append(Window(start, end, end))
+            return result
+        if any(start <= day < end for day in days):
+            result.append(Window(start, end, start + step))
+        start += step
+
+
+def solve_rolling_horizon(
+    people: List[Person],
+    max_shifts_per_person: int,
+    shifts_by_day: Dict[date, List[Shift]],
+    history: History,
+    window_days: int,
+    overlap_days: int = 0,
+    objective: Objective = RankingWeight(),
+    constraints: List[Constraint] = tuple(),
+    formulation: Formulation = SlotFormulation(),
+    parameters: SolverParameters = SolverParameters(),
+    **solve_kwargs,
+) -> Tuple[List[AssignedShift], int]:
+    """Solve the shifts window by window, in order
+
+    After each window the shifts of its committed days are added to the history, so the next window's
+    history metrics and constraints account for them. Shifts in the overlap with the next window are
+    solved for again there. max_shifts_per_person applies to each window.
+    """
+    solution = []
+    solved_windows = windows(shifts_by_day.keys(), window_days, overlap_days)
+
+    for number, window in enumerate(solved_windows, start=1):
+        log.info(
+            "Solving window %s of %s, %s to %s",
+            number,
+            len(solved_windows),
+            window.start,
+            window.end - timedelta(days=1),
+        )
+        config = Config.build(
+            people=people,
+            max_shifts_per_person=max_shifts_per_person,
+            shifts_by_day={
+                day: day_shifts
+                for day, day_shifts in shifts_by_day.items()
+                if window.start <= day < window.end
+            },
+            history=history,
+            formulation=formulation,
+        )
+        window_solution = solve(
+            config, objective, constraints, parameters=parameters, **solve_kwargs
+        )
+
+        committed = [
+            shift for shift in window_solution if shift.day < window.committed_until
+        ]
+        solution.extend(committed)
+        history = history.including(committed)
+
+    return sorted(solution, key=lambda s: (s.day, s.name)), len(solved_windows)
+
+
+def compare_with_monolithic(
+    people: List[Person],
+    max_shifts_per_person: int,
+    shifts_by_day: Dict[date, List[Shift]],
+    history: History,
+    window_days: int,
+    overlap_days: int = 0,
+    objective: Objective = RankingWeight(),
+    constraints: List[Constraint] = tuple(),
+    formulation: Formulation = SlotFormulation(),
+    parameters: SolverParameters = SolverParameters(),
+    monolithic: bool = True,
+    **solve_kwargs,
+) -> Tuple[List[AssignedShift], RollingHorizonReport]:
+    """Solve with a rolling horizon and report its time and objective
+
+    The rolling horizon solution is scored with the objective over the whole period, allowing each person
+    as many shifts as they were committed to. With monolithic set, the whole period is also solved at once
+    with the same allowance for comparison, which may take much longer.
+    """
+    start = time.perf_counter()
+    solution, solved_windows = solve_rolling_horizon(
+        people,
+        max_shifts_per_person,
+        shifts_by_day,
+        history,
+        window_days,
+        overlap_days,
+        objective=objective,
+        constraints=constraints,
+        formulation=formulation,
+        parameters=parameters,
+        **solve_kwargs,
+    )
+    seconds = time.perf_counter() - start
+
+    # max_shifts_per_person applies to each window, so people can have more shifts over the whole period.
+    # Scoring with fewer would leave some of their shifts out
+    committed_shifts = Counter(shift.person for shift in solution)
+    config = Config.build(
+        people=people,
+        max_shifts_per_person=max(
+            [max_shifts_per_person] + list(committed_shifts.values())
+        ),
+        shifts_by_day=shifts_by_day,
+        history=history,
+        formulation=formulation,
+    )
+    log.info("Scoring rolling horizon solution over the whole period...")
+    score = evaluate(config, objective, constraints, solution, parameters=parameters)
+
+    monolithic_seconds = monolithic_objective = None
+    if monolithic:
+        log.info("Solving the whole period at once for comparison...")
+        start = time.perf_counter()
+        monolithic_solution = solve(
+            config, objective, constraints, parameters=parameters, **solve_kwargs
+        )
+        monolithic_seconds = time.perf_counter() - start
+        monolithic_objective = evaluate(
+            config, objective, constraints, monolithic_solution, parameters=parameters
+        )
+
+    report = RollingHorizonReport(
+        windows=solved_windows,
+        seconds=seconds,
+        objective=score,
+        monolithic_seconds=monolithic_seconds,
+        monolithic_objective=monolithic_objective,
+    )
+    log.info(str(report))
+    return solution, report
@@ -0,0 +1,334 @@
+import argparse
+import json
+import logging
+import os
+import signal
+import socketserver
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+
+from or_shifty.cli import (
+    InvalidInputs,
+    output_json,
+    parse_json_inputs,
+    parse_output,
+)
+from or_shifty.config import Config
+from or_shifty.model import (
+    Infeasible,
+    SolverError,
+    SolverTimeout,
+    evaluate_with_violations,
+    solve_with_violations,
+)
+
+log = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    pass
+
+
+class SolvePool:
+    """A process pool that rejects work once workers + queue_size requests are already waiting on it
+
+    A worker dying, e.g. when it runs out of memory, breaks the process pool. The requests it had
+    fail, and the pool is replaced with a new one for the requests after them.
+    """
+
+    def __init__(self, workers: Optional[int] = None, queue_size: int = 0):
+        assert queue_size >= 0, "The queue size cannot be negative"
+        self._workers = workers or os.cpu_count() or 1
+        self._slots = threading.BoundedSemaphore(self._workers + queue_size)
+        self._lock = threading.Lock()
+        self._executor = self._start()
+
+    def _start(self) -> ProcessPoolExecutor:
+        executor = ProcessPoolExecutor(max_workers=self._workers)
+        # The pool starts all its processes on the first submit. Doing it now forks them before any
+        # request threads exist, which could otherwise hold locks the forked processes would inherit.
+        # A pool replacing a broken one is started while holding the lock requests submit with
+        executor.submit(int).result()
+        return executor
+
+    def submit(self, fn, *args) -> Future:
+        if not self._slots.acquire(blocking=False):
+            raise QueueFull()
+        try:
+            with self._lock:
+                try:
+                    future = self._executor.submit(fn, *args)
+                except BrokenProcessPool:
+                    log.warning("A worker died, replacing the process pool")
+                    self._executor.shutdown(wait=False)
+                    self._executor = self._start()
+                    future = self._executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    """POST /solve and /evaluate with a json body, GET /health
+
+    The body has the same "config" and "history" as the files given to shifty. /solve also takes an
+    optional "hint" and "binary_search" or "soft" flags, and /evaluate takes the "output" to evaluate.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path != "/health":
+            self._respond(HTTPStatus.NOT_FOUND, {"error": f"Unknown path {self.path}"})
+            return
+        self._respond(HTTPStatus.OK, {"status": "ok"})
+
+    def do_POST(self):
+        # The body is always read so the connection can be kept open for the client's next request
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+        if self.path not in ROUTES:
+            self._respond(HTTPStatus.NOT_FOUND, {"error": f"Unknown path {self.path}"})
+            return
+
+        try:
+            body = json.loads(body)
+        except ValueError as e:
+            self._respond(HTTPStatus.BAD_REQUEST, {"error": f"Invalid json: {e}"})
+            return
+
+        try:
+            future = self.server.pool.submit(ROUTES[self.path], body)
+        except QueueFull:
+            self._respond(
+                HTTPStatus.SERVICE_UNAVAILABLE,
+                {"error": "Too many requests are already queued"},
+            )
+            return
+
+        try:
+            status, response = future.result()
+        except BrokenProcessPool:
+            log.error("The process handling a request to %s died", self.path)
+            status, response = (
+                HTTPStatus.INTERNAL_SERVER_ERROR,
+                {"error": "The process handling the request died"},
+            )
+        except Exception as e:
+            log.exception("Unable to handle request to %s", self.path)
+            status, response = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": repr(e)}
+        self._respond(status, response)
+
+    def address_string(self):
+        # Clients connected to a Unix socket have no address
+        return self.client_address[0] if self.client_address else "local"
+
+    def log_message(self, format, *args):
+        log.info("%s - %s", self.address_string(), format % args)
+
+    def _respond(self, status: HTTPStatus, response: Dict[str, Any]) -> None:
+        encoded = json.dumps(response).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(encoded)))
+        self.end_headers()
+        self.wfile.write(encoded)
+
+
+class SolveServer(ThreadingHTTPServer):
+    def __init__(self, address: Tuple[str, int], pool: SolvePool):
+        super().__init__(address, RequestHandler)
+        self.pool = pool
+
+
+class UnixSolveServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str, pool: SolvePool):
+        super().__init__(path, RequestHandler)
+        self.pool = pool
+
+
+def _solve_request(body) -> Tuple[HTTPStatus, Dict[str, Any]]:
+    try:
+        inputs = parse_json_inputs(
+            body["config"],
+            body["history"],
+            hint=parse_output(body["hint"]) if "hint" in body else None,
+            binary_search=bool(body.get("binary_search", False)),
+            soft=bool(body.get("soft", False)),
+        )
+        config = _config(inputs)
+    except (InvalidInputs, AssertionError, KeyError, TypeError, ValueError) as e:
+        return HTTPStatus.BAD_REQUEST, {"error": _invalid_inputs_message(e)}
+
+    try:
+        solution, violations = solve_with_violations(
+            config=config,
+            objective=inputs.objective,
+            constraints=inputs.constraints,
+            binary_search=inputs.binary_search,
+            soft=inputs.soft,
+            parameters=inputs.solver_parameters,
+            hint=inputs.hint,
+        )
+    except Infeasible:
+        return (
+            HTTPStatus.UNPROCESSABLE_ENTITY,
+            {"error": "Unable to solve for the given constraints"},
+        )
+    except SolverError as e:
+        return _solver_error_response(e)
+
+    response = output_json(solution)
+    response["violations"] = [violation.to_json() for violation in violations]
+    return HTTPStatus.OK, response
+
+
+def _evaluate_request(body) -> Tuple[HTTPStatus, Dict[str, Any]]:
+    try:
+        inputs = parse_json_inputs(
+            body["config"], body["history"], output=parse_output(body["output"]),
+        )
+        config = _config(inputs)
+    except (InvalidInputs, AssertionError, KeyError, TypeError, ValueError) as e:
+        return HTTPStatus.BAD_REQUEST, {"error": _invalid_inputs_message(e)}
+
+    try:
+        score, violations = evaluate_with_violations(
+            config=config,
+            objective=inputs.objective,
+            constraints=inputs.constraints,
+            solution=inputs.output,
+            parameters=inputs.solver_parameters,
+        )
+    except Infeasible:
+        return (
+            HTTPStatus.UNPROCESSABLE_ENTITY,
+            {"error": "The provided output is infeasible for the solver"},
+        )
+    except SolverError as e:
+        return _solver_error_response(e)
+
+    return (
+        HTTPStatus.OK,
+        {
+            "objective": score,
+            "violations": [violation.to_json() for violation in violations],
+        },
+    )
+
+
+ROUTES = {"/solve": _solve_request, "/evaluate": _evaluate_request}
+
+
+def _config(inputs) -> Config:
+    return Config.build(
+        people=inputs.people,
+        max_shifts_per_person=inputs.max_shifts_per_person,
+        shifts_by_day=inputs.shifts_by_day,
+        history=inputs.history,
+        formulation=inputs.formulation,
+    )
+
+
+def _invalid_inputs_message(e: Exception) -> str:
+    if isinstance(e, InvalidInputs):
+        return e.msg
+    if isinstance(e, KeyError):
+        return f"Missing {e}"
+    if isinstance(e, AssertionError):
+        return f"Invalid config: {e}" if str(e) else "Invalid config"
+    return str(e)
+
+
+def _solver_error_response(e: SolverError) -> Tuple[HTTPStatus, Dict[str, Any]]:
+    if isinstance(e, SolverTimeout):
+        return HTTPStatus.GATEWAY_TIMEOUT, {"error": str(e)}
+    return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(e)}
+
+
+def parse_serve_args(args=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="shifty serve",
+        description="Keep shifty running and solve or evaluate the config and history sent to it",
+    )
+    address = parser.add_mutually_exclusive_group()
+    address.add_argument(
+        "--port",
+        dest="port",
+        type=int,
+        default=8080,
+        help="Port to listen on for HTTP requests on localhost",
+    )
+    address.add_argument(
+        "--socket",
+        dest="socket",
+        action="store",
+        default=None,
+        help="Path of a Unix socket to listen on for HTTP requests instead of a port",
+    )
+    parser.add_argument(
+        "--host",
+        dest="host",
+        action="store",
+        default="127.0.0.1",
+        help="Address to listen on with --port",
+    )
+    parser.add_argument(
+        "--processes",
+        dest="processes",
+        type=int,
+        default=None,
+        help="Number of requests to handle at once, defaults to the number of cores",
+    )
+    parser.add_argument(
+        "--queue-size",
+        dest="queue_size",
+        type=int,
+        default=0,
+        help="Number of requests to queue once all processes are busy, before rejecting them",
+    )
+    parser.add_argument(
+        "-v",
+        dest="verbose",
+        action="store_true",
+        default=False,
+        help="Change the log level to debug",
+    )
+    return parser.parse_args(args)
+
+
+def serve(args) -> None:
+    pool = SolvePool(workers=args.processes, queue_size=args.queue_size)
+    if args.socket is not None:
+        server = UnixSolveServer(args.socket, pool)
+        log.info("Listening on %s", args.socket)
+    else:
+        server = SolveServer((args.host, args.port), pool)
+        log.info("Listening on %s:%s", *server.server_address[:2])
+
+    # Stop cleanly when terminated as well as when interrupted
+    signal.signal(signal.SIGTERM, _interrupt)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        pool.shutdown()
+        if args.socket is not None:
+            os.remove(args.socket)
+
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt()
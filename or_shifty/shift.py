@@ -2,16 +2,36 @@ from dataclasses import dataclass
 from datetime import date, datetime
 from enum import Enum, auto
 from typing import Any, Dict
+from weakref import WeakValueDictionary
 
 from or_shifty.person import Person
 
 
 @dataclass(frozen=True)
 class Shift:
+    """A shift on a given day
+
+    Instances are interned so that equal shifts are the same object.
+    """
+
+    __slots__ = ("name", "shift_type", "day", "__weakref__")
+    _interned = WeakValueDictionary()
+
     name: str
     shift_type: "ShiftType"
     day: date
 
+    def __new__(cls, name: str, shift_type: "ShiftType", day: date):
+        key = (name, shift_type, day)
+        shift = cls._interned.get(key)
+        if shift is None:
+            shift = super().__new__(cls)
+            cls._interned[key] = shift
+        return shift
+
+    def __reduce__(self):
+        return Shift, (self.name, self.shift_type, self.day)
+
     @classmethod
     def from_json(cls, serialised: Dict[str, Any]) -> "Shift":
         return Shift(
@@ -35,8 +55,16 @@ class Shift:
 
 @dataclass(frozen=True)
 class AssignedShift(Shift):
+    __slots__ = ("person",)
+
     person: Person
 
+    def __new__(cls, name: str, shift_type: "ShiftType", day: date, person: Person):
+        return object.__new__(cls)
+
+    def __reduce__(self):
+        return AssignedShift, (self.name, self.shift_type, self.day, self.person)
+
     def __str__(self):
         st_len = max(len(st.name) for st in ShiftType)
         shift_type = self.shift_type.name.lower()
@@ -0,0 +1,92 @@
+import logging
+import os
+from dataclasses import dataclass, fields, replace
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional
+
+if TYPE_CHECKING:
+    from ortools.sat.python import cp_model
+
+    from or_shifty.progress import SolutionProgress
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class SolverParameters:
+    """CP-SAT search parameters, None leaves the solver's own default in place"""
+
+    # 0 means one worker per available core
+    workers: Optional[int] = None
+    time_limit_seconds: Optional[float] = None
+    relative_gap: Optional[float] = None
+    absolute_gap: Optional[float] = None
+    random_seed: Optional[int] = None
+    log_search_progress: Optional[bool] = None
+    # Stop once no better solution has been found for this long
+    stall_seconds: Optional[float] = None
+
+    @classmethod
+    def from_json(cls, serialised: Dict[str, Any]) -> "SolverParameters":
+        unknown = set(serialised.keys()) - {field.name for field in fields(cls)}
+        assert not unknown, f"Unknown solver parameters {', '.join(sorted(unknown))}"
+        return cls(**serialised)
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            field.name: getattr(self, field.name)
+            for field in fields(self)
+            if getattr(self, field.name) is not None
+        }
+
+    def override(self, **overrides) -> "SolverParameters":
+        """Return a copy with every override that is not None applied"""
+        return replace(
+            self,
+            **{name: value for name, value in overrides.items() if value is not None},
+        )
+
+    def solver(self) -> "cp_model.CpSolver":
+        # Imported here so parsing parameters does not load ortools
+        from ortools.sat.python import cp_model
+
+        solver = cp_model.CpSolver()
+        parameters = solver.parameters
+
+        if self.workers is not None:
+            parameters.num_search_workers = self.workers or os.cpu_count() or 1
+        if self.time_limit_seconds is not None:
+            parameters.max_time_in_seconds = self.time_limit_seconds
+        if self.relative_gap is not None:
+            parameters.relative_gap_limit = self.relative_gap
+        if self.absolute_gap is not None:
+            parameters.absolute_gap_limit = self.absolute_gap
+        if self.random_seed is not None:
+            parameters.random_seed = self.random_seed
+        if self.log_search_progress is not None:
+            parameters.log_search_progress = self.log_search_progress
+
+        return solver
+
+    def progress(self, on_solution: Optional[Callable] = None) -> "SolutionProgress":
+        """A solution callback that applies the parameters CP-SAT has no equivalent of"""
+        from or_shifty.progress import SolutionProgress
+
+        return SolutionProgress(
+            on_solution=on_solution,
+            stall_seconds=self.stall_seconds,
+            relative_gap=self.relative_gap,
+        )
+
+    def log_effective(self) -> None:
+        parameters = self.solver().parameters
+        log.info(
+            "Solver parameters: workers %s, time limit %s seconds, relative gap %s, absolute gap %s, "
+            "random seed %s, log search progress %s, stall time %s seconds",
+            parameters.num_search_workers,
+            parameters.max_time_in_seconds,
+            parameters.relative_gap_limit,
+            parameters.absolute_gap_limit,
+            parameters.random_seed,
+            parameters.log_search_progress,
+            self.stall_seconds,
+        )
@@ -0,0 +1,159 @@
+import json
+import os
+
+import pytest
+
+from or_shifty import batch
+from or_shifty.batch import (
+    FAILED,
+    INFEASIBLE,
+    SOLVED,
+    Job,
+    parse_batch_args,
+    read_manifest,
+    run_batch,
+)
+from or_shifty.cli import InvalidInputs, read_output
+
+TEST_FILES = os.path.abspath("tests/test_files")
+_run_job = batch._run_job
+
+
+def _job(tmp_path, name, directory="cli"):
+    return Job(
+        name=name,
+        config_path=os.path.join(TEST_FILES, directory, "config.json"),
+        history_path=os.path.join(TEST_FILES, directory, "history.json"),
+        output_path=str(tmp_path / f"{name}.json"),
+    )
+
+
+def test_manifest_paths_are_relative_to_the_manifest(tmp_path):
+    manifest = tmp_path / "manifest.json"
+    manifest.write_text(
+        json.dumps(
+            {
+                "jobs": [
+                    {
+                        "name": "ops",
+                        "config": "ops/config.json",
+                        "history": "ops/history.json",
+                        "output": "ops/output.json",
+                    },
+                    {
+                        "config": "/abs/config.json",
+                        "history": "history.json",
+                        "output": "output.json",
+                    },
+                ]
+            }
+        )
+    )
+
+    inputs = parse_batch_args(
+        ["--manifest", str(manifest), "--processes", "2", "--workers", "1"]
+    )
+
+    assert inputs.jobs == [
+        Job(
+            name="ops",
+            config_path=str(tmp_path / "ops/config.json"),
+            history_path=str(tmp_path / "ops/history.json"),
+            output_path=str(tmp_path / "ops/output.json"),
+        ),
+        Job(
+            name="/abs/config.json",
+            config_path="/abs/config.json",
+            history_path=str(tmp_path / "history.json"),
+            output_path=str(tmp_path / "output.json"),
+        ),
+    ]
+    assert inputs.processes == 2
+    assert inputs.solver_overrides == {"workers": 1}
+
+
+def test_manifest_jobs_must_have_their_own_outputs(tmp_path):
+    manifest = tmp_path / "manifest.json"
+    job = {"config": "config.json", "history": "history.json", "output": "out.json"}
+    manifest.write_text(json.dumps({"jobs": [job, job]}))
+
+    with pytest.raises(InvalidInputs):
+        read_manifest(str(manifest))
+
+
+def test_every_constraint_of_the_dropped_tiers_is_reported(tmp_path):
+    with open(os.path.join(TEST_FILES, "no_solution", "config.json")) as f:
+        config = json.load(f)
+    # Satisfied by any solution, but dropped before the tier that makes the config infeasible
+    config["constraints"].append(
+        {
+            "type": "RespectPersonRestrictionsPerDay",
+            "name": "Holidays",
+            "priority": 2,
+            "params": {"restrictions": {"Mon Mothma": ["2019-12-25"]}},
+        }
+    )
+    (tmp_path / "config.json").write_text(json.dumps(config))
+    job = Job(
+        name="over-constrained",
+        config_path=str(tmp_path / "config.json"),
+        history_path=os.path.join(TEST_FILES, "no_solution", "history.json"),
+        output_path=str(tmp_path / "output.json"),
+    )
+
+    (result,) = run_batch([job], processes=1)
+
+    assert result.status == SOLVED
+    assert result.dropped_constraints == ["Holidays", "RespectPersonRestrictionsPerDay"]
+
+
+def test_failed_jobs_do_not_stop_the_others(tmp_path):
+    jobs = [
+        _job(tmp_path, "infeasible"),
+        Job(
+            name="missing",
+            config_path=str(tmp_path / "missing.json"),
+            history_path=str(tmp_path / "missing.json"),
+            output_path=str(tmp_path / "missing-output.json"),
+        ),
+        _job(tmp_path, "over-constrained", directory="no_solution"),
+    ]
+
+    results = run_batch(jobs, processes=2)
+
+    assert [result.job for result in results] == jobs
+    assert [result.status for result in results] == [INFEASIBLE, FAILED, SOLVED]
+    assert "FileNotFoundError" in results[1].error
+    assert results[2].dropped_constraints == ["RespectPersonRestrictionsPerDay"]
+    assert not os.path.exists(jobs[0].output_path)
+    assert not os.path.exists(jobs[1].output_path)
+    assert len(read_output(jobs[2].output_path)) == 2
+
+
+def _run_job_unless_crashing(job, solver_overrides):
+    if job.name == "crash":
+        os._exit(1)
+    return _run_job(job, solver_overrides)
+
+
+def test_jobs_that_kill_their_process_do_not_stop_the_others(tmp_path, monkeypatch):
+    # Workers are forked, so they run the patched function too
+    monkeypatch.setattr(batch, "_run_job", _run_job_unless_crashing)
+    jobs = [
+        _job(tmp_path, name, directory="no_solution")
+        for name in ("first", "crash", "second", "third", "fourth")
+    ]
+
+    results = run_batch(jobs, processes=2)
+
+    assert [result.job for result in results] == jobs
+    assert [result.status for result in results] == [
+        SOLVED,
+        FAILED,
+        SOLVED,
+        SOLVED,
+        SOLVED,
+    ]
+    assert "BrokenProcessPool" in results[1].error
+    for job in jobs[:1] + jobs[2:]:
+        assert len(read_output(job.output_path)) == 2
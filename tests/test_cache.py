@@ -0,0 +1,195 @@
+import hashlib
+import json
+import os
+import time
+from datetime import date
+
+from or_shifty.app import run
+from or_shifty.cache import (
+    CachedResult,
+    ResultCache,
+    cache_key,
+    default_cache_dir,
+)
+from or_shifty.cli import parse_args, parse_json_inputs
+from or_shifty.person import Person
+from or_shifty.shift import AssignedShift, ShiftType
+
+CLI_ARGS = [
+    "--config",
+    "tests/test_files/cli/config.json",
+    "--history",
+    "tests/test_files/cli/history.json",
+]
+
+
+def _load(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def _inputs(config=None, **kwargs):
+    if config is None:
+        config = _load("tests/test_files/cli/config.json")
+    return parse_json_inputs(
+        config, _load("tests/test_files/cli/history.json"), **kwargs
+    )
+
+
+def _feasible_args(tmp_path):
+    config = _load("tests/test_files/cli/config.json")
+    config["constraints"] = []
+    config_path = tmp_path / "config.json"
+    config_path.write_text(json.dumps(config))
+    return ["--config", str(config_path), "--history", CLI_ARGS[3]]
+
+
+def _key(name):
+    return hashlib.sha256(name.encode("utf-8")).hexdigest()
+
+
+def _result():
+    return CachedResult(
+        solution=[
+            AssignedShift(
+                name="ops",
+                shift_type=ShiftType.STANDARD,
+                day=date(2019, 12, 1),
+                person=Person("Admiral Ackbar"),
+            )
+        ],
+        violations=[
+            {"constraint": "Constraint", "priority": 1, "person": None, "day": None}
+        ],
+    )
+
+
+def test_key_ignores_the_order_of_config_keys():
+    config = _load("tests/test_files/cli/config.json")
+    reordered = {key: config[key] for key in reversed(list(config.keys()))}
+
+    assert cache_key(_inputs(reordered)) == cache_key(_inputs(config))
+
+
+def test_key_changes_with_anything_that_can_change_the_solution():
+    config = _load("tests/test_files/cli/config.json")
+    key = cache_key(_inputs(config))
+
+    config["constraints"][-1]["priority"] += 1
+    assert cache_key(_inputs(config)) != key
+    assert cache_key(_inputs(solver_overrides={"random_seed": 3})) != key
+    assert cache_key(_inputs(soft=True)) != key
+    # Where the solution is written does not change it
+    assert cache_key(_inputs(output_path="output.json")) == key
+
+
+def test_cached_results_are_read_back(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    result = _result()
+
+    assert cache.get("key") is None
+    cache.put("key", result)
+
+    assert cache.get("key") == result
+
+
+def test_entries_unused_for_longer_than_the_max_age_are_evicted(tmp_path):
+    cache = ResultCache(str(tmp_path), max_age_seconds=60)
+    result = _result()
+    cache.put(_key("old"), result)
+    an_hour_ago = time.time() - 60 * 60
+    os.utime(str(tmp_path / f"{_key('old')}.json"), (an_hour_ago, an_hour_ago))
+
+    cache.put(_key("new"), result)
+
+    assert not (tmp_path / f"{_key('old')}.json").exists()
+    assert cache.get(_key("new")) == result
+
+
+def test_least_recently_used_entries_are_evicted_past_the_max_size(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    result = _result()
+    for age, name in enumerate(["first", "second", "third"]):
+        cache.put(_key(name), result)
+        used = time.time() - 60 * (3 - age)
+        os.utime(str(tmp_path / f"{_key(name)}.json"), (used, used))
+    # Using the first entry makes the second the least recently used
+    cache.get(_key("first"))
+
+    cache.max_bytes = 2 * os.path.getsize(str(tmp_path / f"{_key('first')}.json"))
+    cache.evict()
+
+    assert sorted(os.listdir(str(tmp_path))) == sorted(
+        [f"{_key('first')}.json", f"{_key('third')}.json"]
+    )
+
+
+def test_only_files_written_by_the_cache_are_evicted(tmp_path):
+    cache = ResultCache(str(tmp_path), max_age_seconds=60, max_bytes=0)
+    other_files = ["config.json", "notes.txt", f"{_key('other')}.json.bak"]
+    for name in other_files:
+        (tmp_path / name).write_text("{}")
+    stale_temporary = tmp_path / f".{_key('stale')}.abc123_x.tmp"
+    stale_temporary.write_text("{")
+    two_months_ago = time.time() - 60 * 24 * 60 * 60
+    for path in tmp_path.iterdir():
+        os.utime(str(path), (two_months_ago, two_months_ago))
+
+    cache.put(_key("new"), _result())
+
+    assert sorted(os.listdir(str(tmp_path))) == sorted(other_files)
+
+
+def test_unreadable_entries_are_removed(tmp_path):
+    (tmp_path / "key.json").write_text("{")
+
+    assert ResultCache(str(tmp_path)).get("key") is None
+    assert not (tmp_path / "key.json").exists()
+
+
+def test_a_cache_dir_that_cannot_be_used_is_treated_as_empty(tmp_path):
+    not_a_directory = tmp_path / "file"
+    not_a_directory.write_text("")
+    cache = ResultCache(str(not_a_directory))
+
+    cache.put("key", _result())
+    cache.evict()
+
+    assert cache.get("key") is None
+    assert not_a_directory.read_text() == ""
+
+
+def test_solutions_are_written_when_the_default_cache_dir_cannot_be_created(
+    tmp_path, monkeypatch
+):
+    monkeypatch.setenv("XDG_CACHE_HOME", "/proc/nope")
+    output = tmp_path / "output.json"
+
+    run(parse_args(_feasible_args(tmp_path) + ["--output", str(output)]))
+
+    assert len(_load(str(output))) > 0
+
+
+def test_solutions_are_written_when_the_cache_dir_is_a_file(tmp_path):
+    cache_dir = tmp_path / "cache"
+    cache_dir.write_text("")
+    output = tmp_path / "output.json"
+
+    run(
+        parse_args(
+            _feasible_args(tmp_path)
+            + ["--cache-dir", str(cache_dir), "--output", str(output)]
+        )
+    )
+
+    assert len(_load(str(output))) > 0
+
+
+def test_cache_dir_args(tmp_path):
+    assert parse_args(CLI_ARGS).cache_dir == default_cache_dir()
+    assert parse_args(CLI_ARGS + ["--cache-dir", str(tmp_path)]).cache_dir == str(
+        tmp_path
+    )
+    assert parse_args(CLI_ARGS + ["--no-cache"]).cache_dir is None
+    # Measured runs always solve
+    assert parse_args(CLI_ARGS + ["--stats", "stats.json"]).cache_dir is None
@@ -1,8 +1,13 @@
+import json
+import os
+import subprocess
+import sys
 from datetime import date
 
+import pkg_resources
 import pytest
 
-from or_shifty.cli import InvalidInputs, parse_args
+from or_shifty.cli import InvalidInputs, parse_args, read_output, write_output
 from or_shifty.constraints import (
     EachPersonWorksAtMostXShiftsPerAssignmentPeriod,
     RespectPersonRestrictionsPerDay,
@@ -11,6 +16,7 @@ from or_shifty.constraints import (
 )
 from or_shifty.person import Person
 from or_shifty.shift import AssignedShift, Shift, ShiftType
+from or_shifty.solver_parameters import SolverParameters
 
 
 def test_parsing_inputs():
@@ -139,3 +145,156 @@ def test_parsing_invalid_output():
                 "--evaluate",
             ]
         )
+
+
+def test_parsing_solver_parameters(tmp_path):
+    with open("tests/test_files/cli/config.json") as f:
+        config = json.load(f)
+    config["solver"] = {"workers": 4, "time_limit_seconds": 10, "random_seed": 1}
+    config_path = tmp_path / "config.json"
+    config_path.write_text(json.dumps(config))
+
+    inputs = parse_args(
+        [
+            "--config",
+            str(config_path),
+            "--history",
+            "tests/test_files/cli/history.json",
+            "--time-limit",
+            "2.5",
+            "--relative-gap",
+            "0.05",
+        ]
+    )
+
+    assert inputs.solver_parameters == SolverParameters(
+        workers=4, time_limit_seconds=2.5, relative_gap=0.05, random_seed=1
+    )
+
+
+def test_parsing_hint():
+    inputs = parse_args(
+        [
+            "--config",
+            "tests/test_files/cli/config.json",
+            "--history",
+            "tests/test_files/cli/history.json",
+            "--hint",
+            "tests/test_files/cli/output.json",
+        ]
+    )
+
+    assert inputs.hint == read_output("tests/test_files/cli/output.json")
+    assert inputs.output is None
+
+
+def test_anytime_output_needs_an_output_path():
+    with pytest.raises(InvalidInputs):
+        parse_args(
+            [
+                "--config",
+                "tests/test_files/cli/config.json",
+                "--history",
+                "tests/test_files/cli/history.json",
+                "--anytime-output",
+            ]
+        )
+
+
+@pytest.mark.parametrize(
+    "args", [["--decompose"], ["--parallel-tiers"], ["--rolling-horizon", "7"]]
+)
+def test_anytime_output_cannot_be_combined_with_other_solve_modes(tmp_path, args):
+    with pytest.raises(InvalidInputs, match="Anytime output"):
+        parse_args(
+            [
+                "--config",
+                "tests/test_files/cli/config.json",
+                "--history",
+                "tests/test_files/cli/history.json",
+                "--output",
+                str(tmp_path / "output.json"),
+                "--anytime-output",
+            ]
+            + args
+        )
+
+
+def test_writing_output_replaces_the_file(tmp_path):
+    output_path = str(tmp_path / "output.json")
+    solution = read_output("tests/test_files/cli/output.json")
+
+    write_output(output_path, solution[:1])
+    write_output(output_path, solution)
+
+    assert read_output(output_path) == solution
+    assert os.listdir(str(tmp_path)) == ["output.json"]
+
+
+def test_version(capsys):
+    with pytest.raises(SystemExit):
+        parse_args(["--version"])
+
+    version = pkg_resources.get_distribution("or-shifty").version
+    assert capsys.readouterr().out.strip() == version
+
+
+def test_importing_the_app_does_not_import_the_solver():
+    # Run in a fresh interpreter as other tests have already imported everything
+    imported = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, or_shifty.app; print(' '.join(sorted(sys.modules)))",
+        ],
+        check=True,
+        stdout=subprocess.PIPE,
+    ).stdout.decode()
+
+    packages = {module.split(".")[0] for module in imported.split()}
+    assert packages.isdisjoint({"ortools", "numpy", "pkg_resources"})
+
+
+def test_stats_path():
+    inputs = parse_args(
+        [
+            "--config",
+            "tests/test_files/cli/config.json",
+            "--history",
+            "tests/test_files/cli/history.json",
+            "--stats",
+            "stats.json",
+        ]
+    )
+
+    assert inputs.stats_path == "stats.json"
+
+
+def test_profile_path():
+    inputs = parse_args(
+        [
+            "--config",
+            "tests/test_files/cli/config.json",
+            "--history",
+            "tests/test_files/cli/history.json",
+            "--profile",
+            "profile",
+        ]
+    )
+
+    assert inputs.profile_path == "profile"
+
+
+def test_export_model_path():
+    inputs = parse_args(
+        [
+            "--config",
+            "tests/test_files/cli/config.json",
+            "--history",
+            "tests/test_files/cli/history.json",
+            "--export-model",
+            "model.json",
+        ]
+    )
+
+    assert inputs.export_model_path == "model.json"
@@ -1,9 +1,8 @@
 import itertools
-from collections import defaultdict
 from datetime import date
-from unittest.mock import Mock
 
-from ortools.sat.python.cp_model import CpModel, EvaluateLinearExpr
+import numpy as np
+from ortools.sat.python.cp_model import CpModel
 from pytest import fixture
 
 from or_shifty.config import Config
@@ -17,29 +16,21 @@ from or_shifty.constraints import (
     RespectPersonRestrictionsPerShiftType,
     ThereShouldBeAtLeastXDaysBetweenOps,
     ThereShouldBeAtLeastXDaysBetweenOpsOfShiftTypes,
+    add_primitive,
 )
 from or_shifty.history import History
-from or_shifty.model import init_assignments
+from or_shifty.model import GeneratedConstraints, init_assignments
 from or_shifty.person import Person
 from or_shifty.shift import AssignedShift, Shift, ShiftType
 
 
-def evaluate(assignments, chosen_assignments, expressions):
-    solution = Mock()
-    solution_map = defaultdict(lambda: False)
+def evaluate(assignments, chosen_assignments, generated):
+    values = np.zeros(len(generated.proto.variables), dtype=np.int64)
     for assignment in chosen_assignments:
-        solution_map[assignments[assignment].Index()] = True
-    solution.solution = solution_map
+        values[assignments[assignment].Index()] = 1
 
-    for expression in expressions:
-        expr = expression.Expression()
-        bounds = expression.Bounds()
-        value = EvaluateLinearExpr(expr, solution)
-        valid = bounds[0] <= value <= bounds[1]
-        if not valid:
-            return False
-
-    return True
+    _, valid = generated.evaluate(values)
+    return bool(valid.all())
 
 
 @fixture
@@ -96,11 +87,11 @@ def build_run_data(people, shifts_per_day):
 @fixture
 def build_expressions(model):
     def build(constraint, data, assignments):
-        expressions = [e[0] for e in constraint.generate(assignments, data)]
-        for expr in expressions:
-            model.Add(expr)
+        generated = GeneratedConstraints(model.Proto())
+        for primitive, impact in constraint.generate(assignments, data):
+            generated.add(add_primitive(model, primitive), constraint, impact)
 
-        return expressions
+        return generated
 
     return build
 
@@ -0,0 +1,100 @@
+from datetime import date
+
+from pytest import fixture
+
+from or_shifty.config import Config
+from or_shifty.constraints import RespectPersonRestrictionsPerDay
+from or_shifty.decomposition import Component, components, solve_components
+from or_shifty.history import History
+from or_shifty.model import evaluate, solve
+from or_shifty.objective import RankingWeight
+from or_shifty.person import Person
+from or_shifty.shift import AssignedShift, Shift, ShiftType
+
+
+@fixture
+def people():
+    return [Person(name) for name in "ABCDE"]
+
+
+@fixture
+def shifts_by_day():
+    days = [date(2019, 1, day) for day in range(1, 5)]
+    return {
+        day: [
+            Shift(name="ops", shift_type=ShiftType.STANDARD, day=day),
+            Shift(name="support", shift_type=ShiftType.SPECIAL_A, day=day),
+        ]
+        for day in days
+    }
+
+
+@fixture
+def config(people, shifts_by_day):
+    return Config.build(
+        people=people,
+        max_shifts_per_person=3,
+        shifts_by_day=shifts_by_day,
+        history=History.build(
+            past_shifts=[
+                AssignedShift("ops", ShiftType.STANDARD, date(2018, 12, 31), people[1]),
+                AssignedShift(
+                    "support", ShiftType.SPECIAL_A, date(2018, 12, 30), people[3]
+                ),
+            ]
+        ),
+    )
+
+
+@fixture
+def restrictions():
+    return {
+        "A": ["2019-01-03", "2019-01-04"],
+        "B": ["2019-01-03", "2019-01-04"],
+        "C": ["2019-01-01", "2019-01-02"],
+        "D": ["2019-01-01", "2019-01-02"],
+        "E": ["2019-01-01", "2019-01-02", "2019-01-03", "2019-01-04"],
+    }
+
+
+@fixture
+def constraints(restrictions):
+    return [RespectPersonRestrictionsPerDay(priority=0, restrictions=restrictions)]
+
+
+def test_components_split_people_by_the_shifts_they_can_cover(
+    config, constraints, people, shifts_by_day
+):
+    assert components(config, constraints) == [
+        Component(
+            people=people[:2],
+            shifts_by_day={
+                day: shifts for day, shifts in shifts_by_day.items() if day.day <= 2
+            },
+        ),
+        Component(
+            people=people[2:4],
+            shifts_by_day={
+                day: shifts for day, shifts in shifts_by_day.items() if day.day > 2
+            },
+        ),
+    ]
+
+
+def test_optional_constraints_do_not_split_components(config, restrictions):
+    optional = [RespectPersonRestrictionsPerDay(priority=1, restrictions=restrictions)]
+
+    assert len(components(config, optional)) == 1
+
+
+def test_components_solve_to_the_same_score(config, constraints):
+    solution, violations = solve_components(config, RankingWeight(), constraints)
+
+    monolithic = solve(config, RankingWeight(), constraints)
+    assert [shift.unassigned() for shift in solution] == [
+        shift.unassigned() for shift in monolithic
+    ]
+    assert evaluate(config, RankingWeight(), constraints, solution) == evaluate(
+        config, RankingWeight(), constraints, monolithic
+    )
+    assert violations == []
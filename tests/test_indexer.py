@@ -1,6 +1,7 @@
+import itertools
 from datetime import date
 
-from pytest import fixture
+from pytest import fixture, raises
 
 from or_shifty.indexer import IndexEntry, Indexer
 from or_shifty.person import Person
@@ -61,3 +62,112 @@ def test_iter(indexer, people, days, shifts_per_day):
     )
     assert len(entries) == 1
     assert entries[0].idx == (1, 0, 1, 0)
+
+
+def test_iter_filters_match_full_scan():
+    people = [Person("A"), Person("B"), Person("C")]
+    days = [date(2019, 11, 26), date(2019, 11, 27), date(2019, 11, 28)]
+    shifts_per_day = {
+        day: [
+            Shift(name="shift-2", shift_type=ShiftType.SPECIAL_A, day=day),
+            Shift(name="shift-1", shift_type=ShiftType.STANDARD, day=day),
+        ]
+        for day in days
+    }
+    indexer = Indexer.build(people, 2, shifts_per_day)
+    all_entries = list(indexer.iter())
+
+    for person, person_shift, day in itertools.product(
+        people + [None], [0, 1, None], days + [None]
+    ):
+        day_shifts = [None] if day is None else shifts_per_day[day] + [None]
+        for day_shift in day_shifts:
+            expected = [
+                entry
+                for entry in all_entries
+                if (person is None or entry.person == person)
+                and (person_shift is None or entry.person_shift == person_shift)
+                and (day is None or entry.day == day)
+                and (day_shift is None or entry.day_shift == day_shift)
+            ]
+            assert (
+                list(
+                    indexer.iter(
+                        person_filter=person,
+                        person_shift_filter=person_shift,
+                        day_filter=day,
+                        day_shift_filter=day_shift,
+                    )
+                )
+                == expected
+            )
+
+
+def test_ids_tensor_with_uneven_days(people):
+    days = [date(2019, 11, 26), date(2019, 11, 27)]
+    shifts_per_day = {
+        days[0]: [Shift(name="shift-1", shift_type=ShiftType.STANDARD, day=days[0])],
+        days[1]: [
+            Shift(name="shift-1", shift_type=ShiftType.STANDARD, day=days[1]),
+            Shift(name="shift-2", shift_type=ShiftType.SPECIAL_A, day=days[1]),
+        ],
+    }
+    indexer = Indexer.build(people, 1, shifts_per_day)
+
+    assert indexer.shape == (2, 1, 2, 2)
+    assert len(indexer) == 6
+    assert indexer.ids[0, 0].tolist() == [[0, -1], [1, 2]]
+    assert indexer.ids[:, :, 1, :].tolist() == [[[1, 2]], [[4, 5]]]
+
+    with raises(KeyError):
+        indexer.get((0, 0, 0, 1))
+
+
+def test_select(people, days, shifts_per_day):
+    shifts_per_day = dict(shifts_per_day)
+    shifts_per_day[days[1]] = shifts_per_day[days[1]] + [
+        Shift(name="shift-2", shift_type=ShiftType.SPECIAL_A, day=days[1])
+    ]
+    indexer = Indexer.build(people, 2, shifts_per_day)
+
+    def coordinates(selection):
+        return [tuple(int(c) for c in coords) for coords in zip(*selection)]
+
+    assert coordinates(indexer.select(day=days[1])) == [
+        (0, 0, 1, 0),
+        (0, 0, 1, 1),
+        (0, 1, 1, 0),
+        (0, 1, 1, 1),
+        (1, 0, 1, 0),
+        (1, 0, 1, 1),
+        (1, 1, 1, 0),
+        (1, 1, 1, 1),
+    ]
+    assert coordinates(
+        indexer.select(person=people[1], shift_type=ShiftType.SPECIAL_A)
+    ) == [(1, 0, 1, 1), (1, 1, 1, 1)]
+    assert (
+        coordinates(
+            indexer.select(
+                person=people[0],
+                person_shift=1,
+                day=days[0],
+                shift_type=ShiftType.SPECIAL_A,
+            )
+        )
+        == []
+    )
+
+
+def test_without(indexer, people, days, shifts_per_day):
+    sparse = indexer.without([(people[0], days[1], shifts_per_day[days[1]][0])])
+
+    assert len(sparse) == 3
+    assert sparse.shape == indexer.shape
+    assert [entry.idx for entry in sparse.iter()] == [
+        (0, 0, 0, 0),
+        (1, 0, 0, 0),
+        (1, 0, 1, 0),
+    ]
+    assert sparse.ids[:, 0, :, 0].tolist() == [[0, -1], [1, 2]]
+    assert list(sparse.iter(person_filter=people[0], day_filter=days[1])) == []
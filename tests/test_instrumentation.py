@@ -0,0 +1,76 @@
+import pytest
+
+from or_shifty.cli import parse_args
+from or_shifty.config import Config
+from or_shifty.instrumentation import StatsRecorder, phase
+from or_shifty.model import solve
+
+
+def test_nested_and_repeated_phases_are_recorded():
+    with StatsRecorder() as outer:
+        with phase("build"):
+            with StatsRecorder() as inner:
+                with phase("index"):
+                    pass
+        with phase("build"):
+            pass
+
+    with phase("unrecorded"):
+        pass
+
+    assert list(outer.phases.keys()) == ["index", "build"]
+    assert outer.phases["build"].calls == 2
+    assert outer.phases["build"].wall_seconds >= outer.phases["index"].wall_seconds
+    assert list(inner.phases.keys()) == ["index"]
+
+
+def test_phases_record_their_own_peak_memory_growth():
+    pytest.importorskip("resource")
+    with StatsRecorder() as recorder:
+        with phase("allocate"):
+            allocated = b"x" * (64 * 1024 * 1024)
+        del allocated
+        with phase("after"):
+            pass
+
+    assert recorder.phases["allocate"].peak_rss_growth_bytes >= 32 * 1024 * 1024
+    assert recorder.phases["after"].peak_rss_growth_bytes == 0
+
+
+def test_every_phase_of_a_solve_is_recorded():
+    with StatsRecorder() as recorder:
+        inputs = parse_args(
+            [
+                "--config",
+                "tests/test_files/no_solution/config.json",
+                "--history",
+                "tests/test_files/no_solution/history.json",
+            ]
+        )
+        config = Config.build(
+            people=inputs.people,
+            max_shifts_per_person=inputs.max_shifts_per_person,
+            shifts_by_day=inputs.shifts_by_day,
+            history=inputs.history,
+        )
+        solve(config, inputs.objective, inputs.constraints)
+
+    assert {
+        "parse_inputs",
+        "build_config",
+        "build_indexer",
+        "presolve",
+        "generate RespectPersonRestrictionsPerDay",
+        "build_objective",
+        "solve",
+        "validate",
+    } <= recorder.phases.keys()
+    # A constraint had to be dropped
+    assert recorder.phases["solve"].calls == 2
+    assert [(s.priorities, s.status) for s in recorder.solves] == [
+        ([0, 1], "INFEASIBLE"),
+        ([0], "OPTIMAL"),
+    ]
+    assert recorder.solves[1].objective == recorder.solves[1].best_bound
+    stats = {stats.name: stats for stats in recorder.constraints}
+    assert stats["EachDayShiftIsAssignedToExactlyOnePersonShift"].expressions == 2
@@ -1,6 +1,52 @@
-from or_shifty.cli import parse_args
+import itertools
+import logging
+import os
+import time
+from datetime import date
+
+import numpy as np
+from ortools.sat.python import cp_model
+from pytest import mark, raises
+
+from benchmarks import instances
+from or_shifty import model as model_module
+from or_shifty.cli import parse_args, parse_json_inputs
 from or_shifty.config import Config
-from or_shifty.model import solve
+from or_shifty.constraints import (
+    ConstraintImpact,
+    ExactlyOne,
+    Fixed,
+    Implication,
+    Linear,
+    PredeterminedAssignmentsConstraint,
+    RespectPersonRestrictionsPerDay,
+    RespectPersonRestrictionsPerShiftType,
+    ThereShouldBeAtLeastXDaysBetweenOps,
+    add_primitive,
+)
+from or_shifty.formulation import CompactFormulation, SlotFormulation
+from or_shifty.history import History
+from or_shifty.model import (
+    GeneratedConstraints,
+    SolverError,
+    SolverTimeout,
+    Violation,
+    _constraints,
+    _run,
+    _run_with_retries,
+    _solution,
+    _solve,
+    _solve_tiers,
+    _values,
+    build,
+    presolve,
+    solve,
+    solve_with_violations,
+)
+from or_shifty.objective import RankingWeight
+from or_shifty.person import Person
+from or_shifty.shift import AssignedShift, Shift, ShiftType
+from or_shifty.solver_parameters import SolverParameters
 
 
 def test_solution_when_all_constraints_cannot_be_satisfied():
@@ -18,3 +64,626 @@ def test_solution_when_all_constraints_cannot_be_satisfied():
         config=config, objective=inputs.objective, constraints=inputs.constraints,
     )
     assert len(list(solution)) == 2
+
+
+def test_presolve_removes_statically_forbidden_cells():
+    people = [Person("A"), Person("B")]
+    days = [date(2019, 1, 1), date(2019, 1, 2)]
+    shifts_by_day = {
+        day: [
+            Shift(name="shift", shift_type=ShiftType.STANDARD, day=day),
+            Shift(name="shift-a", shift_type=ShiftType.SPECIAL_A, day=day),
+        ]
+        for day in days
+    }
+    config = Config.build(
+        people=people,
+        max_shifts_per_person=2,
+        shifts_by_day=shifts_by_day,
+        history=History.build(),
+    )
+    constraints = [
+        RespectPersonRestrictionsPerDay(priority=0, restrictions={"A": ["2019-01-01"]}),
+        RespectPersonRestrictionsPerShiftType(
+            priority=1, forbidden_by_shift_type={"SPECIAL_A": ["B"]}
+        ),
+    ]
+
+    presolved = presolve(config, constraints)
+
+    # A loses both shifts on the first day, B loses both shifts on each day with a special shift
+    assert len(config.indexer) == 16
+    assert len(presolved.indexer) == 16 - 4 - 8
+    assert (
+        list(presolved.indexer.iter(person_filter=people[0], day_filter=days[0])) == []
+    )
+    assert list(presolved.indexer.iter(person_filter=people[1])) == []
+
+    # Only the constraints being solved for are presolved
+    assert len(presolve(config, constraints[:1]).indexer) == 16 - 4
+    assert presolve(config, []) is config
+
+
+def test_solution_respects_presolved_constraints():
+    people = [Person("A"), Person("B")]
+    days = [date(2019, 1, 1), date(2019, 1, 2)]
+    shifts_by_day = {
+        day: [Shift(name="shift", shift_type=ShiftType.STANDARD, day=day)]
+        for day in days
+    }
+    config = Config.build(
+        people=people,
+        max_shifts_per_person=1,
+        shifts_by_day=shifts_by_day,
+        history=History.build(),
+    )
+
+    solution = solve(
+        config,
+        constraints=[
+            RespectPersonRestrictionsPerDay(
+                priority=0, restrictions={"A": ["2019-01-01"]}
+            )
+        ],
+    )
+
+    assert solution == [
+        shifts_by_day[days[0]][0].assign(people[1]),
+        shifts_by_day[days[1]][0].assign(people[0]),
+    ]
+
+
+@mark.parametrize("max_shifts_per_person", [1, 2, 3])
+def test_compact_formulation_finds_same_optimum(max_shifts_per_person):
+    people = [Person(name) for name in "ABCDE"]
+    days = [date(2019, 1, day) for day in range(1, 8)]
+    shifts_by_day = {
+        day: [
+            Shift(name="shift", shift_type=ShiftType.STANDARD, day=day),
+            Shift(name="shift-a", shift_type=ShiftType.SPECIAL_A, day=day),
+        ]
+        for day in days
+    }
+    history = History.build(
+        past_shifts=[
+            AssignedShift("shift", ShiftType.STANDARD, date(2018, 12, 30), people[0]),
+            AssignedShift("shift", ShiftType.SPECIAL_A, date(2018, 12, 29), people[1]),
+            AssignedShift("shift", ShiftType.STANDARD, date(2018, 12, 28), people[2]),
+        ]
+    )
+    constraints = [
+        ThereShouldBeAtLeastXDaysBetweenOps(priority=0, x=1),
+        RespectPersonRestrictionsPerDay(
+            priority=0, restrictions={"D": ["2019-01-02", "2019-01-03"]}
+        ),
+    ]
+
+    objective_values = {}
+    solutions = {}
+    for formulation in (SlotFormulation(), CompactFormulation()):
+        config = Config.build(
+            people=people,
+            max_shifts_per_person=max_shifts_per_person + 2,
+            shifts_by_day=shifts_by_day,
+            history=history,
+            formulation=formulation,
+        )
+        response, model = _run(
+            config, RankingWeight(), _constraints(constraints, config)
+        )
+        objective_values[str(formulation)] = response.objective_value
+        solutions[str(formulation)] = _solution(
+            _values(response), model.data, model.assignments
+        )
+
+    assert objective_values["SlotFormulation"] == objective_values["CompactFormulation"]
+    assert len(solutions["CompactFormulation"]) == len(days) * 2
+
+
+def test_compact_formulation_evaluates_same_score():
+    config_file_path = "tests/test_files/cli/config.json"
+    history_file_path = "tests/test_files/cli/history.json"
+    inputs = parse_args(["--config", config_file_path, "--history", history_file_path])
+    ackbar, mothma = inputs.people
+    shifts = [
+        shift
+        for day in sorted(inputs.shifts_by_day)
+        for shift in inputs.shifts_by_day[day]
+    ]
+    solution = [
+        shifts[0].assign(mothma),
+        shifts[1].assign(ackbar),
+        shifts[2].assign(mothma),
+    ]
+
+    scores = []
+    for formulation in (SlotFormulation(), CompactFormulation()):
+        config = Config.build(
+            people=inputs.people,
+            max_shifts_per_person=inputs.max_shifts_per_person,
+            shifts_by_day=inputs.shifts_by_day,
+            history=inputs.history,
+            formulation=formulation,
+        )
+        response, _ = _run(
+            config,
+            inputs.objective,
+            [PredeterminedAssignmentsConstraint(priority=0, assigned_shifts=solution)],
+        )
+        scores.append(response.objective_value)
+
+    assert scores[0] == scores[1]
+
+
+def test_retries_reuse_the_built_model(caplog, monkeypatch):
+    config_file_path = "tests/test_files/no_solution/config.json"
+    history_file_path = "tests/test_files/no_solution/history.json"
+    inputs = parse_args(["--config", config_file_path, "--history", history_file_path])
+    config = Config.build(
+        people=inputs.people,
+        max_shifts_per_person=inputs.max_shifts_per_person,
+        shifts_by_day=inputs.shifts_by_day,
+        history=inputs.history,
+    )
+    constraints = _constraints(inputs.constraints, config)
+
+    built = []
+
+    def counting_build(*args, **kwargs):
+        built.append(build(*args, **kwargs))
+        return built[-1]
+
+    monkeypatch.setattr(model_module, "build", counting_build)
+    caplog.set_level(logging.INFO)
+
+    _run_with_retries(config, inputs.objective, constraints)
+
+    assert len(built) == 1
+    assert list(built[0].tier_literals.keys()) == [1]
+    assert [
+        record.getMessage()
+        for record in caplog.records
+        if record.name == model_module.__name__
+    ] == [
+        "Running model...",
+        "Failed to find solution with current constraints",
+        "Dropping constraints RespectPersonRestrictionsPerDay",
+        "Retrying model...",
+        "Solution found",
+    ]
+
+
+def test_binary_search_drops_the_same_constraints(caplog):
+    people = [Person("A"), Person("B")]
+    days = [date(2019, 1, 1), date(2019, 1, 2)]
+    shifts_by_day = {
+        day: [Shift(name="shift", shift_type=ShiftType.STANDARD, day=day)]
+        for day in days
+    }
+    config = Config.build(
+        people=people,
+        max_shifts_per_person=1,
+        shifts_by_day=shifts_by_day,
+        history=History.build(),
+    )
+    constraints = [
+        RespectPersonRestrictionsPerDay(
+            priority=1, name="1", restrictions={"A": ["2019-01-01"]}
+        ),
+        RespectPersonRestrictionsPerDay(
+            priority=2, name="2", restrictions={"B": ["2019-01-02"]}
+        ),
+        RespectPersonRestrictionsPerDay(
+            priority=3, name="3", restrictions={"A": ["2019-01-02"]}
+        ),
+        RespectPersonRestrictionsPerDay(
+            priority=4, name="4", restrictions={"B": ["2019-01-01"]}
+        ),
+    ]
+    caplog.set_level(logging.INFO)
+
+    linear = solve(config, constraints=constraints)
+    linear_dropped = [
+        r.getMessage() for r in caplog.records if r.getMessage().startswith("Dropping")
+    ]
+    caplog.clear()
+
+    binary = solve(config, constraints=constraints, binary_search=True)
+    messages = [r.getMessage() for r in caplog.records]
+
+    assert (
+        binary
+        == linear
+        == [
+            shifts_by_day[days[0]][0].assign(people[1]),
+            shifts_by_day[days[1]][0].assign(people[0]),
+        ]
+    )
+    assert linear_dropped == ["Dropping constraints 4", "Dropping constraints 3"]
+    assert [m for m in messages if m.startswith("Dropping")] == [
+        "Dropping constraints 3, 4"
+    ]
+    assert [m for m in messages if m.startswith("Probing")] == [
+        "Probing with priority tiers 0, 1, 2, 3, 4",
+        "Probing with priority tiers 0, 1",
+        "Probing with priority tiers 0, 1, 2",
+        "Probing with priority tiers 0, 1, 2, 3",
+    ]
+
+
+def test_parallel_tiers_drop_the_same_constraints(caplog):
+    people = [Person("A"), Person("B")]
+    days = [date(2019, 1, 1), date(2019, 1, 2)]
+    shifts_by_day = {
+        day: [Shift(name="shift", shift_type=ShiftType.STANDARD, day=day)]
+        for day in days
+    }
+    config = Config.build(
+        people=people,
+        max_shifts_per_person=1,
+        shifts_by_day=shifts_by_day,
+        history=History.build(),
+    )
+    constraints = [
+        RespectPersonRestrictionsPerDay(
+            priority=1, name="1", restrictions={"A": ["2019-01-01"]}
+        ),
+        RespectPersonRestrictionsPerDay(
+            priority=2, name="2", restrictions={"B": ["2019-01-02"]}
+        ),
+        RespectPersonRestrictionsPerDay(
+            priority=3, name="3", restrictions={"A": ["2019-01-02"]}
+        ),
+    ]
+    caplog.set_level(logging.INFO)
+
+    solution, violations = solve_with_violations(
+        config, constraints=constraints, parallel=True
+    )
+
+    assert solution == [
+        shifts_by_day[days[0]][0].assign(people[1]),
+        shifts_by_day[days[1]][0].assign(people[0]),
+    ]
+    assert violations == [
+        Violation(constraints[2], ConstraintImpact(people[0], days[1]))
+    ]
+    assert [
+        r.getMessage() for r in caplog.records if r.getMessage().startswith("Dropping")
+    ] == ["Dropping constraints 3"]
+
+
+def _solve_tiers_slowly_unless_all_kept(
+    inputs, objective, constraints, priorities, *args
+):
+    if priorities != {constraint.priority for constraint in constraints}:
+        time.sleep(60)
+    return _solve_tiers(inputs, objective, constraints, priorities, *args)
+
+
+def test_parallel_tiers_stop_workers_that_are_no_longer_needed(monkeypatch):
+    people = [Person("A"), Person("B")]
+    days = [date(2019, 1, 1), date(2019, 1, 2)]
+    shifts_by_day = {
+        day: [Shift(name="shift", shift_type=ShiftType.STANDARD, day=day)]
+        for day in days
+    }
+    config = Config.build(
+        people=people,
+        max_shifts_per_person=1,
+        shifts_by_day=shifts_by_day,
+        history=History.build(),
+    )
+    constraints = [
+        RespectPersonRestrictionsPerDay(
+            priority=priority, restrictions={"A": ["2019-01-01"]}
+        )
+        for priority in (1, 2, 3)
+    ]
+    monkeypatch.setattr(
+        model_module, "_solve_tiers", _solve_tiers_slowly_unless_all_kept
+    )
+
+    start = time.monotonic()
+    solve(config, constraints=constraints, parallel=True)
+
+    assert time.monotonic() - start < 30
+
+
+def _kill_worker(inputs, objective, constraints, priorities, *args):
+    os._exit(1)
+
+
+def test_parallel_tiers_raise_when_a_worker_dies(monkeypatch):
+    people = [Person("A"), Person("B")]
+    days = [date(2019, 1, 1), date(2019, 1, 2)]
+    shifts_by_day = {
+        day: [Shift(name="shift", shift_type=ShiftType.STANDARD, day=day)]
+        for day in days
+    }
+    config = Config.build(
+        people=people,
+        max_shifts_per_person=1,
+        shifts_by_day=shifts_by_day,
+        history=History.build(),
+    )
+    constraints = [
+        RespectPersonRestrictionsPerDay(
+            priority=priority, restrictions={"A": ["2019-01-01"]}
+        )
+        for priority in (1, 2)
+    ]
+    monkeypatch.setattr(model_module, "_solve_tiers", _kill_worker)
+
+    with raises(SolverError, match="died with exit code 1"):
+        solve(config, constraints=constraints, parallel=True)
+
+
+def test_soft_constraints_only_violate_conflicting_instances():
+    people = [Person("A"), Person("B")]
+    days = [date(2019, 1, 1), date(2019, 1, 2)]
+    shifts_by_day = {
+        day: [Shift(name="shift", shift_type=ShiftType.STANDARD, day=day)]
+        for day in days
+    }
+    config = Config.build(
+        people=people,
+        max_shifts_per_person=1,
+        shifts_by_day=shifts_by_day,
+        history=History.build(),
+    )
+    holidays = RespectPersonRestrictionsPerDay(
+        priority=1,
+        name="Holidays",
+        restrictions={"A": ["2019-01-01"], "B": ["2019-01-01"]},
+    )
+    preferences = RespectPersonRestrictionsPerDay(
+        priority=2, name="Preferences", restrictions={"B": ["2019-01-02"]}
+    )
+
+    solution, violations = solve_with_violations(
+        config, constraints=[holidays, preferences], soft=True
+    )
+
+    assert solution == [
+        shifts_by_day[days[0]][0].assign(people[1]),
+        shifts_by_day[days[1]][0].assign(people[0]),
+    ]
+    assert violations == [Violation(holidays, ConstraintImpact(people[1], days[0]))]
+
+
+def _simple_example():
+    inputs = parse_args(
+        [
+            "--config",
+            "examples/simple/config.json",
+            "--history",
+            "examples/simple/history.json",
+        ]
+    )
+    config = Config.build(
+        people=inputs.people,
+        max_shifts_per_person=inputs.max_shifts_per_person,
+        shifts_by_day=inputs.shifts_by_day,
+        history=inputs.history,
+    )
+    return inputs, config
+
+
+def test_soft_constraints_on_the_simple_example():
+    inputs, config = _simple_example()
+
+    solution, _ = solve_with_violations(
+        config, inputs.objective, inputs.constraints, soft=True
+    )
+
+    assert sorted(shift.day for shift in solution) == sorted(inputs.shifts_by_day)
+
+
+def test_solving_an_invalid_model_raises_a_solver_error():
+    inputs, config = _simple_example()
+    model = build(config, inputs.objective, _constraints([], config))
+    # A reference to a variable that does not exist
+    model.model.Proto().constraints.add().bool_or.literals.append(10 ** 6)
+
+    with raises(SolverError, match="MODEL_INVALID"):
+        _solve(model, {0}, SolverParameters())
+
+
+@mark.parametrize(
+    "kwargs", [{}, {"binary_search": True}, {"parallel": True}, {"soft": True}]
+)
+def test_running_out_of_time_does_not_drop_tiers(kwargs, caplog):
+    inputs = parse_json_inputs(
+        instances.config_json(
+            num_people=10, num_days=14, shifts_per_day=2, max_shifts=4
+        ),
+        instances.history_json(num_people=10, num_days=60),
+    )
+    config = Config.build(
+        people=inputs.people,
+        max_shifts_per_person=inputs.max_shifts_per_person,
+        shifts_by_day=inputs.shifts_by_day,
+        history=inputs.history,
+    )
+
+    with caplog.at_level(logging.INFO), raises(SolverTimeout):
+        solve(
+            config,
+            inputs.objective,
+            inputs.constraints,
+            parameters=SolverParameters(time_limit_seconds=0.0, workers=1),
+            **kwargs,
+        )
+
+    assert "Dropping constraints" not in caplog.text
+
+
+def test_only_linear_constraints_are_enforced_by_literal():
+    inputs, config = _simple_example()
+
+    model = build(
+        config, inputs.objective, _constraints(inputs.constraints, config), soft=True
+    )
+
+    enforced = [
+        constraint.WhichOneof("constraint")
+        for constraint in model.model.Proto().constraints
+        if constraint.enforcement_literal
+    ]
+    assert enforced
+    assert set(enforced) <= {"linear", "bool_and", "bool_or"}
+
+
+@mark.parametrize("debug", [False, True])
+def test_variables_are_only_named_when_debugging(caplog, debug):
+    people = [Person("A"), Person("B")]
+    days = [date(2019, 1, 1), date(2019, 1, 2)]
+    shifts_by_day = {
+        day: [Shift(name="ops", shift_type=ShiftType.STANDARD, day=day)] for day in days
+    }
+    config = Config.build(
+        people=people,
+        max_shifts_per_person=2,
+        shifts_by_day=shifts_by_day,
+        history=History.build(),
+        formulation=CompactFormulation(),
+    )
+    if debug:
+        caplog.set_level(logging.DEBUG, logger="or_shifty.model")
+
+    model = build(config, RankingWeight(), _constraints([], config))
+
+    # Four assignment variables and a shift count variable per person and person shift
+    names = [variable.name for variable in model.model.Proto().variables]
+    assert len(names) == 8
+    assert all(names) if debug else not any(names)
+
+
+@mark.parametrize("formulation", [SlotFormulation(), CompactFormulation()])
+def test_partial_hint_is_mapped_onto_the_indexer(formulation):
+    people = [Person(name) for name in "ABC"]
+    days = [date(2019, 1, day) for day in range(1, 5)]
+    shifts_by_day = {
+        day: [Shift(name="ops", shift_type=ShiftType.STANDARD, day=day)] for day in days
+    }
+    config = Config.build(
+        people=people,
+        max_shifts_per_person=2,
+        shifts_by_day=shifts_by_day,
+        history=History.build(),
+        formulation=formulation,
+    )
+    constraints = _constraints([], config)
+    solution = solve(config, RankingWeight(), constraints)
+
+    # Only the first two days overlap with the current shifts
+    hint = solution[:2] + [
+        AssignedShift("ops", ShiftType.STANDARD, date(2018, 12, 31), people[0]),
+        AssignedShift("ops", ShiftType.STANDARD, date(2019, 1, 1), Person("Z")),
+    ]
+    model = build(config, RankingWeight(), constraints, hint=hint)
+
+    solution_hint = model.model.Proto().solution_hint
+    hinted = dict(zip(solution_hint.vars, solution_hint.values))
+    expected = {}
+    for shift in solution[:2]:
+        for index in model.data.indexer.iter(day_filter=shift.day):
+            expected[model.assignments[index.idx].Index()] = int(
+                index.person == shift.person
+                and index.person_shift == formulation.person_shift(0)
+            )
+    assert hinted == expected
+
+    assert solve(config, RankingWeight(), constraints, hint=hint) == solution
+
+
+def test_generated_constraints_are_evaluated_in_bulk():
+    inputs = parse_args(
+        [
+            "--config",
+            "tests/test_files/cli/config.json",
+            "--history",
+            "tests/test_files/cli/history.json",
+        ]
+    )
+    config = Config.build(
+        people=inputs.people,
+        max_shifts_per_person=inputs.max_shifts_per_person,
+        shifts_by_day=inputs.shifts_by_day,
+        history=inputs.history,
+    )
+    model = build(config, inputs.objective, _constraints(inputs.constraints, config))
+    values = np.random.RandomState(0).randint(
+        0, 2, size=len(model.model.Proto().variables)
+    )
+
+    _, valid = model.generated.evaluate(values)
+
+    def satisfied(primitive):
+        if isinstance(primitive, Implication):
+            return (
+                not values[primitive.antecedent.Index()]
+                or values[primitive.consequent.Index()]
+            )
+        if isinstance(primitive, Fixed):
+            return values[primitive.variable.Index()] == primitive.value
+        if isinstance(primitive, Linear):
+            total = sum(
+                coefficient * values[variable.Index()]
+                for variable, coefficient in zip(
+                    primitive.variables, primitive.coefficients
+                )
+            )
+            return primitive.lower <= total <= primitive.upper
+        total = sum(values[literal.Index()] for literal in primitive.literals)
+        if isinstance(primitive, ExactlyOne):
+            return total == 1
+        return total <= 1
+
+    expected_valid = [
+        satisfied(primitive)
+        for constraint in _constraints(inputs.constraints, config)
+        for primitive, _ in constraint.generate(model.assignments, model.data)
+    ]
+    assert list(valid) == expected_valid
+    assert not valid.all()
+
+
+def test_implication_is_evaluated_without_its_tier_literal():
+    model = cp_model.CpModel()
+    antecedent, consequent, tier = (model.NewBoolVar("") for _ in range(3))
+    generated = GeneratedConstraints(model.Proto())
+    added = add_primitive(model, Implication(antecedent, consequent))
+    generated.add(
+        added, RespectPersonRestrictionsPerDay(priority=1, restrictions={}), None
+    )
+    added.OnlyEnforceIf(tier)
+
+    for a, c in itertools.product([0, 1], repeat=2):
+        # The tier literal is false as if the tier had been dropped
+        values = np.zeros(3, dtype=np.int64)
+        values[antecedent.Index()] = a
+        values[consequent.Index()] = c
+        _, valid = generated.evaluate(values)
+        assert bool(valid[0]) == (not a or bool(c))
+
+
+def test_improving_solutions_are_passed_on():
+    people = [Person(name) for name in "ABC"]
+    days = [date(2019, 1, day) for day in range(1, 8)]
+    shifts_by_day = {
+        day: [Shift(name="ops", shift_type=ShiftType.STANDARD, day=day)] for day in days
+    }
+    config = Config.build(
+        people=people,
+        max_shifts_per_person=3,
+        shifts_by_day=shifts_by_day,
+        history=History.build(),
+    )
+    improving = []
+
+    solution = solve(config, on_solution=improving.append)
+
+    assert improving
+    assert improving[-1] == solution
@@ -0,0 +1,105 @@
+import json
+import os
+from collections import defaultdict
+
+import pytest
+
+from benchmarks import instances
+from or_shifty.cli import parse_json_inputs
+from or_shifty.config import Config
+from or_shifty.instrumentation import StatsRecorder
+from or_shifty.model import _constraints, build
+
+SNAPSHOT_PATH = "tests/test_files/model_size.json"
+# Set to rewrite the snapshot after an intended change to the size of the model
+UPDATE_SNAPSHOT = bool(os.environ.get("UPDATE_MODEL_SIZE_SNAPSHOT"))
+
+
+def _load(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def _file_instance(directory, formulation=None):
+    config = _load(os.path.join(directory, "config.json"))
+    if formulation is not None:
+        config["formulation"] = formulation
+    return config, _load(os.path.join(directory, "history.json"))
+
+
+def _synthetic_instance(formulation=None):
+    config = instances.config_json(
+        num_people=40, num_days=60, shifts_per_day=2, max_shifts=4
+    )
+    if formulation is not None:
+        config["formulation"] = formulation
+    return config, instances.history_json(num_people=40, num_days=180)
+
+
+INSTANCES = {
+    "examples/simple": lambda: _file_instance("examples/simple"),
+    "examples/simple compact": lambda: _file_instance(
+        "examples/simple", "CompactFormulation"
+    ),
+    "tests/cli": lambda: _file_instance("tests/test_files/cli"),
+    "synthetic": lambda: _synthetic_instance(),
+    "synthetic compact": lambda: _synthetic_instance("CompactFormulation"),
+}
+
+
+def model_size(config_json, history_json):
+    """Count the variables, constraint rows and objective terms of the built model, and the
+    expressions, variables and terms added by each Constraint subclass
+    """
+    inputs = parse_json_inputs(config_json, history_json)
+    config = Config.build(
+        people=inputs.people,
+        max_shifts_per_person=inputs.max_shifts_per_person,
+        shifts_by_day=inputs.shifts_by_day,
+        history=inputs.history,
+        formulation=inputs.formulation,
+    )
+    constraints = _constraints(inputs.constraints, config)
+
+    with StatsRecorder() as recorder:
+        model = build(config, inputs.objective, constraints)
+
+    subclasses = {
+        str(constraint): type(constraint).__name__ for constraint in constraints
+    }
+    per_constraint = defaultdict(lambda: {"expressions": 0, "variables": 0, "terms": 0})
+    for stats in recorder.constraints:
+        size = per_constraint[subclasses[stats.name]]
+        size["expressions"] += stats.expressions
+        size["variables"] += stats.variables
+        size["terms"] += stats.terms
+
+    proto = model.model.Proto()
+    return {
+        "variables": len(proto.variables),
+        "constraints": len(proto.constraints),
+        "objective_terms": len(proto.objective.vars),
+        "per_constraint": dict(sorted(per_constraint.items())),
+    }
+
+
+@pytest.fixture(scope="module")
+def snapshot():
+    snapshot = _load(SNAPSHOT_PATH) if os.path.exists(SNAPSHOT_PATH) else {}
+    yield snapshot
+    if UPDATE_SNAPSHOT:
+        with open(SNAPSHOT_PATH, "w") as f:
+            json.dump(snapshot, f, indent=2, sort_keys=True)
+            f.write("\n")
+
+
+@pytest.mark.parametrize("name", INSTANCES.keys())
+def test_model_size_matches_snapshot(name, snapshot):
+    size = model_size(*INSTANCES[name]())
+
+    if UPDATE_SNAPSHOT:
+        snapshot[name] = size
+    assert size == snapshot.get(name), (
+        f"The model built for {name} has changed size. If this is intended, rerun the tests with "
+        f"UPDATE_MODEL_SIZE_SNAPSHOT=1 and check in {SNAPSHOT_PATH}"
+    )
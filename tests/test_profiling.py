@@ -0,0 +1,132 @@
+import os
+import pstats
+
+from or_shifty.cli import parse_args, parse_profile_path
+from or_shifty.config import Config
+from or_shifty.constraints import RespectPersonRestrictionsPerDay
+from or_shifty.instrumentation import phase
+from or_shifty.model import solve
+from or_shifty.profiling import ProfileRecorder, profile_name
+
+
+def _functions(profile):
+    return {name for _, _, name in pstats.Stats(profile).stats}
+
+
+def busy_build():
+    return sum(range(1000))
+
+
+def busy_generate():
+    return sum(range(1000))
+
+
+def test_profile_names():
+    assert profile_name("build_indexer") == "build_config"
+    assert profile_name("generate RespectPersonRestrictionsPerDay") == (
+        "build_model.RespectPersonRestrictionsPerDay"
+    )
+    assert profile_name("something else") == "other"
+
+
+def test_profile_path_is_read_without_the_other_arguments():
+    args = ["--config", "config.json", "--history", "history.json", "-v"]
+
+    assert parse_profile_path(args + ["--profile", "profile"]) == "profile"
+    assert parse_profile_path(args + ["--profile=profile"]) == "profile"
+    assert parse_profile_path(args) is None
+
+
+def test_phases_are_profiled_separately():
+    with ProfileRecorder() as recorder:
+        with phase("presolve"):
+            busy_build()
+            with phase("generate Constraint"):
+                busy_generate()
+            busy_build()
+
+    assert recorder.profiles.keys() == {
+        "other",
+        "build_model",
+        "build_model.Constraint",
+    }
+    assert "busy_build" in _functions(recorder.profiles["build_model"])
+    assert "busy_generate" not in _functions(recorder.profiles["build_model"])
+    assert "busy_generate" in _functions(recorder.profiles["build_model.Constraint"])
+    assert "busy_build" not in _functions(recorder.profiles["build_model.Constraint"])
+
+
+def test_profiles_and_stacks_are_written(tmpdir):
+    with ProfileRecorder() as recorder:
+        inputs = parse_args(
+            [
+                "--config",
+                "tests/test_files/no_solution/config.json",
+                "--history",
+                "tests/test_files/no_solution/history.json",
+            ]
+        )
+        config = Config.build(
+            people=inputs.people,
+            max_shifts_per_person=inputs.max_shifts_per_person,
+            shifts_by_day=inputs.shifts_by_day,
+            history=inputs.history,
+        )
+        solve(config, inputs.objective, inputs.constraints)
+    recorder.write(str(tmpdir))
+
+    files = set(os.listdir(str(tmpdir)))
+    assert {
+        "parse_inputs.prof",
+        "build_config.prof",
+        "build_model.prof",
+        "build_model.RespectPersonRestrictionsPerDay.prof",
+        "solve.prof",
+        "post_process.prof",
+        "stacks.txt",
+    } <= files
+    pstats.Stats(os.path.join(str(tmpdir), "solve.prof"))
+
+    with open(os.path.join(str(tmpdir), "stacks.txt"), "r") as f:
+        lines = f.read().splitlines()
+    roots = set()
+    for line in lines:
+        stack, weight = line.rsplit(" ", 1)
+        assert int(weight) > 0
+        roots.add(stack.split(";")[0])
+    assert {"build_config", "build_model", "solve"} <= roots
+
+
+def test_constraints_are_profiled_by_class(tmpdir):
+    inputs = parse_args(
+        [
+            "--config",
+            "tests/test_files/no_solution/config.json",
+            "--history",
+            "tests/test_files/no_solution/history.json",
+        ]
+    )
+    config = Config.build(
+        people=inputs.people,
+        max_shifts_per_person=inputs.max_shifts_per_person,
+        shifts_by_day=inputs.shifts_by_day,
+        history=inputs.history,
+    )
+    with ProfileRecorder() as recorder:
+        solve(
+            config,
+            inputs.objective,
+            [
+                RespectPersonRestrictionsPerDay(
+                    priority=1, name="days/off", restrictions={}
+                )
+            ],
+        )
+        with phase("generate ../escape"):
+            busy_generate()
+    recorder.write(str(tmpdir))
+
+    assert "build_model.RespectPersonRestrictionsPerDay" in recorder.profiles
+    files = set(os.listdir(str(tmpdir)))
+    assert "build_model.RespectPersonRestrictionsPerDay.prof" in files
+    assert "build_model..._escape.prof" in files
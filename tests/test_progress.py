@@ -0,0 +1,50 @@
+import threading
+
+from ortools.sat.python import cp_model
+
+from or_shifty.progress import SolutionProgress
+
+
+def knapsack():
+    model = cp_model.CpModel()
+    items = [model.NewBoolVar("") for _ in range(30)]
+    weights = [(7 * i) % 11 + 1 for i in range(30)]
+    values = [(5 * i) % 13 + 1 for i in range(30)]
+    model.Add(cp_model.LinearExpr.ScalProd(items, weights) <= 40)
+    model.Maximize(cp_model.LinearExpr.ScalProd(items, values))
+    return model, items
+
+
+def test_every_solution_is_passed_on():
+    model, items = knapsack()
+    responses = []
+    progress = SolutionProgress(on_solution=responses.append)
+
+    solver = cp_model.CpSolver()
+    status = solver.SolveWithSolutionCallback(model, progress)
+
+    assert status == cp_model.OPTIMAL
+    assert len(responses) == progress.solutions >= 1
+    assert responses[-1].objective_value == solver.ObjectiveValue()
+    assert list(responses[-1].solution) == [solver.Value(item) for item in items]
+
+
+def test_search_stops_within_gap():
+    model, _ = knapsack()
+    progress = SolutionProgress(relative_gap=1)
+
+    solver = cp_model.CpSolver()
+    solver.SolveWithSolutionCallback(model, progress)
+
+    assert progress.solutions == 1
+
+
+def test_search_stops_when_stalled(monkeypatch):
+    stopped = threading.Event()
+    progress = SolutionProgress(stall_seconds=0.01)
+    monkeypatch.setattr(progress, "StopSearch", stopped.set)
+
+    progress._restart_stall_timer()
+
+    assert stopped.wait(5)
+    progress.stop()
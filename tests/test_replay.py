@@ -0,0 +1,93 @@
+import json
+
+import pytest
+
+from or_shifty.cli import InvalidInputs, parse_args
+from or_shifty.config import Config
+from or_shifty.instrumentation import StatsRecorder
+from or_shifty.model import solve
+from or_shifty.replay import (
+    ModelExporter,
+    parse_replay_args,
+    read_export,
+    replay,
+)
+
+
+def _export(tmp_path, directory):
+    inputs = parse_args(
+        [
+            "--config",
+            f"tests/test_files/{directory}/config.json",
+            "--history",
+            f"tests/test_files/{directory}/history.json",
+        ]
+    )
+    config = Config.build(
+        people=inputs.people,
+        max_shifts_per_person=inputs.max_shifts_per_person,
+        shifts_by_day=inputs.shifts_by_day,
+        history=inputs.history,
+        formulation=inputs.formulation,
+    )
+    with ModelExporter() as exporter:
+        solution = solve(
+            config,
+            inputs.objective,
+            inputs.constraints,
+            parameters=inputs.solver_parameters,
+        )
+    path = str(tmp_path / "model.json")
+    exporter.write(path)
+    return path, solution
+
+
+def test_every_retry_tier_is_exported(tmp_path):
+    path, _ = _export(tmp_path, "no_solution")
+
+    models = read_export(path)
+
+    assert [model.priorities for model in models] == [[0, 1], [0]]
+    # Both tiers are solved with the same model, so share its variables
+    assert models[0].variables is models[1].variables
+    assert len(models[0].variables) == len(models[0].proto.variables) - 1
+
+
+def test_replay_solves_the_exported_models_again(tmp_path):
+    path, solution = _export(tmp_path, "no_solution")
+
+    with StatsRecorder() as recorder:
+        replayed = replay(read_export(path), {"workers": 1})
+
+    assert [(s.priorities, s.status) for s in recorder.solves] == [
+        ([0, 1], "INFEASIBLE"),
+        ([0], "OPTIMAL"),
+    ]
+    assert replayed == solution
+
+
+def test_replay_of_only_infeasible_models_has_no_solution(tmp_path):
+    path, _ = _export(tmp_path, "no_solution")
+
+    assert replay(read_export(path)[:1]) is None
+
+
+def test_replay_args(tmp_path):
+    path, _ = _export(tmp_path, "no_solution")
+
+    inputs = parse_replay_args(
+        ["--model", path, "--output", "output.json", "--time-limit", "5"]
+    )
+
+    assert len(inputs.models) == 2
+    assert inputs.output_path == "output.json"
+    assert inputs.solver_overrides["time_limit_seconds"] == 5
+    assert inputs.solver_overrides["workers"] is None
+
+
+def test_invalid_export(tmp_path):
+    path = tmp_path / "model.json"
+    path.write_text(json.dumps({"variables": [], "models": [{"priorities": [0]}]}))
+
+    with pytest.raises(InvalidInputs):
+        read_export(str(path))
@@ -0,0 +1,112 @@
+from datetime import date, timedelta
+
+from or_shifty import model as model_module
+from or_shifty.constraints import ThereShouldBeAtLeastXDaysBetweenOps
+from or_shifty.history import History
+from or_shifty.model import _solution, _values
+from or_shifty.person import Person
+from or_shifty.rolling_horizon import (
+    Window,
+    compare_with_monolithic,
+    solve_rolling_horizon,
+    windows,
+)
+from or_shifty.shift import Shift, ShiftType
+
+
+def day(n):
+    return date(2019, 1, n)
+
+
+def shifts(num_days):
+    return {
+        day(n): [Shift(name="ops", shift_type=ShiftType.STANDARD, day=day(n))]
+        for n in range(1, num_days + 1)
+    }
+
+
+def test_windows_overlap_and_commit_up_to_the_next():
+    days = [day(n) for n in range(1, 11)]
+
+    assert windows(days, window_days=4, overlap_days=1) == [
+        Window(day(1), day(5), day(4)),
+        Window(day(4), day(8), day(7)),
+        Window(day(7), day(11), day(11)),
+    ]
+
+
+def test_windows_without_days_are_skipped():
+    days = [day(1), day(2), day(9)]
+
+    assert windows(days, window_days=3, overlap_days=0) == [
+        Window(day(1), day(4), day(4)),
+        Window(day(7), day(10), day(10)),
+    ]
+
+
+def test_committed_shifts_are_history_for_later_windows():
+    people = [Person(name) for name in "ABC"]
+    shifts_by_day = shifts(10)
+
+    solution, solved_windows = solve_rolling_horizon(
+        people=people,
+        max_shifts_per_person=2,
+        shifts_by_day=shifts_by_day,
+        history=History.build(),
+        window_days=3,
+        overlap_days=1,
+        constraints=[ThereShouldBeAtLeastXDaysBetweenOps(priority=0, x=2)],
+    )
+
+    assert solved_windows == 5
+    assert [shift.unassigned() for shift in solution] == [
+        day_shift for day_shifts in shifts_by_day.values() for day_shift in day_shifts
+    ]
+    last_on_shift = {}
+    for shift in solution:
+        if shift.person in last_on_shift:
+            assert shift.day - last_on_shift[shift.person] > timedelta(days=2)
+        last_on_shift[shift.person] = shift.day
+
+
+def test_single_window_matches_monolithic_solve():
+    people = [Person(name) for name in "ABC"]
+
+    _, report = compare_with_monolithic(
+        people=people,
+        max_shifts_per_person=3,
+        shifts_by_day=shifts(6),
+        history=History.build(),
+        window_days=6,
+    )
+
+    assert report.windows == 1
+    assert report.objective == report.monolithic_objective
+
+
+def test_every_committed_shift_is_scored(monkeypatch):
+    scored = []
+    run = model_module._run
+
+    def scoring_run(*args, **kwargs):
+        response, model = run(*args, **kwargs)
+        scored.append(_solution(_values(response), model.data, model.assignments))
+        return response, model
+
+    monkeypatch.setattr(model_module, "_run", scoring_run)
+
+    # Each person is committed to 4 shifts over the 3 windows, more than the 2 allowed per window
+    solution, report = compare_with_monolithic(
+        people=[Person(name) for name in "ABC"],
+        max_shifts_per_person=2,
+        shifts_by_day=shifts(12),
+        history=History.build(),
+        window_days=4,
+    )
+
+    assert report.windows == 3
+    assert len(solution) == 12
+    rolling_horizon_scored, monolithic_scored = scored
+    assert rolling_horizon_scored == solution
+    assert len(monolithic_scored) == 12
+    assert report.monolithic_objective >= report.objective
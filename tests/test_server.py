@@ -0,0 +1,184 @@
+import json
+import os
+import socket
+import threading
+import time
+from http.client import HTTPConnection
+
+import pytest
+
+from benchmarks import instances
+from or_shifty import server as server_module
+from or_shifty.server import QueueFull, SolvePool, SolveServer, UnixSolveServer
+
+
+class UnixHTTPConnection(HTTPConnection):
+    def __init__(self, path):
+        super().__init__("localhost")
+        self._path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self._path)
+
+
+def _load(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def _request(connection, method, path, body=None):
+    connection.request(
+        method,
+        path,
+        body=None if body is None else json.dumps(body),
+        headers={"Content-Type": "application/json"},
+    )
+    response = connection.getresponse()
+    return response.status, json.loads(response.read())
+
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = SolvePool(workers=1, queue_size=1)
+    yield pool
+    pool.shutdown()
+
+
+@pytest.fixture
+def unix_socket(pool, tmp_path):
+    path = str(tmp_path / "shifty.sock")
+    server = UnixSolveServer(path, pool)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield path
+    server.shutdown()
+    server.server_close()
+
+
+def test_solve_and_evaluate_over_unix_socket(unix_socket):
+    config = _load("tests/test_files/no_solution/config.json")
+    history = _load("tests/test_files/no_solution/history.json")
+    connection = UnixHTTPConnection(unix_socket)
+
+    status, response = _request(connection, "GET", "/health")
+    assert status == 200
+    assert response == {"status": "ok"}
+
+    status, solved = _request(
+        connection, "POST", "/solve", {"config": config, "history": history}
+    )
+    assert status == 200
+    assert len(solved["shifts"]) == 2
+    assert {v["constraint"] for v in solved["violations"]} == {
+        "RespectPersonRestrictionsPerDay"
+    }
+
+    status, evaluated = _request(
+        connection,
+        "POST",
+        "/evaluate",
+        {"config": config, "history": history, "output": solved},
+    )
+    assert status == 200
+    assert evaluated["violations"] == solved["violations"]
+
+
+def test_invalid_requests_over_unix_socket(unix_socket):
+    config = _load("tests/test_files/cli/config.json")
+    history = _load("tests/test_files/cli/history.json")
+    connection = UnixHTTPConnection(unix_socket)
+
+    assert _request(connection, "POST", "/solve", {"config": config})[0] == 400
+    assert _request(connection, "POST", "/unknown", {})[0] == 404
+    status, response = _request(
+        connection, "POST", "/solve", {"config": config, "history": history}
+    )
+    assert status == 422
+    assert response == {"error": "Unable to solve for the given constraints"}
+
+    # Constraints check their parameters when they are built
+    config["constraints"].append(
+        {"type": "RespectPersonRestrictionsPerDay", "priority": 1, "params": {}}
+    )
+    status, response = _request(
+        connection, "POST", "/solve", {"config": config, "history": history}
+    )
+    assert status == 400
+    assert response["error"].startswith("Invalid config")
+
+
+def test_solver_running_out_of_time_over_unix_socket(unix_socket):
+    config = instances.config_json(
+        num_people=10, num_days=14, shifts_per_day=2, max_shifts=4
+    )
+    config["solver"] = {"time_limit_seconds": 0, "workers": 1}
+    history = instances.history_json(num_people=10, num_days=60)
+    connection = UnixHTTPConnection(unix_socket)
+
+    status, response = _request(
+        connection, "POST", "/solve", {"config": config, "history": history}
+    )
+
+    assert status == 504
+    assert "try a longer time limit" in response["error"]
+
+
+def _kill_worker(body):
+    os._exit(1)
+
+
+def test_requests_after_a_worker_dies_are_handled(unix_socket, monkeypatch):
+    monkeypatch.setitem(server_module.ROUTES, "/kill", _kill_worker)
+    connection = UnixHTTPConnection(unix_socket)
+
+    status, response = _request(connection, "POST", "/kill", {})
+    assert status == 500
+    assert response == {"error": "The process handling the request died"}
+
+    status, solved = _request(
+        connection,
+        "POST",
+        "/solve",
+        {
+            "config": _load("tests/test_files/no_solution/config.json"),
+            "history": _load("tests/test_files/no_solution/history.json"),
+        },
+    )
+    assert status == 200
+    assert len(solved["shifts"]) == 2
+
+
+def test_solve_over_http(pool):
+    server = SolveServer(("127.0.0.1", 0), pool)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        connection = HTTPConnection(*server.server_address[:2])
+        status, response = _request(
+            connection,
+            "POST",
+            "/solve",
+            {
+                "config": _load("tests/test_files/no_solution/config.json"),
+                "history": _load("tests/test_files/no_solution/history.json"),
+            },
+        )
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert status == 200
+    assert len(response["shifts"]) == 2
+
+
+def test_pool_rejects_requests_once_queue_is_full(pool):
+    running = pool.submit(time.sleep, 0.5)
+    queued = pool.submit(time.sleep, 0)
+
+    with pytest.raises(QueueFull):
+        pool.submit(time.sleep, 0)
+
+    running.result()
+    queued.result()
+    pool.submit(time.sleep, 0).result()
@@ -1,7 +1,8 @@
+import pickle
 from datetime import date
 
 from or_shifty.person import Person
-from or_shifty.shift import AssignedShift, ShiftType
+from or_shifty.shift import AssignedShift, Shift, ShiftType
 
 
 def test_json_round_trip():
@@ -12,3 +13,25 @@ def test_json_round_trip():
         shift_type=ShiftType.STANDARD,
     )
     assert shift == AssignedShift.from_json(shift.to_json())
+
+
+def test_people_and_shifts_are_interned():
+    assert Person(name="A") is Person("A")
+    assert Shift("ops", ShiftType.STANDARD, date(2019, 1, 1)) is Shift(
+        name="ops", shift_type=ShiftType.STANDARD, day=date(2019, 1, 1)
+    )
+    assert Shift("ops", ShiftType.STANDARD, date(2019, 1, 1)) is not Shift(
+        "ops", ShiftType.SPECIAL_A, date(2019, 1, 1)
+    )
+
+    assigned = AssignedShift("ops", ShiftType.STANDARD, date(2019, 1, 1), Person("A"))
+    assert assigned.unassigned() is Shift("ops", ShiftType.STANDARD, date(2019, 1, 1))
+
+
+def test_pickle_round_trip():
+    shift = Shift("ops", ShiftType.STANDARD, date(2019, 1, 1))
+    assigned = shift.assign(Person("A"))
+
+    assert pickle.loads(pickle.dumps(shift)) is shift
+    assert pickle.loads(pickle.dumps(assigned)) == assigned
+    assert pickle.loads(pickle.dumps(assigned)).person is Person("A")
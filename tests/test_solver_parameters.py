@@ -0,0 +1,56 @@
+import os
+
+import pytest
+
+from or_shifty.solver_parameters import SolverParameters
+
+
+def test_from_json_round_trips():
+    serialised = {"workers": 4, "time_limit_seconds": 2.5, "random_seed": 3}
+    parameters = SolverParameters.from_json(serialised)
+
+    assert parameters == SolverParameters(
+        workers=4, time_limit_seconds=2.5, random_seed=3
+    )
+    assert parameters.to_json() == serialised
+
+
+def test_from_json_rejects_unknown_parameters():
+    with pytest.raises(AssertionError):
+        SolverParameters.from_json({"threads": 4})
+
+
+def test_override_ignores_unset_values():
+    parameters = SolverParameters(workers=4, relative_gap=0.1)
+
+    assert parameters.override(
+        workers=None, relative_gap=0.2, random_seed=None
+    ) == SolverParameters(workers=4, relative_gap=0.2)
+
+
+def test_solver_is_configured():
+    parameters = (
+        SolverParameters(
+            workers=2,
+            time_limit_seconds=5,
+            relative_gap=0.1,
+            absolute_gap=3,
+            random_seed=7,
+            log_search_progress=True,
+        )
+        .solver()
+        .parameters
+    )
+
+    assert parameters.num_search_workers == 2
+    assert parameters.max_time_in_seconds == 5
+    assert parameters.relative_gap_limit == pytest.approx(0.1)
+    assert parameters.absolute_gap_limit == 3
+    assert parameters.random_seed == 7
+    assert parameters.log_search_progress
+
+
+def test_zero_workers_uses_every_core():
+    parameters = SolverParameters(workers=0).solver().parameters
+
+    assert parameters.num_search_workers == (os.cpu_count() or 1)